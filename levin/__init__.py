@@ -1 +1,11 @@
-from .app import app
+__all__ = ["app"]
+
+
+def __getattr__(name):
+    # default application is created on first use: `import levin.testing` or workers do not pay for it
+    if name == "app":
+        from .app import app  # pylint: disable=import-outside-toplevel
+
+        globals()["app"] = app  # instead of submodule set by import
+        return app
+    raise AttributeError(f"module {__name__} has no attribute {name}")
@@ -1,27 +1,32 @@
-from . import components
 from .core.app import Application as _Application
 
 __all__ = ["app"]
 
 app = _Application(
     components=[
-        components.PatchRequest(),
-        components.h2.Push(),
-        components.LoggerComponent(),
-        components.ErrorHandle(),
-        components.limit.TimeLimit(),
-        components.HttpRouter(),
-        components.RunProcess(),
-        components.ProfileHandler(),
-        components.SyncToAsync(),
-        components.JsonFormat(),
-        components.TextFormat(),
-        components.TemplateFormat(),
+        "levin.components.common:PatchRequest",
+        "levin.components.metrics:Metrics",
+        "levin.components.admission:Admission",
+        "levin.components.h2:Push",
+        "levin.components.logger:LoggerComponent",
+        "levin.components.common:ErrorHandle",
+        "levin.components.limit:TimeLimit",
+        "levin.components.router:HttpRouter",
+        "levin.components.limit:RateLimit",
+        "levin.components.watchdog:Watchdog",
+        "levin.components.concurrent:AdaptiveExecutor",
+        "levin.components.concurrent:RunProcess",
+        "levin.components.profiling:ProfileHandler",
+        "levin.components.concurrent:SyncToAsync",
+        "levin.components.formating:JsonFormat",
+        "levin.components.formating:TextFormat",
+        "levin.components.formating:TemplateFormat",
 
-        components.InjectFromScope(),
-        components.AddRequest(),
-        # components.ProfileHandler(),
+        "levin.components.inject:InjectFromScope",
+        "levin.components.inject:AddRequest",
+        # "levin.components.profiling:ProfileHandler",
 
-        components.Cli(),
+        "levin.components.cli:Cli",
     ]
 )
+app.configure({"adaptive_executor": {"enable": False}, "admission": {"enable": False}, "watchdog": {"enable": False}})
@@ -0,0 +1,261 @@
+"""
+ASGI 3 interface in both directions:
+    ASGIAdapter - run levin Application under any ASGI server (uvicorn, hypercorn)
+    ASGIHost - serve third-party ASGI (2 or 3) application with levin Server and Connection
+"""
+import asyncio
+import inspect
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from levin.core.common import MultiHeaders, Push, Request, Response
+from levin.core.typing import ASGIFramework
+
+ASGI_VERSION = {"version": "3.0", "spec_version": "2.3"}
+_HOP_HEADERS = (b"content-length", b"transfer-encoding", b"connection")
+_DISCONNECT = {"type": "http.disconnect"}
+
+
+class ASGIAdapter:
+    """
+    ASGI 3 application of levin Application:
+
+        asgi_app = ASGIAdapter(app)  # uvicorn module:asgi_app
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._started = False
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported scope type {scope['type']}")
+
+    async def _start(self):
+        if not self._started:
+            self._started = True
+            await self.app.start()
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self._start()
+                except Exception as exc:  # pylint: disable=broad-except
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.app.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Dict, receive: Callable, send: Callable):
+        await self._start()  # server without lifespan support
+        request = await _create_request(scope, receive)
+        response: Response = await self.app.handler(request)
+        if "http.response.push" in (scope.get("extensions") or {}):
+            for push in response.pushes:
+                await send({"type": "http.response.push", "path": push.path.decode(), "headers": []})
+        headers = [(name.lower(), value) for name, value in response.headers.items()]
+        headers = [(name, value) for name, value in headers if name not in _HOP_HEADERS]
+        headers.append((b"content-length", str(len(response.body)).encode()))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
+
+
+async def _create_request(scope: Dict, receive: Callable) -> Request:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    path = scope.get("raw_path") or scope["path"].encode()
+    if scope.get("query_string"):
+        path += b"?" + scope["query_string"]
+    request = Request(
+        path=path,
+        method=scope["method"].encode(),
+        body=body,
+        headers=tuple((name, value) for name, value in scope.get("headers", ())),
+        protocol=b"HTTP/" + scope.get("http_version", "1.1").encode(),
+        scheme=scope.get("scheme", "http").encode(),
+    )
+    client, server = scope.get("client"), scope.get("server")
+    request.set("get_transport_info", lambda _: lambda: (client, server), lazy=True)
+    request.set("push_support", "http.response.push" in (scope.get("extensions") or {}))
+    return request
+
+
+def _is_asgi2(app: ASGIFramework) -> bool:
+    # ASGI 2 application is a callable (class or factory) of one argument - scope,
+    # ASGI 3 one takes scope, receive and send (class of them is instantiated and awaited)
+    if inspect.isclass(app) or inspect.isfunction(app) or inspect.ismethod(app):
+        call = app
+    else:
+        call = getattr(app, "__call__", None)
+    return call is not None and len(inspect.signature(call).parameters) == 1
+
+
+def _retrieve_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()  # application failed after the client had gone
+
+
+class _Lifespan:
+    __slots__ = ("_app", "_receive", "_send", "_task", "supported")
+
+    def __init__(self, app: Callable):
+        self._app = app
+        self._receive: asyncio.Queue = asyncio.Queue()
+        self._send: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.supported = True
+
+    async def _run(self):
+        try:
+            await self._app({"type": "lifespan", "asgi": ASGI_VERSION, "state": {}}, self._receive.get, self._send.put)
+        except Exception:  # pylint: disable=broad-except
+            # application without lifespan support raises on unknown scope
+            self.supported = False
+            self._send.put_nowait({"type": "lifespan.unsupported"})
+
+    async def _event(self, event: str):
+        await self._receive.put({"type": f"lifespan.{event}"})
+        message = await self._send.get()
+        if message["type"] == f"lifespan.{event}.failed":
+            raise RuntimeError(message.get("message") or f"ASGI application {event} failed")
+
+    async def startup(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        await self._event("startup")
+
+    async def shutdown(self):
+        if self.supported:
+            await self._event("shutdown")
+        await self._task
+
+
+class ASGIHost:
+    """
+    Application interface (start, stop, handler) of ASGI application - to run it with levin Server:
+
+        run_app(ASGIHost(fastapi_app))
+
+    The response body is collected before it is written: streaming responses are sent at once.
+    When the client goes away the application receives http.disconnect and is cancelled after disconnect_timeout
+    """
+
+    disconnect_timeout: float = 5.0
+
+    def __init__(self, app: ASGIFramework, lifespan: bool = True):
+        if _is_asgi2(app):
+            asgi2 = app
+
+            async def app(scope, receive, send):  # pylint: disable=function-redefined
+                await asgi2(scope)(receive, send)
+
+        self.asgi_app = app
+        self.lifespan = lifespan
+        self._lifespan: Optional[_Lifespan] = None
+
+    async def start(self):
+        if self.lifespan and self._lifespan is None:
+            self._lifespan = _Lifespan(self.asgi_app)
+            await self._lifespan.startup()
+
+    async def stop(self):
+        if self._lifespan is not None:
+            await self._lifespan.shutdown()
+            self._lifespan = None
+
+    async def handler(self, request: Request) -> Response:
+        scope = _create_scope(request)
+        body_sent = False
+        status, headers, body, pushes = 500, [], [], []
+
+        loop = asyncio.get_running_loop()
+        disconnected = loop.create_future()
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": request.body, "more_body": False}
+            return await asyncio.shield(disconnected)  # until the connection cancels the handler
+
+        async def send(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status, headers = message["status"], message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+            elif message["type"] == "http.response.push":
+                pushes.append(Push(message["path"].encode()))
+
+        app = asyncio.ensure_future(self.asgi_app(scope, receive, send))  # ASGI 3 class instance is awaitable
+        try:
+            await asyncio.shield(app)
+        except asyncio.CancelledError:
+            disconnected.set_result(_DISCONNECT)
+            timeout = loop.call_later(self.disconnect_timeout, app.cancel)
+            app.add_done_callback(lambda _: timeout.cancel())
+            app.add_done_callback(_retrieve_exception)
+            raise
+        return Response(status, b"".join(body), headers=_merge_headers(headers), pushes=pushes)
+
+
+def _create_scope(request: Request) -> Dict:
+    path, _, query = request.raw_path.partition(b"?")
+    client, server = _get_transport_info(request)
+    return {
+        "type": "http",
+        "asgi": ASGI_VERSION,
+        "http_version": request.protocol.decode().replace("HTTP/", "") or "1.1",
+        "method": request.method.decode(),
+        "scheme": request.scheme.decode(),
+        "path": unquote(path.decode("latin-1")),
+        "raw_path": path,
+        "query_string": query,
+        "root_path": "",
+        "headers": list(request.headers.items()),
+        "client": client,
+        "server": server,
+        "extensions": {"http.response.push": {}} if request.protocol == b"HTTP/2" else {},
+    }
+
+
+def _get_address(address) -> Optional[Tuple]:
+    if isinstance(address, (str, bytes)):  # unix socket: path of server, client has no name
+        return (os.fsdecode(address), None) if address else None
+    return tuple(address[:2]) if address else None
+
+
+def _get_transport_info(request: Request) -> Tuple:
+    info = request.get("get_transport_info")
+    if info is None:
+        return None, None
+    client, server = info()
+    return _get_address(client), _get_address(server)
+
+
+def _merge_headers(headers: List[Tuple[bytes, bytes]]) -> MultiHeaders:
+    merged = MultiHeaders()
+    for name, value in headers:
+        name = name.lower()
+        if name in _HOP_HEADERS:  # framing is made by parser of the connection
+            continue
+        if name == b"set-cookie":  # cookies can't be joined into one line
+            merged.add(name, value)
+        else:
+            merged[name] = merged[name] + b", " + value if name in merged else value
+    return merged
@@ -0,0 +1,7 @@
+"""
+Load generator to benchmark levin applications without external tools:
+
+    python -m levin.bench run:app --scenarios scenarios.json --output result.json
+"""
+from .load import DEFAULT_SCENARIOS, H2, HTTP1, Scenario, Stats, run_scenario
+from .serve import serve
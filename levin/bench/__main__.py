@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from .load import DEFAULT_SCENARIOS, Scenario, run_scenario
+from .serve import serve
+
+
+def _get_scenarios(args):
+    if args.scenarios:
+        with open(args.scenarios) as file_:
+            scenarios = [Scenario.from_dict(data) for data in json.load(file_)]
+    else:
+        scenarios = list(DEFAULT_SCENARIOS)
+    for scenario in scenarios:
+        if args.duration:
+            scenario.duration = args.duration
+        if args.connections:
+            scenario.connections = args.connections
+    return scenarios
+
+
+async def _run(scenarios, host, port):
+    return [await run_scenario(scenario, host, port) for scenario in scenarios]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m levin.bench", description="Benchmark levin application")
+    parser.add_argument("app", nargs="?", help='"module:attr" of application to run, running server is used without it')
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--scenarios", help="json file with list of scenarios")
+    parser.add_argument("--duration", type=float, help="override duration of scenarios")
+    parser.add_argument("--connections", type=int, help="override connections of scenarios")
+    parser.add_argument("--output", help="file to write results, stdout by default")
+    args = parser.parse_args(argv)
+
+    scenarios = _get_scenarios(args)
+    if args.app:
+        with serve(args.app, args.host, args.port):
+            results = asyncio.run(_run(scenarios, args.host, args.port))
+    else:
+        results = asyncio.run(_run(scenarios, args.host, args.port))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file_:
+            file_.write(output)
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import DataReceived, ResponseReceived, StreamEnded, StreamReset
+
+HTTP1 = "http1"
+H2 = "h2"
+
+
+class Scenario:
+    """
+    Load definition: `depth` is pipelined requests (http1) or concurrent streams (h2) per connection
+    """
+
+    __slots__ = ("name", "path", "method", "headers", "body", "protocol", "connections", "depth", "duration", "timeout")
+
+    def __init__(
+        self,
+        name: str,
+        path: bytes = b"/",
+        method: bytes = b"GET",
+        headers: Tuple[Tuple[bytes, bytes], ...] = (),
+        body: bytes = b"",
+        protocol: str = HTTP1,
+        connections: int = 10,
+        depth: int = 1,
+        duration: float = 5.0,
+        timeout: float = 5.0,  # to wait for responses after duration
+    ):  # pylint: disable=too-many-arguments
+        self.name = name
+        self.path = path
+        self.method = method
+        self.headers = headers
+        self.body = body
+        self.protocol = protocol
+        self.connections = connections
+        self.depth = depth
+        self.duration = duration
+        self.timeout = timeout
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Scenario":
+        data = dict(data)
+        for key in ("path", "method", "body"):
+            if isinstance(data.get(key), str):
+                data[key] = data[key].encode()
+        data["headers"] = tuple((name.encode(), value.encode()) for name, value in data.get("headers", {}).items())
+        return cls(**data)
+
+
+DEFAULT_SCENARIOS = (
+    Scenario("http1 keep-alive", connections=50),
+    Scenario("h2 multiplexing", protocol=H2, connections=4, depth=20),
+)
+
+
+class Stats:
+    """
+    Latencies and errors of requests - summary as reported by benchmarks
+    """
+
+    __slots__ = ("latencies", "errors")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def summary(self, name: str, duration: float) -> Dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(value: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(int(len(latencies) * value), len(latencies) - 1)]
+
+        return {
+            "scenario": name,
+            "requests": len(latencies),
+            "errors": self.errors,
+            "duration": duration,
+            "rps": len(latencies) / duration if duration else 0.0,
+            "latency": {
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "p999": percentile(0.999),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+
+def _http1_request(scenario: Scenario, host: str) -> bytes:
+    headers = {b"host": host.encode(), **dict(scenario.headers)}
+    if scenario.body:
+        headers[b"content-length"] = str(len(scenario.body)).encode()
+    lines = [scenario.method + b" " + scenario.path + b" HTTP/1.1"]
+    lines.extend(name + b": " + value for name, value in headers.items())
+    return b"\r\n".join(lines) + b"\r\n\r\n" + scenario.body
+
+
+async def _read_http1_response(reader: asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    status = int(lines[0].split(b" ", 2)[1])
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            await reader.readexactly(int(value))
+    return status
+
+
+async def _http1_worker(scenario: Scenario, host: str, port: int, deadline: float, stats: Stats):
+    reader, writer = await asyncio.open_connection(host, port)
+    batch = _http1_request(scenario, host) * scenario.depth
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(batch)
+            for _ in range(scenario.depth):
+                status = await _read_http1_response(reader)
+                if status >= 500:
+                    stats.errors += 1
+                else:
+                    stats.latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+class _H2Client:
+    """
+    h2c (prior knowledge) connection with concurrent streams
+    """
+
+    __slots__ = ("_conn", "_reader", "_writer", "_responses", "_statuses", "_task")
+
+    def __init__(self):
+        self._conn = H2Connection(H2Configuration(client_side=True, header_encoding="utf-8"))
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._responses: Dict[int, asyncio.Future] = {}
+        self._statuses: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def connect(self, host: str, port: int):
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._conn.initiate_connection()
+        self._writer.write(self._conn.data_to_send())
+        self._task = asyncio.create_task(self._read())
+
+    def close(self):
+        self._task.cancel()
+        self._writer.close()
+
+    async def request(self, scenario: Scenario, authority: str) -> int:
+        stream_id = self._conn.get_next_available_stream_id()
+        headers = [
+            (":method", scenario.method.decode()),
+            (":path", scenario.path.decode()),
+            (":scheme", "http"),
+            (":authority", authority),
+            *((name.decode(), value.decode()) for name, value in scenario.headers),
+        ]
+        self._conn.send_headers(stream_id, headers, end_stream=not scenario.body)
+        if scenario.body:
+            self._conn.send_data(stream_id, scenario.body, end_stream=True)
+        response = self._responses[stream_id] = asyncio.get_running_loop().create_future()
+        self._writer.write(self._conn.data_to_send())
+        return await response
+
+    def _finish(self, stream_id: int, status: Optional[int]):
+        response = self._responses.pop(stream_id, None)
+        if response is not None and not response.done():
+            if status is None:
+                response.set_exception(ConnectionResetError(f"stream {stream_id} reset"))
+            else:
+                response.set_result(status)
+
+    async def _read(self):
+        while True:
+            data = await self._reader.read(65536)
+            if not data:
+                for stream_id in list(self._responses):
+                    self._finish(stream_id, None)
+                return
+            for event in self._conn.receive_data(data):
+                if isinstance(event, ResponseReceived):
+                    self._statuses[event.stream_id] = int(dict(event.headers)[":status"])
+                elif isinstance(event, DataReceived):
+                    self._conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, StreamEnded):
+                    self._finish(event.stream_id, self._statuses.pop(event.stream_id, 0))
+                elif isinstance(event, StreamReset):
+                    self._finish(event.stream_id, None)
+            self._writer.write(self._conn.data_to_send())
+
+
+async def _h2_worker(scenario: Scenario, host: str, port: int, deadline: float, stats: Stats):
+    client = _H2Client()
+    await client.connect(host, port)
+    authority = f"{host}:{port}"
+
+    async def _stream():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await client.request(scenario, authority)
+            except ConnectionResetError:
+                stats.errors += 1
+                continue
+            if status >= 500:
+                stats.errors += 1
+            else:
+                stats.latencies.append(time.perf_counter() - start)
+
+    try:
+        await asyncio.gather(*(_stream() for _ in range(scenario.depth)))
+    finally:
+        client.close()
+
+
+async def run_scenario(scenario: Scenario, host: str = "127.0.0.1", port: int = 8000) -> Dict:
+    """
+    Load server with scenario for its duration and return summary: rps and latency percentiles in seconds
+    """
+    stats = Stats()
+    worker = _h2_worker if scenario.protocol == H2 else _http1_worker
+    start = time.perf_counter()
+    deadline = start + scenario.duration
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(worker(scenario, host, port, deadline, stats), scenario.duration + scenario.timeout)
+            for _ in range(scenario.connections)
+        ),
+        return_exceptions=True,
+    )
+    stats.errors += sum(1 for result in results if isinstance(result, Exception))
+    return stats.summary(scenario.name, time.perf_counter() - start)
@@ -0,0 +1,259 @@
+"""
+Micro benchmarks of hot paths with regression check against JSON baseline:
+
+    python -m levin.bench.micro --baseline benchmarks/micro.json            # check
+    python -m levin.bench.micro --baseline benchmarks/micro.json --update   # write new baseline
+
+Each case is measured in several rounds and the best one is compared: noise of the machine only makes rounds slower.
+The baseline keeps spread of rounds too, it widens the tolerance by max_spread at most
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+
+from levin.components import AddRequest, HttpRouter, JsonFormat, PatchRequest
+from levin.core.app import Application
+from levin.core.common import Request
+from levin.core.parsers.http_simple import Parser as Http1Parser
+from levin.core.parsers.http_tools import Parser as Http1ParserHttpTools
+from levin.core.parsers.hyper import Parser as Http2Parser
+
+CALIBRATION = "calibration"
+DEFAULT_TOLERANCE = 0.2
+DEFAULT_ROUNDS = 5
+DEFAULT_MAX_SPREAD = 0.05  # spread of noisy machine must not hide regressions: tolerance is what applies
+
+_HEADERS = tuple((f"x-header-{i}".encode(), b"value-" + str(i).encode() * 8) for i in range(20)) + (
+    (b"host", b"example.com"),
+    (b"user-agent", b"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"),
+    (b"accept", b"text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"),
+    (b"cookie", b"session=" + b"s" * 64 + b"; theme=dark; lang=en"),
+)
+
+
+def _http1_data(body: bytes = b"", path: bytes = b"/api/users/42/items?page=2&limit=50") -> bytes:
+    headers = _HEADERS + ((b"content-length", str(len(body)).encode()),) if body else _HEADERS
+    lines = [(b"POST " if body else b"GET ") + path + b" HTTP/1.1"]
+    lines.extend(name + b": " + value for name, value in headers)
+    return b"\r\n".join(lines) + b"\r\n\r\n" + body
+
+
+_CALIBRATION_RE = re.compile(rb"/api/(?P<user>[^/]+)/items")
+
+
+def _calibration():
+    # the same kind of work as hot paths do: to scale results of other machine
+    total = 0
+    for i in range(100):
+        headers = {}
+        for line in b"host: example.com\r\naccept: */*\r\nx-id: 1".split(b"\r\n"):
+            name, value = line.split(b":", 1)
+            headers[name.strip()] = value.strip()
+        total += len(headers) + len(_CALIBRATION_RE.fullmatch(b"/api/%d/items" % i).groupdict())
+    return total
+
+
+def _h2_case() -> Callable:
+    client = H2Connection(H2Configuration(client_side=True))
+    client.initiate_connection()
+    client.send_headers(
+        1,
+        [(":method", "GET"), (":path", "/api/users/42"), (":scheme", "http"), (":authority", "example.com")]
+        + [(name.decode(), value.decode()) for name, value in _HEADERS[:-4]],
+        end_stream=True,
+    )
+    data = client.data_to_send()
+
+    def _case():
+        parser = Http2Parser()
+        parser.connect()
+        parser.handle_request(data)
+
+    return _case
+
+
+def _router_case(path: bytes) -> Callable:
+    router = HttpRouter()
+    for i in range(250):
+        router.add("GET", f"/static/{i}/page", _calibration)
+        router.add("GET", f"/api/{i}/{{user}}/items/{{item}}", _calibration)
+    request = Request(path)
+    request.set("path", path)
+    return lambda: router._resolve(request)  # pylint: disable=protected-access
+
+
+def _pipeline_case(loop: asyncio.AbstractEventLoop) -> Callable:
+    app = Application(components=[PatchRequest(), HttpRouter(), JsonFormat(), AddRequest()])
+
+    @app.route.get("/api/{user}/items")
+    async def _items(request):
+        return {"user": request.user}
+
+    loop.run_until_complete(app.start())
+    handler = app.handler
+
+    async def _many(number: int):
+        for _ in range(number):
+            await handler(Request(b"/api/42/items", headers=_HEADERS))
+
+    def _case(number: int = 1):
+        # one coroutine runs a batch: loop overhead is not part of measurement
+        loop.run_until_complete(_many(number))
+
+    _case.batch = True
+    return _case
+
+
+def get_cases(loop: asyncio.AbstractEventLoop) -> Dict[str, Callable]:
+    headers, small, large = _http1_data(), _http1_data(b"x" * 100), _http1_data(b"x" * 1024 * 1024)
+    simple_parser, tools_parser = Http1Parser(), Http1ParserHttpTools()
+    return {
+        CALIBRATION: _calibration,
+        "request_new": lambda: Request(b"/api/users/42", headers=_HEADERS),
+        "http_simple_headers": lambda: simple_parser.handle_request(headers),
+        "http_simple_small_body": lambda: simple_parser.handle_request(small),
+        "http_tools_headers": lambda: tools_parser.handle_request(headers),
+        "http_tools_large_body": lambda: tools_parser.handle_request(large),
+        "hyper_connection_request": _h2_case(),
+        "router_500_first": _router_case(b"/static/0/page"),
+        "router_500_last": _router_case(b"/api/249/user/items/1"),
+        "router_500_not_found": _router_case(b"/not/found"),
+        "pipeline_json": _pipeline_case(loop),
+    }
+
+
+def measure(case: Callable, min_time: float = 0.2, repeat: int = 5) -> float:
+    """
+    Best time of one call in seconds: number of calls is grown until a run takes min_time
+    """
+    batch = getattr(case, "batch", False)
+
+    def _run(number: int) -> float:
+        start = time.perf_counter()
+        if batch:
+            case(number)
+        else:
+            for _ in range(number):
+                case()
+        return time.perf_counter() - start
+
+    number = 1
+    while _run(number) < min_time / 10:
+        number *= 10
+    return min(_run(number) for _ in range(repeat)) / number
+
+
+def run_rounds(
+    names: Optional[Iterable[str]] = None, min_time: float = 0.2, rounds: int = DEFAULT_ROUNDS
+) -> Dict[str, List[float]]:
+    """
+    Times of one call of each case in every round: rounds go one after another, so slow period of machine
+    affects all cases of a round alike
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        cases = get_cases(loop)
+        names = [name for name in names or cases if name != CALIBRATION]
+        results: Dict[str, List[float]] = {CALIBRATION: [], **{name: [] for name in names}}
+        for _ in range(rounds):
+            results[CALIBRATION].append(measure(_calibration, min_time))
+            for name in names:
+                results[name].append(measure(cases[name], min_time))
+        return results
+    finally:
+        loop.close()
+
+
+def get_best(rounds: Dict[str, List[float]]) -> Dict[str, float]:
+    """
+    Best time of each case and calibration: noise of the machine makes rounds only slower
+    """
+    return {name: min(times) for name, times in rounds.items()}
+
+
+def run(names: Optional[Iterable[str]] = None, min_time: float = 0.2, rounds: int = DEFAULT_ROUNDS) -> Dict[str, float]:
+    return get_best(run_rounds(names, min_time, rounds))
+
+
+def get_spread(rounds: Dict[str, List[float]]) -> Dict[str, float]:
+    """
+    Relative spread of rounds of calibrated times: (max - min) / median
+    """
+    calibration = rounds[CALIBRATION]
+    spread = {}
+    for name, times in rounds.items():
+        if name == CALIBRATION:
+            continue
+        scaled = [time_ / calibration_ for time_, calibration_ in zip(times, calibration)]
+        spread[name] = (max(scaled) - min(scaled)) / statistics.median(scaled)
+    return spread
+
+
+def compare(
+    results: Dict[str, float],
+    baseline: Dict[str, float],
+    tolerance: float = DEFAULT_TOLERANCE,
+    spread: Optional[Dict[str, float]] = None,
+    max_spread: float = DEFAULT_MAX_SPREAD,
+) -> List[Tuple[str, float, float]]:
+    """
+    Regressions as (name, result, allowed): results are scaled by calibration to get rid of machine speed,
+    allowed difference is tolerance and spread of case measured for baseline, capped by max_spread
+    """
+    scale = 1.0
+    if results.get(CALIBRATION) and baseline.get(CALIBRATION):
+        scale = baseline[CALIBRATION] / results[CALIBRATION]
+    spread = spread or {}
+    regressions = []
+    for name, result in results.items():
+        if name == CALIBRATION or name not in baseline:
+            continue
+        allowed = baseline[name] * (1 + tolerance + min(spread.get(name, 0.0), max_spread))
+        if result * scale > allowed:
+            regressions.append((name, result * scale, allowed))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m levin.bench.micro", description="Micro benchmarks of hot paths")
+    parser.add_argument("names", nargs="*", help="cases to run, all by default")
+    parser.add_argument("--baseline", default="benchmarks/micro.json")
+    parser.add_argument("--update", action="store_true", help="write results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="best of rounds is compared")
+    parser.add_argument("--max-spread", type=float, default=DEFAULT_MAX_SPREAD, help="cap of spread added to tolerance")
+    args = parser.parse_args(argv)
+
+    rounds = run_rounds(args.names, args.min_time, args.rounds)
+    results = get_best(rounds)
+    for name, result in results.items():
+        sys.stdout.write(f"{name:30} {result * 1e6:12.2f} us\n")
+    if args.update:
+        with open(args.baseline, "w") as file_:
+            json.dump({"results": results, "spread": get_spread(rounds)}, file_, indent=2)
+        return 0
+    try:
+        with open(args.baseline) as file_:
+            baseline = json.load(file_)
+    except FileNotFoundError:
+        sys.stdout.write(f"No baseline {args.baseline}, run with --update to create it\n")
+        return 0
+    if "results" not in baseline:  # baseline of plain results without spread
+        baseline = {"results": baseline}
+    regressions = compare(results, baseline["results"], args.tolerance, baseline.get("spread"), args.max_spread)
+    for name, result, allowed in regressions:
+        sys.stdout.write(f"REGRESSION {name}: {result * 1e6:.2f} us > {allowed * 1e6:.2f} us\n")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import asyncio
+import multiprocessing
+import socket
+import time
+from contextlib import contextmanager
+
+from levin.asgi import ASGIHost
+from levin.core.server import Server, run
+from levin.utils.imports import import_string
+
+
+def _run_server(app_path: str, host: str, port: int):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    app = import_string(app_path)
+    if not hasattr(app, "handler"):  # third-party ASGI application
+        app = ASGIHost(app)
+    run(Server(app, host=host, port=port), loop=loop, stop_event=asyncio.Event())
+
+
+def _wait_port(host: str, port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=0.1):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@contextmanager
+def serve(app_path: str, host: str = "127.0.0.1", port: int = 8000, timeout: float = 10.0):
+    """
+    Run application ("module:attr", levin or ASGI) in separate process, so load generator does not share the loop with it
+    """
+    process = multiprocessing.Process(target=_run_server, args=(app_path, host, port), daemon=True)
+    process.start()
+    try:
+        _wait_port(host, port, timeout)
+        yield process
+    finally:
+        process.terminate()
+        process.join()
@@ -1,10 +1,42 @@
-from .cli import Cli
-from .common import ErrorHandle, PatchRequest
-from .limit import TimeLimit
-from .h2 import Push
-from .concurrent import RunProcess, SyncToAsync
-from .formating import JsonFormat, TemplateFormat, TextFormat
-from .logger import LoggerComponent
-from .profiling import ProfileHandler
-from .router import HttpRouter
-from .inject import AddRequest, InjectFromScope
\ No newline at end of file
+from importlib import import_module
+
+# components are imported on first access: application imports only what it uses
+_COMPONENTS = {
+    "Admission": ".admission",
+    "Cli": ".cli",
+    "ErrorHandle": ".common",
+    "PatchRequest": ".common",
+    "RateLimit": ".limit",
+    "TimeLimit": ".limit",
+    "Push": ".h2",
+    "AdaptiveExecutor": ".concurrent",
+    "RunProcess": ".concurrent",
+    "SyncToAsync": ".concurrent",
+    "JsonFormat": ".formating",
+    "TemplateFormat": ".formating",
+    "TextFormat": ".formating",
+    "LoggerComponent": ".logger",
+    "Metrics": ".metrics",
+    "ProfileHandler": ".profiling",
+    "HttpRouter": ".router",
+    "AddRequest": ".inject",
+    "InjectFromScope": ".inject",
+    "Watchdog": ".watchdog",
+}
+
+__all__ = list(_COMPONENTS)
+
+
+def __getattr__(name):
+    if name in _COMPONENTS:
+        value = getattr(import_module(_COMPONENTS[name], __name__), name)
+    elif name in {module[1:] for module in _COMPONENTS.values()}:
+        value = import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_COMPONENTS))
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Dict, Optional
+
+from levin.core.common import Request, Response
+from levin.core.component import Component
+from levin.utils.limiter import Limiter
+from levin.utils.loop import LoopLag
+
+
+class Admission(Component):
+    """Limit in-flight requests and shed load with 503"""
+
+    name = "admission"
+
+    max_concurrency: int = 1024
+    max_queue: int = 1024
+    queue_timeout: float = 5.0
+    max_lag: float = 0.5
+    lag_interval: float = 0.1
+    retry_after: int = 1
+    status: int = 503
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._global: Optional[Limiter] = None
+        self._routes: Dict[bytes, Limiter] = {}
+        self._lag = LoopLag()
+        self._router = None
+        self._rejected = 0
+
+    def start(self, app):
+        self._global = Limiter(self.max_concurrency, self.max_queue)
+        self._router = app.get_component("route")
+        if self.max_lag:
+            self._lag.interval = self.lag_interval
+            self._lag.start()
+
+    def stop(self, app):
+        self._lag.stop()
+
+    @property
+    def lag(self) -> float:
+        return self._lag.value
+
+    @property
+    def rejected(self) -> int:
+        return self._rejected
+
+    def collect_metrics(self):
+        yield "event_loop_lag_seconds", "gauge", "Event loop lag", (({}, self._lag.value),)
+        yield "admission_rejected_total", "counter", "Requests shed by admission", (({}, self._rejected),)
+        yield "admission_queued", "gauge", "Requests waiting for admission", (
+            ({"route": pattern.decode()}, limiter.queued)
+            for pattern, limiter in [(b"*", self._global), *self._routes.items()]
+        )
+
+    def _reject(self) -> Response:
+        self._rejected += 1
+        return Response(
+            status=self.status,
+            body=b"Service Unavailable",
+            headers={b"retry-after": str(self.retry_after).encode()},
+        )
+
+    def _get_route_limiter(self, request: Request) -> Optional[Limiter]:
+        if self._router is None:
+            return None
+        meta = self._router.match(request)[1]
+        if not meta or "max_concurrency" not in meta:
+            return None
+        limiter = self._routes.get(meta["pattern"])
+        if limiter is None:
+            limiter = Limiter(meta["max_concurrency"], meta.get("max_queue", self.max_queue))
+            self._routes[meta["pattern"]] = limiter
+        return limiter
+
+    async def middleware(self, request: Request, handler, call_next):
+        if self.max_lag and self._lag.value > self.max_lag:
+            return self._reject()
+        route_limiter = self._get_route_limiter(request)
+        if route_limiter is not None and not await route_limiter.acquire(self.queue_timeout):
+            return self._reject()
+        try:
+            if not await self._global.acquire(self.queue_timeout):
+                return self._reject()
+            try:
+                return await call_next(request, handler)
+            finally:
+                self._global.release()
+        finally:
+            if route_limiter is not None:
+                route_limiter.release()
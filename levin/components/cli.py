@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import inspect
 import sys
 from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Union
@@ -45,6 +46,9 @@ class Cli(Component):
         if issubclass(_type, bool):
             yield {"dest": f"--{param.name}", "default": param.default, "required": False, "action": "store_true"}
 
+        elif param.kind is param.KEYWORD_ONLY:
+            yield {"dest": f"--{param.name}", "default": param.default, "required": False, "type": _type}
+
         elif param.default is not param.empty:
             yield {
                 "option_strings": f"{param.name}",
@@ -108,12 +112,73 @@ class Cli(Component):
             self._cli_component(argv)
 
     @command
-    def run(self, port: int = 8000, host: str = "0.0.0.0", ssl_cert: str = "", ssl_key: str = ""):
-        """Run server for current app"""
+    def run(
+        self,
+        port: int = 8000,
+        host: str = "0.0.0.0",
+        ssl_cert: str = "",
+        ssl_key: str = "",
+        h2_window: int = 0,
+        h2_max_streams: int = 0,
+        h2_auto_window: bool = False,
+        *,
+        bind: str = "",
+        systemd: bool = False,
+        ssl_ciphers: str = "",
+        ssl_curve: str = "",
+        ssl_tickets: Optional[int] = None,
+    ):  # pylint: disable=too-many-arguments,too-many-locals
+        """
+        Run server for current app: bind - comma separated listeners instead of host and port
+        ("host:port", "unix:/path/to.sock", "fd://3"), systemd - listen sockets of systemd socket activation,
+        ssl_tickets - TLS 1.3 session tickets per handshake
+        """
         ssl = None
         if ssl_key and ssl_cert:
             ssl = (ssl_cert, ssl_key)
-        self.app.run(host, port, ssl=ssl)
+        ssl_options = {"ciphers": ssl_ciphers or None, "ecdh_curve": ssl_curve or None, "num_tickets": ssl_tickets}
+        h2_settings = {}
+        if h2_window:
+            h2_settings["initial_window_size"] = h2_window
+        if h2_max_streams:
+            h2_settings["max_concurrent_streams"] = h2_max_streams
+        binds = [bind_.strip() for bind_ in bind.split(",") if bind_.strip()]
+        if systemd:
+            binds.append("systemd")
+        self.app.run(
+            host,
+            port,
+            ssl=ssl,
+            h2_settings=h2_settings,
+            h2_auto_window=h2_auto_window,
+            bind=binds,
+            ssl_options=ssl_options,
+        )
+
+    @command
+    def bench(
+        self, path: str = "", method: str = "GET", requests: int = 10000, protocol: str = "direct", concurrency: int = 1
+    ):  # pylint: disable=too-many-arguments
+        """Measure throughput of route (all static by default) in process: direct, http1 or h2 protocol"""
+        from levin.testing import Client, bench  # pylint: disable=import-outside-toplevel
+
+        paths = [path.encode()]
+        if not path:
+            paths = [pattern for pattern in self.app.route.get_patterns(method.encode()) if b"{" not in pattern]
+
+        async def _bench():
+            async with Client(self.app, protocol) as client:
+                return [await bench(client, _path, method, requests, concurrency) for _path in paths]
+
+        lines = []
+        for summary in asyncio.run(_bench()):
+            latency = summary["latency"]
+            lines.append(
+                f"{method} {summary['scenario']}: {summary['rps']:.0f} rps, "
+                f"p50 {(latency['p50'] or 0) * 1e6:.0f} us, p99 {(latency['p99'] or 0) * 1e6:.0f} us, "
+                f"errors {summary['errors']}"
+            )
+        return "\n".join(lines)
 
     @command
     def components(self, values: bool = False, component: Optional[str] = None):
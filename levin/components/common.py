@@ -6,17 +6,22 @@ import sys
 
 from levin.core.common import Request, Response
 from levin.core.component import Component
-from better_exceptions import excepthook, ExceptionFormatter, to_byte
 
 DEFAULT_ENCODING = "iso-8859-1"
 CONTENT_TYPE_HEADER = b"content-type"
 
-formatter = ExceptionFormatter(colored=False, pipe_char='|', cap_char='->')
+_formatter = None
 
 
 def _default_on_error(request, exception):
+    global _formatter  # pylint: disable=global-statement
+    # better_exceptions is slow to import: only on first error
+    from better_exceptions import excepthook, ExceptionFormatter, to_byte  # pylint: disable=import-outside-toplevel
+
+    if _formatter is None:
+        _formatter = ExceptionFormatter(colored=False, pipe_char='|', cap_char='->')
     excepthook(exception.__class__, exception, sys.exc_info()[2])
-    return Response(status=500, body=to_byte(formatter.format_exception(exception.__class__, exception, sys.exc_info()[2])))
+    return Response(status=500, body=to_byte(_formatter.format_exception(exception.__class__, exception, sys.exc_info()[2])))
 
 
 class ErrorHandle(Component):
@@ -41,13 +46,16 @@ class PatchRequest(Component):
     parse_url = staticmethod(urlparse)
     parse_query_params = staticmethod(parse_qs)
 
-    def middleware(self, request: Request, handler, call_next):
+    def patch(self, request: Request):
         request.set("data", self._data, lazy=True)
         request.set("path", self._path, lazy=True)
         request.set("query_params", self._query_params, lazy=True)
         request.set("json", self._json, lazy=True)
         request.set("content_type", self._content_type, lazy=True)
         request.set("encoding", self._encoding, lazy=True)
+
+    def middleware(self, request: Request, handler, call_next):
+        self.patch(request)
         return call_next(request, handler)
 
     def _json(self, request: Request) -> Optional[dict]:
@@ -1,20 +1,134 @@
 import asyncio
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
 
+from levin.core.common import Request, Response
 from levin.core.component import Component
+from levin.utils.imports import import_string
+from levin.utils.limiter import Limiter
+
+logger = logging.getLogger(__name__)
+_worker_app = None  # application of worker process - handlers are resolved by route in it
+
+
+def _shared_memory(**kwargs):
+    # multiprocessing is imported only when process pool is used
+    from multiprocessing.shared_memory import SharedMemory  # pylint: disable=import-outside-toplevel
+
+    return SharedMemory(**kwargs)
+
+
+class SharedBytes:
+    """
+    Reference to bytes placed in shared memory - pickled instead of the bytes themselves
+    """
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+    def __reduce__(self):
+        return SharedBytes, (self.name, self.size)
+
+    @classmethod
+    def create(cls, data: bytes) -> "SharedBytes":
+        memory = _shared_memory(create=True, size=len(data))
+        try:
+            memory.buf[: len(data)] = data
+            return cls(memory.name, len(data))
+        finally:
+            memory.close()
+
+    def read(self, unlink: bool = False) -> bytes:
+        memory = _shared_memory(name=self.name)
+        try:
+            return bytes(memory.buf[: self.size])
+        finally:
+            memory.close()
+            if unlink:
+                memory.unlink()
+
+    def unlink(self):
+        try:
+            memory = _shared_memory(name=self.name)
+        except FileNotFoundError:
+            return
+        memory.close()
+        memory.unlink()
+
+
+def _share(result, threshold: int):
+    if isinstance(result, bytes) and len(result) >= threshold:
+        return SharedBytes.create(result)
+    if isinstance(result, Response) and isinstance(result.body, bytes) and len(result.body) >= threshold:
+        result.body = SharedBytes.create(result.body)
+    return result
+
+
+def _unshare(result):
+    if isinstance(result, SharedBytes):
+        return result.read(unlink=True)
+    if isinstance(result, Response) and isinstance(result.body, SharedBytes):
+        result.body = result.body.read(unlink=True)
+    return result
+
+
+def _discard_result(future):
+    # result of worker nobody waits for (request cancelled): its shared memory is removed
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if isinstance(result, Response):
+        result = result.body
+    if isinstance(result, SharedBytes):
+        result.unlink()
+
+
+def _init_worker(app):
+    global _worker_app  # pylint: disable=global-statement
+    _worker_app = import_string(app) if isinstance(app, str) else app
+
+
+def _warmup():
+    return True
+
+
+def _run_in_worker(route: Optional[Tuple[bytes, bytes]], handler, request: Request, threshold: int):
+    if route is not None:
+        handler = _worker_app.get_component("route").get_handler(*route)
+        if handler is None:  # application of worker differs from the one of server
+            logger.error("Route %s %s is not found in worker", route[0].decode(), route[1].decode())
+            return Response(500, b"Internal Server Error")
+        patch = _worker_app.get_component("patch_request")
+        if patch is not None:
+            patch.patch(request)
+    if isinstance(request.body, SharedBytes):
+        request.body = request.body.read()
+    return _share(handler(request), threshold)
 
 
 class _Executor(Component):
-    executor_class = ThreadPoolExecutor
+    executor_class = ThreadPoolExecutor  # or "module:attr" to import on start
     executor_kwargs = {}
-    max_workers = 2 * multiprocessing.cpu_count() + 1
+    max_workers = 2 * (os.cpu_count() or 1) + 1
 
     def start(self, app):
-        self._executor = self.executor_class(
+        self._executor = self._get_executor_class()(
             max_workers=self.max_workers, **self.executor_kwargs
         )  # pylint: disable=attribute-defined-outside-init
 
+    def _get_executor_class(self):
+        if isinstance(self.executor_class, str):
+            return import_string(self.executor_class)
+        return self.executor_class
+
     def stop(self, app):
         self._executor.shutdown(wait=True)
 
@@ -34,19 +148,333 @@ class _Executor(Component):
         return await call_next(request, handler)
 
 
+class _Pool:
+    """
+    Bulkhead: thread pool of routes with bounded queue and concurrency adapted to queue wait and service time
+    """
+
+    __slots__ = ("executor", "limiter", "min_workers", "max_workers", "wait", "service", "rejected", "_best", "_done")
+
+    ALPHA = 0.2
+    ADJUST_EVERY = 8
+
+    def __init__(self, name: str, min_workers: int = 1, max_workers: int = 8, max_queue: int = 64):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{__name__}.{name}")
+        self.limiter = Limiter(min_workers, max_queue)
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.wait = 0.0  # moving average of queue wait
+        self.service = 0.0  # moving average of handler time
+        self.rejected = 0
+        self._best = 0.0
+        self._done = 0
+
+    def observe(self, wait: float, service: float):
+        self.wait += (wait - self.wait) * self.ALPHA
+        self.service += (service - self.service) * self.ALPHA
+        self._done += 1
+        if self._done % self.ADJUST_EVERY == 0:
+            self._adjust()
+
+    def _adjust(self):
+        if not self._best or self.service < self._best:
+            self._best = self.service
+        limit = self.limiter.limit
+        if self.service > 2 * self._best:
+            # threads contend for something: more of them only make each request slower
+            limit -= 1
+            self._best *= 1.1  # let the baseline follow changed conditions
+        elif self.wait > 0.1 * self.service and self.limiter.queued:
+            limit += 1
+        elif not self.limiter.queued and self.limiter.active < limit // 2:
+            limit -= 1
+        self.limiter.set_limit(min(max(limit, self.min_workers), self.max_workers))
+
+
 class SyncToAsync(_Executor):
     name = "sync_to_async"
     executor_kwargs = {"thread_name_prefix": __name__}
 
+    pools: Dict[str, dict] = {}  # settings of pools by name: min_workers, max_workers, max_queue
+    pool_queue_timeout: float = 5.0
+    status: int = 503
+    get_time: Callable = staticmethod(time.perf_counter)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pools: Dict[str, _Pool] = {}
+
+    def stop(self, app):
+        super().stop(app)
+        for pool in self._pools.values():
+            pool.executor.shutdown(wait=True)
+        self._pools = {}
+
     @staticmethod
     def condition(request, handler):
         return not asyncio.iscoroutinefunction(handler) and not request.get("process", False)
 
+    def _get_pool(self, name: str) -> _Pool:
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = self._pools[name] = _Pool(name, **self.pools.get(name, {}))
+        return pool
+
+    def collect_metrics(self):
+        pools = [({"pool": name}, pool) for name, pool in self._pools.items()]
+        yield "pool_queue_wait_seconds", "gauge", "Moving average of queue wait", ((l, p.wait) for l, p in pools)
+        yield "pool_service_seconds", "gauge", "Moving average of handler time", ((l, p.service) for l, p in pools)
+        yield "pool_limit", "gauge", "Current concurrency of pool", ((l, p.limiter.limit) for l, p in pools)
+        yield "pool_active", "gauge", "Running handlers", ((l, p.limiter.active) for l, p in pools)
+        yield "pool_queued", "gauge", "Handlers waiting for thread", ((l, p.limiter.queued) for l, p in pools)
+        yield "pool_rejected_total", "counter", "Requests rejected by full pool", ((l, p.rejected) for l, p in pools)
+
+    def _call_in_pool(self, pool: _Pool, handler):
+        async def _handler(request):
+            start = self.get_time()
+            if not await pool.limiter.acquire(self.pool_queue_timeout):
+                pool.rejected += 1
+                return Response(self.status, b"Service Unavailable")
+            started = self.get_time()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool.executor, handler, request)
+            finally:
+                pool.limiter.release()
+                pool.observe(started - start, self.get_time() - started)
+
+        return _handler
+
+    async def middleware(self, request, handler, call_next):
+        if self.condition(request, handler):
+            pool = request.get("pool")
+            handler = self._call_in_pool(self._get_pool(pool), handler) if pool else self._call(handler)
+        return await call_next(request, handler)
+
 
 class RunProcess(_Executor):
     name = "process_executor"
-    executor_class = ProcessPoolExecutor
+    executor_class = "concurrent.futures:ProcessPoolExecutor"
+    _forks = True  # started before components with threads
+
+    shm_threshold: int = 64 * 1024  # bodies from this size go through shared memory instead of pipe
+    app_path: str = ""  # "module:attr" of application to import in workers if they are not forked
+    warmup: bool = True  # start workers with the server if any route runs in process
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._by_route = False
+
+    async def start(self, app):
+        import multiprocessing  # pylint: disable=import-outside-toplevel
+
+        context = self.executor_kwargs.get("mp_context") or multiprocessing.get_context()
+        worker_app = self.app_path or (app if context.get_start_method() == "fork" else None)
+        self._by_route = worker_app is not None
+        self._executor = self._get_executor_class()(  # pylint: disable=attribute-defined-outside-init
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(worker_app,),
+            **self.executor_kwargs,
+        )
+        router = app.get_component("route")
+        adaptive = app.get_component("adaptive_executor")
+        uses_process = router is not None and router.uses_meta("process") or adaptive is not None and adaptive.enable
+        if self.warmup and uses_process:  # fork workers now, before threads of other components are started
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _warmup) for _ in range(self.max_workers)))
 
     @staticmethod
     def condition(request, handler):
         return request.get("process", False)
+
+    def _call(self, handler):
+        async def _handler(request):
+            route, handler_ = None, handler
+            if self._by_route and request.get("pattern"):
+                route, handler_ = (request.method, request.pattern), None
+            body = request.body
+            if len(body) >= self.shm_threshold:
+                body = SharedBytes.create(body)
+            future = self._executor.submit(_run_in_worker, route, handler_, request.copy(body=body), self.shm_threshold)
+            if isinstance(body, SharedBytes):
+                future.add_done_callback(lambda _: body.unlink())  # worker has read it
+            try:
+                result = await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                future.add_done_callback(_discard_result)
+                raise
+            return _unshare(result)
+
+        return _handler
+
+
+class Decision:
+    __slots__ = ("time", "route", "action", "cpu_ratio", "cost")
+
+    def __init__(self, route: bytes, action: str, cpu_ratio: float, cost: float):
+        self.time = time.time()
+        self.route = route
+        self.action = action
+        self.cpu_ratio = cpu_ratio
+        self.cost = cost
+
+    def __repr__(self):
+        return f"Decision({self.route}, {self.action}, ratio={self.cpu_ratio:.2f}, cost={self.cost:.4f}s)"
+
+
+def _log_decision(decision: Decision):
+    logger.warning(
+        "Route %s: %s (cpu/wall %.2f, %.4fs per request)",
+        decision.route.decode(),
+        decision.action,
+        decision.cpu_ratio,
+        decision.cost,
+    )
+
+
+class _RouteCost:
+    __slots__ = ("cpu_ratio", "cpu", "step", "samples", "requests", "offloaded", "blocking")
+
+    def __init__(self):
+        self.cpu_ratio = 0.0
+        self.cpu = 0.0  # moving average of cpu time of sync handler
+        self.step = 0.0  # moving average of the longest step of async handler
+        self.samples = 0
+        self.requests = 0
+        self.offloaded = False
+        self.blocking = False
+
+
+class _Steps:
+    """
+    Drive coroutine and measure the longest step between awaits - time it holds the loop
+    """
+
+    __slots__ = ("_coro", "longest")
+
+    def __init__(self, coro):
+        self._coro = coro
+        self.longest = 0.0
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                yielded = self._coro.throw(error) if error is not None else self._coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.longest = max(self.longest, time.perf_counter() - start)
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:  # pylint: disable=broad-except
+                value, error = None, exc  # cancellation too: the coroutine handles it or re-raises
+
+
+class AdaptiveExecutor(Component):
+    """Move CPU bound sync handlers to process pool and detect async handlers that block the loop"""
+
+    name = "adaptive_executor"
+
+    high_ratio: float = 0.8  # cpu/wall time ratio to move route to process pool
+    low_ratio: float = 0.5  # ratio to move it back to threads
+    min_cost: float = 0.005  # process pool round trip does not pay off for cheaper handlers
+    min_samples: int = 20
+    probe_every: int = 32  # each n-th request of offloaded route runs in thread to be measured
+    block_threshold: float = 0.02  # async handler step longer than this blocks the loop
+    history: int = 100
+    on_decision: Callable = staticmethod(_log_decision)
+
+    ALPHA = 0.2
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._routes: Dict[bytes, _RouteCost] = {}
+        self._decisions = deque(maxlen=self.history)
+        self._router = None
+
+    def start(self, app):
+        self._router = app.get_component("route")
+
+    @property
+    def decisions(self) -> List[Decision]:
+        return list(self._decisions)
+
+    def collect_metrics(self):
+        routes = [({"route": route.decode()}, cost) for route, cost in self._routes.items()]
+        yield "adaptive_cpu_ratio", "gauge", "Moving average of cpu/wall time", ((l, c.cpu_ratio) for l, c in routes)
+        yield "adaptive_offloaded", "gauge", "Route runs in process pool", ((l, int(c.offloaded)) for l, c in routes)
+        yield "adaptive_blocking", "gauge", "Async route blocks the loop", ((l, int(c.blocking)) for l, c in routes)
+
+    def _decide(self, route: bytes, action: str, cpu_ratio: float, cost: float):
+        decision = Decision(route, action, cpu_ratio, cost)
+        self._decisions.append(decision)
+        self.on_decision(decision)
+
+    def _observe_sync(self, route: bytes, cost: _RouteCost, cpu: float, wall: float):
+        cost.samples += 1
+        alpha = max(self.ALPHA, 1 / cost.samples)  # plain mean until there are enough samples
+        cost.cpu_ratio += ((min(cpu / wall, 1.0) if wall else 0.0) - cost.cpu_ratio) * alpha
+        cost.cpu += (cpu - cost.cpu) * alpha
+        if cost.samples < self.min_samples:
+            return
+        if not cost.offloaded and cost.cpu_ratio >= self.high_ratio and cost.cpu >= self.min_cost:
+            cost.offloaded = True
+            self._decide(route, "move to process pool", cost.cpu_ratio, cost.cpu)
+        elif cost.offloaded and (cost.cpu_ratio <= self.low_ratio or cost.cpu < self.min_cost / 2):
+            cost.offloaded = False
+            self._decide(route, "move back to threads", cost.cpu_ratio, cost.cpu)
+
+    def _observe_async(self, route: bytes, cost: _RouteCost, step: float):
+        cost.samples += 1
+        cost.step += (step - cost.step) * max(self.ALPHA, 1 / cost.samples)
+        if not cost.blocking and step >= self.block_threshold:
+            cost.blocking = True
+            self._decide(route, "blocks the loop", 1.0, step)
+        elif cost.blocking and cost.samples >= self.min_samples and cost.step < self.block_threshold / 2:
+            cost.blocking = False
+            self._decide(route, "stopped blocking the loop", 1.0, cost.step)
+
+    def _measure_sync(self, route: bytes, cost: _RouteCost, handler):
+        loop = asyncio.get_running_loop()
+
+        @wraps(handler)
+        def _handler(*args, **kwargs):
+            cpu, wall = time.thread_time(), time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                # handler runs in worker thread: statistics of route are changed in the loop only
+                loop.call_soon_threadsafe(
+                    self._observe_sync, route, cost, time.thread_time() - cpu, time.perf_counter() - wall
+                )
+
+        return _handler
+
+    def _measure_async(self, route: bytes, cost: _RouteCost, handler):
+        @wraps(handler)
+        async def _handler(*args, **kwargs):
+            steps = _Steps(handler(*args, **kwargs))
+            try:
+                return await steps
+            finally:
+                self._observe_async(route, cost, steps.longest)
+
+        return _handler
+
+    async def middleware(self, request: Request, handler, call_next):
+        meta = self._router.match(request)[1] if self._router is not None else {}
+        if "pattern" not in meta or "process" in meta:  # not found or placed by hand
+            return await call_next(request, handler)
+        route = request.method + b" " + meta["pattern"]
+        cost = self._routes.get(route)
+        if cost is None:
+            cost = self._routes[route] = _RouteCost()
+        if asyncio.iscoroutinefunction(handler):
+            return await call_next(request, self._measure_async(route, cost, handler))
+        cost.requests += 1
+        if cost.offloaded and cost.requests % self.probe_every:
+            request.set("process", True, rewrite=True)
+            return await call_next(request, handler)
+        return await call_next(request, self._measure_sync(route, cost, handler))
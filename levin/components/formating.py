@@ -65,25 +65,28 @@ class TemplateFormat(Component):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._templates = {}
+        self._templates = {}  # name -> content, templates are read on first use
+        self._paths = None  # name -> path, directories are walked once
 
-    def init(self, app):
+    def _walk(self):
         for _dir in self.templates_dirs:
             for root, _, files in os.walk(_dir):
-                self._check_and_save(files, root)
-
-    def _check_and_save(self, files, root: str):
-        for file_ in files:
-            if not file_.endswith(self.templates_formats):
-                continue
-            with open(os.path.join(root, file_)) as open_file:
-                self._templates[(root, file_)] = open_file.read()
+                for file_ in files:
+                    if file_.endswith(self.templates_formats):
+                        yield root, file_
 
     def _get_template(self, name):
-        for _, file_ in self._templates:
-            if file_ == name:
-                return self._templates[(_, file_)]
-        return None
+        if name not in self._templates:
+            if self._paths is None:
+                self._paths = {}
+                for root, file_ in self._walk():
+                    self._paths.setdefault(file_, os.path.join(root, file_))
+            path = self._paths.get(name)
+            if path is None:
+                return None
+            with open(path) as open_file:
+                self._templates[name] = open_file.read()
+        return self._templates[name]
 
     def render(self, path, context: dict, request=None):
         template = self._get_template(path)
@@ -117,4 +120,4 @@ class TemplateFormat(Component):
 
     @command
     def list(self):
-        return self._templates.keys()
+        return "\n".join(os.path.join(root, file_) for root, file_ in self._walk())
@@ -1,27 +1,119 @@
-from typing import Union
+import time
+import zlib
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+from typing import Callable, Dict, List, Set, Tuple, Union
 
-from levin.core.common import Request, Response, Push as _Push
+from levin.core.common import MultiHeaders, Request, Response, Push as _Push
 from levin.core.component import Component
 
 
+def _get_cookie(request: Request, name: bytes) -> bytes:
+    for cookie in (request.headers.get(b"cookie") or b"").split(b";"):
+        key, _, value = cookie.strip().partition(b"=")
+        if key == name:
+            return value
+    return b""
+
+
+def _is_public(response: Response) -> bool:
+    for name, value in response.headers.items():
+        if name.lower() == b"cache-control":
+            return b"public" in [directive.strip().lower() for directive in value.split(b",")]
+    return False
+
+
 class Push(Component):
+    """
+    Server push with cookie cache digest of pushed resources and cache of their responses.
+    Only responses with `Cache-Control: public` are cached: push requests carry headers of the parent request
+    """
+
     name = "push"
     _scope_value = "_pushes"
 
+    cookie_name: bytes = b"levin-push"  # empty to disable cache digest
+    cookie_max_age: int = 24 * 60 * 60  # how long client is expected to keep pushed resources
+    version: str = ""  # change to push resources again to clients with old digest
+    max_digest: int = 64
+    cache_ttl: float = 60.0  # 0 to disable cache of push responses
+    cache_size: int = 256
+    get_time: Callable = staticmethod(time.monotonic)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._cache: Dict[Tuple[bytes, bytes], Tuple[float, Response]] = OrderedDict()
+
     async def middleware(self, request: Request, handler, call_next) -> Response:
+        if request.get("is_push") and self.cache_ttl:
+            return await self._cached(request, handler, call_next)
         request.set("add_push", self._create_add_push, lazy=True)
         response: Response = await call_next(request, handler)
         if request.get(self._scope_value):
             response.pushes = request.get(self._scope_value)
         if request.get("push"):
             response.pushes.append(_Push(path=request.get("push").format(**request._scope).encode(),))
+        if response.pushes and self.cookie_name and request.get("push_support"):
+            self._apply_digest(request, response)
         return response
 
+    def _digest(self, push: _Push) -> bytes:
+        return zlib.crc32(self.version.encode() + push.method + b" " + push.path).to_bytes(4, "big")
+
+    def _read_digest(self, request: Request) -> List[bytes]:
+        try:
+            value = urlsafe_b64decode(_get_cookie(request, self.cookie_name))
+        except (DecodeError, ValueError):
+            return []
+        return [value[i : i + 4] for i in range(0, len(value) - len(value) % 4, 4)]
+
+    def _apply_digest(self, request: Request, response: Response):
+        """
+        Skip pushes of resources the client has got already and remember new ones in cookie
+        """
+        digest = self._read_digest(request)
+        known: Set[bytes] = set(digest)
+        pushes = []
+        for push in response.pushes:
+            push_digest = self._digest(push)
+            if push_digest not in known:
+                known.add(push_digest)
+                digest.append(push_digest)
+                pushes.append(push)
+        response.pushes = pushes
+        if pushes:
+            value = urlsafe_b64encode(b"".join(digest[-self.max_digest :]))
+            if not isinstance(response.headers, MultiHeaders):
+                response.headers = MultiHeaders(response.headers.items())
+            response.headers.add(
+                b"set-cookie",
+                self.cookie_name + b"=" + value + b"; Max-Age=" + str(self.cookie_max_age).encode() + b"; Path=/",
+            )
+
+    async def _cached(self, request: Request, handler, call_next) -> Response:
+        key = (request.method, request.raw_path)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > self.get_time():
+            response = cached[1]
+        else:
+            response = await call_next(request, handler)
+            if response.status != 200 or not _is_public(response):
+                return response
+            self._cache.pop(key, None)
+            self._cache[key] = (self.get_time() + self.cache_ttl, response)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        # writing the response changes headers
+        return Response(response.status, response.body, headers=MultiHeaders(response.headers.items()))
+
     def _create_add_push(self, request: Request):
 
         def add(path: Union[str, bytes], method: Union[str, bytes] = b"GET"):
             if isinstance(path, str):
                 path = path.encode()
+            if isinstance(method, str):
+                method = method.encode()
             pushes = request.get(self._scope_value, [])
             pushes.append(_Push(path, method))
             request.set(self._scope_value, pushes, rewrite=True)
@@ -1,4 +1,8 @@
 import asyncio
+import math
+import time
+from array import array
+from typing import Callable, Optional, Tuple
 
 from levin.core.common import Request, Response
 from levin.core.component import Component
@@ -28,4 +32,104 @@ class TimeLimit(Component):
         except asyncio.CancelledError:
             return Response(status=500, body=b"Timeout")
         finally:
-            timeout_task.cancel()
\ No newline at end of file
+            timeout_task.cancel()
+
+
+class _Buckets:
+    """
+    Token buckets in a fixed size table of small sets: a key hash picks a set of `ways` buckets and the bucket
+    with the same key hash in it, lazily refilled on access. A new key takes the bucket of the set with the most
+    tokens (unused, idle or full), so colliding keys never share tokens and nobody is locked out by others' keys
+    """
+
+    __slots__ = ("size", "ways", "_keys", "_tokens", "_stamps")
+
+    def __init__(self, size: int, ways: int = 4):
+        self.ways = min(ways, size)
+        self.size = size - size % self.ways
+        self._keys = array("q", [0]) * self.size
+        self._tokens = array("d", [0.0]) * self.size
+        self._stamps = array("d", [-math.inf]) * self.size  # unused bucket is full
+
+    def _find(self, key: int, now: float, rate: float, burst: float) -> Tuple[int, float]:
+        first = key % (self.size // self.ways) * self.ways
+        index, most = first, -1.0
+        for _index in range(first, first + self.ways):
+            tokens = min(self._tokens[_index] + (now - self._stamps[_index]) * rate, burst)
+            if self._keys[_index] == key and self._stamps[_index] != -math.inf:
+                return _index, tokens
+            if tokens > most:
+                index, most = _index, tokens
+        self._keys[index] = key
+        return index, burst  # evicted bucket had the most tokens: its key loses the least
+
+    def take(self, key: int, now: float, rate: float, burst: float) -> float:
+        """
+        Take one token, return 0 on success or seconds to wait for the next token
+        """
+        index, tokens = self._find(key, now, rate, burst)
+        self._stamps[index] = now
+        if tokens < 1:
+            self._tokens[index] = tokens
+            return (1 - tokens) / rate
+        self._tokens[index] = tokens - 1
+        return 0.0
+
+
+class RateLimit(Component):
+    """Limit requests rate per client"""
+
+    name = "rate_limit"
+
+    rate: float = 0.0  # requests per second for any route, 0 - only routes with rate_limit meta
+    burst: int = 0
+    key_header: bytes = b""  # use header value (x-forwarded-for, x-api-key) as client key instead of peer ip
+    trusted_proxies: int = 1  # proxies appending to key_header list: the value added by the outermost one is used
+    table_size: int = 1 << 16
+    status: int = 429
+    get_time: Callable = staticmethod(time.monotonic)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._buckets: Optional[_Buckets] = None
+
+    def start(self, app):
+        self._buckets = _Buckets(self.table_size)
+
+    def _get_key(self, request: Request):
+        if self.key_header:
+            value = request.headers.get(self.key_header)
+            if value:
+                # leftmost values come from the client and can be spoofed
+                values = value.split(b",")
+                return values[-min(self.trusted_proxies, len(values))].strip()
+        transport_info = request.get("get_transport_info")
+        if transport_info:
+            peername = transport_info()[0]
+            if peername:
+                return peername[0]
+        return None
+
+    def _get_limit(self, request: Request) -> Tuple[float, float, Optional[bytes]]:
+        rate_limit = request.get("rate_limit")
+        if rate_limit:
+            if isinstance(rate_limit, (tuple, list)):
+                rate, burst = rate_limit
+            else:
+                rate, burst = rate_limit, 0
+            return rate, burst or max(rate, 1), request.get("pattern")
+        return self.rate, self.burst or max(self.rate, 1), None
+
+    def _reject(self, wait: float) -> Response:
+        return Response(
+            status=self.status, body=b"Too Many Requests", headers={b"retry-after": str(math.ceil(wait)).encode()}
+        )
+
+    async def middleware(self, request: Request, handler, call_next):
+        rate, burst, pattern = self._get_limit(request)
+        if rate:
+            key = self._get_key(request)
+            wait = self._buckets.take(hash((pattern, key)), self.get_time(), rate, burst)
+            if wait:
+                return self._reject(wait)
+        return await call_next(request, handler)
@@ -1,6 +1,9 @@
 import logging
+import threading
 import time
-from logging.config import dictConfig
+from collections import deque
+from random import random
+from typing import Dict, Optional
 
 from levin.core.common import Request, Response
 from levin.core.component import Component
@@ -22,35 +25,107 @@ class LoggerComponent(Component):
     message_format: str = '"%(method)s %(path)s %(protocol)s" %(status)s - %(body_size)s - %(time)s - %(stream)s - %(transport)s'
     logger_config: dict = DEFAULT_CONFIG
     extra = {}
+    background: bool = True  # write records from a thread instead of event loop
+    batch_size: int = 256
+    flush_interval: float = 0.5
+    queue_size: int = 100_000
+    sample_rates: Dict[int, float] = {}  # status class (2 for 2xx, ...) -> part of requests to log
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._queue: Optional[deque] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stop = False
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()  # counted in the loop, reported by drain thread
 
     def init(self, app):
         if self.logger_config:
+            from logging.config import dictConfig  # pylint: disable=import-outside-toplevel
+
             dictConfig(self.logger_config)
         self._logger = logging.getLogger(self.logger_name)  # pylint: disable=attribute-defined-outside-init
 
     def start(self, app):
         self._logger.info("Start server")
+        if self.background:
+            self._stop = False
+            self._queue = deque(maxlen=self.queue_size)
+            self._thread = threading.Thread(target=self._drain, name=f"{__name__}.drain", daemon=True)
+            self._thread.start()
 
     def stop(self, app):
+        if self._thread:
+            self._stop = True
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
         self._logger.info("Server stop")
 
-    async def middleware(self, request: Request, handler, call_next) -> Response:
-        request.set("logger", self._logger)
-        start = time.perf_counter()
-        response: Response = await call_next(request, handler)
+    def _drain(self):
+        while not self._stop:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush()
+        self._flush()
+
+    def _flush(self):
+        queue = self._queue
+        while queue:
+            for _ in range(min(len(queue), self.batch_size)):
+                self._emit(queue.popleft())
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            self._logger.warning("Log queue overflow: %s records dropped", dropped)
+
+    def _emit(self, record):
+        status, method, path, protocol, body_size, spend, stream, transport = record
         self._logger.log(
             self.level,
             self.message_format,
             {
-                "status": response.status,
-                "method": request.method.decode(),
-                "path": request.raw_path.decode(),
-                "protocol": request.protocol.decode(),
-                "body_size": len(response.body),
-                "time": str(time.perf_counter() - start)[:6],
-                "stream": request.stream,
-                "transport": request.get_transport_info(),
+                "status": status,
+                "method": method.decode(),
+                "path": path.decode(),
+                "protocol": protocol.decode(),
+                "body_size": body_size,
+                "time": str(spend)[:6],
+                "stream": stream,
+                "transport": transport,
             },
             extra=self.extra,
         )
+
+    async def middleware(self, request: Request, handler, call_next) -> Response:
+        request.set("logger", self._logger)
+        start = time.perf_counter()
+        response: Response = await call_next(request, handler)
+        spend = time.perf_counter() - start
+        if self.sample_rates:
+            rate = self.sample_rates.get(response.status // 100)
+            if rate is not None and random() >= rate:
+                return response
+        transport_info = request.get("get_transport_info")
+        record = (
+            response.status,
+            request.method,
+            request.raw_path,
+            request.protocol,
+            len(response.body),
+            spend,
+            request.stream,
+            transport_info() if transport_info else None,  # peer address, not the connection, waits in queue
+        )
+        queue = self._queue
+        if queue is None:
+            self._emit(record)
+        else:
+            if len(queue) == queue.maxlen:
+                with self._dropped_lock:
+                    self._dropped += 1
+            queue.append(record)
+            if len(queue) == self.batch_size:
+                self._wakeup.set()
         return response
@@ -0,0 +1,159 @@
+import hmac
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .cli import command
+from levin.core.common import Request, Response
+from levin.core.component import Component
+from levin.core.connection import write_stats
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED = b"-"
+
+
+class _RouteMetrics:
+    __slots__ = ("buckets", "statuses", "sum", "in_flight", "bytes_in", "bytes_out")
+
+    def __init__(self, buckets_size: int):
+        self.buckets = array("Q", [0]) * (buckets_size + 1)  # last one is +Inf
+        self.statuses = array("Q", [0]) * 6  # by status class: 1xx .. 5xx
+        self.sum = 0.0
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+
+def _escape(value) -> str:
+    # label value of text format: regex routes have backslashes and quotes
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class Metrics(Component):
+    """Per route latency histograms and counters in prometheus format"""
+
+    name = "metrics"
+
+    path: bytes = b"/metrics"
+    http_token: str = ""  # endpoint is enabled only with token: route names and internals are not public
+    prefix: str = "levin"
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    get_time: Callable = staticmethod(time.perf_counter)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._routes: Dict[Tuple[bytes, bytes], _RouteMetrics] = {}
+        self._router = None
+        self._app = None
+
+    def init(self, app):
+        self._app = app
+
+    def start(self, app):
+        self._router = app.get_component("route")
+
+    def _get_route(self, request: Request) -> _RouteMetrics:
+        pattern = UNMATCHED
+        if self._router is not None:
+            pattern = self._router.match(request)[1].get("pattern", UNMATCHED)
+        key = (request.method, pattern)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            metrics = self._routes[key] = _RouteMetrics(len(self.buckets))
+        return metrics
+
+    async def middleware(self, request: Request, handler, call_next):
+        if self.http_token and self.path and request.raw_path == self.path:
+            if not self._is_authorized(request):
+                return Response(403, b"Forbidden")
+            return Response(200, self.export().encode(), headers={b"content-type": CONTENT_TYPE})
+        metrics = self._get_route(request)
+        metrics.in_flight += 1
+        metrics.bytes_in += len(request.body)
+        status = 500
+        start = self.get_time()
+        try:
+            response: Response = await call_next(request, handler)
+            status = response.status
+            metrics.bytes_out += len(response.body)
+            return response
+        finally:
+            spend = self.get_time() - start
+            metrics.in_flight -= 1
+            metrics.sum += spend
+            metrics.buckets[bisect_left(self.buckets, spend)] += 1
+            metrics.statuses[min(status // 100, 5)] += 1
+
+    def _is_authorized(self, request: Request) -> bool:
+        authorization = request.headers.get(b"authorization") or b""
+        return hmac.compare_digest(authorization, b"Bearer " + self.http_token.encode())
+
+    def _collect(self) -> Iterable[Tuple[str, str, str, Iterable[Tuple[Dict[str, str], float]]]]:
+        """
+        Counters and gauges: components can add own metrics with collect_metrics method of the same signature
+        """
+        routes = [
+            ({"method": method.decode(), "route": pattern.decode()}, metrics)
+            for (method, pattern), metrics in self._routes.items()
+        ]
+        yield "requests_total", "counter", "Handled requests", (
+            ({**labels, "status": f"{status_class}xx"}, count)
+            for labels, metrics in routes
+            for status_class, count in enumerate(metrics.statuses)
+            if count
+        )
+        yield "requests_in_flight", "gauge", "Requests in progress", ((labels, m.in_flight) for labels, m in routes)
+        yield "request_bytes_total", "counter", "Received body bytes", ((labels, m.bytes_in) for labels, m in routes)
+        yield "response_bytes_total", "counter", "Sent body bytes", ((labels, m.bytes_out) for labels, m in routes)
+        yield "connection_writes_total", "counter", "Writes to transports", (({}, write_stats.writes),)
+        yield "connection_writes_saved_total", "counter", "Writes saved by coalescing", (({}, write_stats.saved),)
+        for component in self._app.components:
+            collect = getattr(component, "collect_metrics", None)
+            if collect is not None:
+                yield from collect()
+
+    def _export_histogram(self, lines: List[str]):
+        name = f"{self.prefix}_request_duration_seconds"
+        lines.append(f"# HELP {name} Request handling time")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, pattern), metrics in self._routes.items():
+            labels = _labels({"method": method.decode(), "route": pattern.decode()})
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), metrics.buckets):
+                total += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f"{name}_sum{{{labels}}} {metrics.sum}")
+            lines.append(f"{name}_count{{{labels}}} {total}")
+
+    def export(self) -> str:
+        """
+        Render metrics in prometheus text format
+        """
+        lines = []
+        self._export_histogram(lines)
+        for name, metric_type, description, samples in self._collect():
+            name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{{{_labels(labels)}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    @command
+    def show(self, host: str = "127.0.0.1", port: int = 8000, token: str = ""):
+        """
+        Fetch metrics from running server
+        """
+        from urllib.request import Request as UrlRequest, urlopen  # pylint: disable=import-outside-toplevel
+
+        request = UrlRequest(
+            f"http://{host}:{port}{self.path.decode()}", headers={"Authorization": f"Bearer {token or self.http_token}"}
+        )
+        with urlopen(request) as response:
+            return response.read().decode()
@@ -1,18 +1,36 @@
 import asyncio
+import hmac
+import threading
 import time
-from typing import Callable
+from functools import partial
+from random import random
+from typing import Callable, List, Optional, Set
+from urllib.parse import parse_qs, urlencode, urlsplit
 
-from levin.core.common import Request
+from .cli import command
+from levin.core.common import Request, Response
 from levin.core.component import Component
-from levin.utils.profile import SimpleProfile, print_result
+from levin.utils.loop import TaskRoutes
+from levin.utils.profile import (
+    ProfileStore,
+    SamplingProfile,
+    SimpleProfile,
+    format_aggregate,
+    format_allocations,
+    format_record,
+    format_records,
+)
+
+TRACE = "trace"
+SAMPLING = "sampling"
 
 
 def _default_profile_condition(request: Request, time_spend: float, threshold: float):
     return time_spend > threshold
 
 
-def _request_hash(request: Request):
-    return request.raw_path + request.method
+def _route_key(request: Request) -> bytes:
+    return request.method + b" " + request.get("pattern", request.raw_path)
 
 
 class ProfileHandler(Component):
@@ -22,28 +40,164 @@ class ProfileHandler(Component):
     get_time: Callable = staticmethod(time.perf_counter)
     depth: int = 1
     with_memory: bool = False
-    callback = staticmethod(print_result)
+    callback: Optional[Callable] = None  # called with each finished profile, e.g. print_result
     profile_condition = staticmethod(_default_profile_condition)
+    mode: str = TRACE  # trace slow requests or sample stacks of all requests
+    sample_interval: float = 0.01
+    folded_path: str = ""  # file to write folded stacks at stop in sampling mode
+    sample_rate: float = 1.0  # probability to profile request of target route (profile_rate route meta)
+    max_concurrent: int = 4
+    store_records: int = 100
+    store_bytes: int = 8 * 1024 * 1024
+    http_path: bytes = b"/-/profile"
+    http_token: str = ""  # endpoint is enabled only with token
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self._targets = []
-        self._lock = asyncio.Lock()
+        self._targets: Set[bytes] = set()
+        self._active = 0
+        self._routes = TaskRoutes()
+        self._sampling: Optional[SamplingProfile] = None
+        self._store: Optional[ProfileStore] = None
+
+    @property
+    def store(self) -> ProfileStore:
+        if self._store is None:
+            self._store = ProfileStore(max_records=self.store_records, max_bytes=self.store_bytes)
+        return self._store
+
+    def start(self, app):
+        if self.mode == SAMPLING:
+            self._sampling = SamplingProfile(
+                interval=self.sample_interval,
+                thread_id=threading.get_ident(),
+                get_route=partial(self._routes.current, asyncio.get_running_loop()),
+            )
+            self._sampling.start()
+
+    def stop(self, app):
+        if self._sampling:
+            self._sampling.stop()
+            if self.folded_path:
+                with open(self.folded_path, "w") as file_:
+                    file_.write("\n".join(self.get_folded()))
+
+    def get_folded(self, route: Optional[bytes] = None) -> List[str]:
+        if not self._sampling:
+            return []
+        return self._sampling.folded(route)
+
+    async def _run_with_sampling(self, request: Request, handler, call_next):
+        task = self._routes.add(request.get("pattern", request.raw_path))
+        try:
+            return await call_next(request, handler)
+        finally:
+            self._routes.remove(task)
 
     async def _run_with_profile(self, request: Request, handler, call_next):
-        async with self._lock:
-            self._targets.remove(_request_hash(request))
+        self._active += 1
+        profile = SimpleProfile(depth=request.get("depth", self.depth), memory=self.with_memory)
+        profile.add_target(handler)
+        handler = profile.trace(handler)
+        start = self.get_time()
+        try:
+            return await call_next(request, handler)
+        finally:
+            self._active -= 1
+            self._targets.discard(_route_key(request))
+            self.store.add(profile, _route_key(request), self.get_time() - start)
+            if self.callback:
+                self.callback(profile)  # pylint: disable=not-callable
+
+    def _is_authorized(self, request: Request) -> bool:
+        authorization = request.headers.get(b"authorization") or b""
+        return hmac.compare_digest(authorization, b"Bearer " + self.http_token.encode())
+
+    def _render(self, view: str, route: Optional[bytes] = None, record_id: Optional[int] = None) -> Optional[str]:
+        if view == "records":
+            return format_records(self.store.records(route))
+        if view == "record":
+            record = self.store.get(record_id)
+            return format_record(record) if record else None
+        if view == "aggregate":
+            return format_aggregate(self.store.aggregate(route))
+        if view == "allocations":
+            return format_allocations(self.store, route)
+        if view == "folded":
+            return "\n".join(self.get_folded(route))
+        return None
+
+    def _http_view(self, request: Request) -> Response:
+        if not self._is_authorized(request):
+            return Response(403, b"Forbidden")
+        params = parse_qs(urlsplit(request.raw_path.decode()).query)
+        route = params["route"][0].encode() if "route" in params else None
+        view = params.get("view", ["records"])[0]
+        record_id = params.get("id", [""])[0]
+        if not record_id.isdigit() and (view == "record" or record_id):
+            return Response(400, b"Bad request: id of record is required as number")
+        result = self._render(view, route, int(record_id) if record_id else None)
+        if result is None:
+            return Response(404, b"Not found")
+        return Response(200, result.encode(), headers={b"content-type": b"text/plain; charset=utf-8"})
+
+    def _fetch(self, host: str, port: int, token: str, **params) -> str:
+        from urllib.request import Request as UrlRequest, urlopen  # pylint: disable=import-outside-toplevel
+
+        params = {name: value for name, value in params.items() if value}
+        request = UrlRequest(
+            f"http://{host}:{port}{self.http_path.decode()}?{urlencode(params)}",
+            headers={"Authorization": f"Bearer {token or self.http_token}"},
+        )
+        with urlopen(request) as response:
+            return response.read().decode()
+
+    @command
+    def records(self, route: str = "", host: str = "127.0.0.1", port: int = 8000, token: str = ""):
+        """
+        List stored profiles of running server
+        """
+        return self._fetch(host, port, token, view="records", route=route)
+
+    @command
+    def record(self, record_id: int, host: str = "127.0.0.1", port: int = 8000, token: str = ""):
+        """
+        Show stored profile of running server
+        """
+        return self._fetch(host, port, token, view="record", id=record_id)
+
+    @command
+    def aggregate(self, route: str = "", host: str = "127.0.0.1", port: int = 8000, token: str = ""):
+        """
+        Per line mean and max time and memory for route over stored profiles
+        """
+        return self._fetch(host, port, token, view="aggregate", route=route)
+
+    @command
+    def allocations(self, route: str = "", host: str = "127.0.0.1", port: int = 8000, token: str = ""):
+        """
+        Peak memory and top allocating lines per route over stored profiles (with_memory mode)
+        """
+        return self._fetch(host, port, token, view="allocations", route=route)
+
+    @command
+    def folded(self, route: str = "", host: str = "127.0.0.1", port: int = 8000, token: str = ""):
+        """
+        Folded stacks of sampling mode for flamegraph
+        """
+        return self._fetch(host, port, token, view="folded", route=route)
 
-            profile = SimpleProfile(depth=request.get("depth", self.depth), memory=self.with_memory)
-            profile.add_target(handler)
-            handler = profile.trace(handler)
-            try:
-                return await call_next(request, handler)
-            finally:
-                self.callback(profile)
+    def _should_profile(self, request: Request) -> bool:
+        if not self._targets or self._active >= self.max_concurrent or _route_key(request) not in self._targets:
+            return False
+        return random() < request.get("profile_rate", self.sample_rate)
 
     async def middleware(self, request: Request, handler, call_next):
-        if _request_hash(request) in self._targets and not self._lock.locked():
+        if self.http_token and request.get("path", request.raw_path) == self.http_path:
+            return self._http_view(request)
+        if self._sampling:
+            return await self._run_with_sampling(request, handler, call_next)
+        if self._should_profile(request):
             return await self._run_with_profile(request, handler, call_next)
         start = self.get_time()
         try:
@@ -53,4 +207,4 @@ class ProfileHandler(Component):
                 request, self.get_time() - start, self.threshold
             ):
                 request.logger.info("add to profile")
-                self._targets.append(_request_hash(request))
+                self._targets.add(_route_key(request))
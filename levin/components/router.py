@@ -11,6 +11,7 @@ PATH_ARG = re.compile(br"{(?P<name>[-_a-zA-Z0-9]+)}")
 PATH_REPL = br"(?P<\g<name>>[-_a-zA-Z0-9]+)"
 BACK_PATH_ARG = re.compile(br"\(\?P<(?P<name>[-_a-zA-Z0-9]+)[^/]+\)")
 BACK_PATH_REPL = br"{\g<name>}"
+_MATCH_KEY = "_route_match"
 
 
 def _not_found_handler(request):
@@ -80,6 +81,28 @@ class HttpRouter(Component):
                 return handler, condition_result
         return self.not_found_handler, {}
 
+    def match(self, request: Request) -> Tuple[Callable, Optional[dict]]:
+        """
+        Resolve route for request once - result is cached at request scope
+        """
+        matched = request.get(_MATCH_KEY)
+        if matched is None:
+            matched = self._resolve(request)
+            request.set(_MATCH_KEY, matched)
+        return matched
+
+    def get_handler(self, method: bytes, pattern: bytes) -> Optional[Callable]:
+        for condition, handler in self._routes:
+            if condition.method == method and condition.pattern == pattern:
+                return handler
+        return None
+
+    def get_patterns(self, method: bytes) -> List[bytes]:
+        return [condition.pattern for condition, _ in self._routes if condition.method == method]
+
+    def uses_meta(self, key: str) -> bool:
+        return any(condition.meta.get(key) for condition, _ in self._routes)
+
     @command
     def resolve(self, path: str, method: str = "GET", code: bool = False):
         """
@@ -171,7 +194,7 @@ class HttpRouter(Component):
     def middleware(self, request, handler, call_next):
         request.set("get_url", self.url, lazy=False)
         request.set("get_route", self._resolve, lazy=False)
-        _handler, condition_result = self._resolve(request)
+        _handler, condition_result = self.match(request)
         if isinstance(condition_result, dict):
             for key, value in condition_result.items():
                 request.set(key, value)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from levin.core.common import Request
+from levin.core.component import Component
+from levin.utils.loop import LoopLag, TaskRoutes
+
+logger = logging.getLogger(__name__)
+
+
+class Stall:
+    __slots__ = ("time", "lag", "route", "stack")
+
+    def __init__(self, lag: float, route: Optional[bytes], stack: List[str]):
+        self.time = time.time()
+        self.lag = lag
+        self.route = route
+        self.stack = stack
+
+    def __repr__(self):
+        return f"Stall({self.route}, {self.lag:.3f}s)"
+
+
+def _log_stall(stall: Stall):
+    logger.warning(
+        "Event loop blocked for %.3fs serving %s:\n%s",
+        stall.lag,
+        stall.route.decode() if stall.route else "-",
+        "".join(stall.stack),
+    )
+
+
+class Watchdog(Component):
+    """Detect event loop stalls and capture the stack of blocking code"""
+
+    name = "watchdog"
+
+    threshold: float = 0.5
+    interval: float = 0.05
+    history: int = 100
+    on_stall: Callable = staticmethod(_log_stall)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._heartbeat = LoopLag()
+        self._routes = TaskRoutes()
+        self._stalls = deque(maxlen=self.history)
+        self._counts: Dict[Optional[bytes], int] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop = None
+        self._loop_thread_id = None
+
+    def start(self, app):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stalls = deque(maxlen=self.history)
+        self._heartbeat.interval = self.interval
+        self._heartbeat.start(self._loop)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, name=f"{__name__}.watch", daemon=True)
+        self._thread.start()
+
+    def stop(self, app):
+        self._heartbeat.stop()
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def stalls(self) -> List[Stall]:
+        return list(self._stalls)
+
+    def _watch(self):
+        reported = False
+        while not self._stop_event.wait(self.interval):
+            lag = self._heartbeat.overdue()
+            if lag < self.threshold:
+                reported = False
+                continue
+            if not reported:
+                reported = True
+                self._capture(lag)
+
+    def _capture(self, lag: float):
+        frame = sys._current_frames().get(self._loop_thread_id)  # pylint: disable=protected-access
+        if frame is None:
+            return
+        stall = Stall(lag, self._routes.current(self._loop), traceback.format_stack(frame))
+        self._stalls.append(stall)
+        self._counts[stall.route] = self._counts.get(stall.route, 0) + 1
+        self.on_stall(stall)
+
+    def collect_metrics(self):
+        yield "event_loop_stalls_total", "counter", "Event loop stalls longer than threshold", (
+            ({"route": route.decode() if route else "-"}, count) for route, count in list(self._counts.items())
+        )
+
+    async def middleware(self, request: Request, handler, call_next):
+        task = self._routes.add(request.get("pattern", request.raw_path))
+        try:
+            return await call_next(request, handler)
+        finally:
+            self._routes.remove(task)
@@ -1,10 +1,11 @@
 import inspect
 from functools import partial
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
+
+from levin.utils.imports import import_string
 
 from .common import Request, Response
 from .component import Component, DisableComponentError, create_component_from
-from .server import run_app
 
 
 async def _handler(request: Request):
@@ -24,7 +25,8 @@ async def call_or_await(func_or_coro, *args, **kwargs):
 
 class Application:
     def __init__(self, components=(), default_handler=_handler):
-        self._components: List[Component] = []
+        self._components: List[Union[Component, str]] = []  # "module:Class" until the first use
+        self._config: List[Dict] = []  # configuration of components that are not imported yet
         self._handler = default_handler
         self.handler = None
         self.__start = False
@@ -36,7 +38,9 @@ class Application:
 
     def _add_component(self, component, position=None):
         if isinstance(component, str):
-            pass
+            # "module:Class" - imported and created with default configuration on start or lookup of components
+            self._components.insert(position or len(self._components), component)
+            return
         if not isinstance(component, Component):
             component = create_component_from(component)
         self._components.insert(position or len(self._components), component)
@@ -44,9 +48,19 @@ class Application:
 
     add = _add_component  # public version
 
+    def _resolve(self) -> List[Component]:
+        for index, component in enumerate(self._components):
+            if isinstance(component, str):
+                component = self._components[index] = import_string(component)()
+                component.init(self)
+        config, self._config = self._config, []
+        for config_ in config:
+            self.configure(config_)
+        return self._components
+
     def _create_handler(self, handler):
         call_next = _call_next
-        for component in self._components[::-1]:
+        for component in self._resolve()[::-1]:
             if component.middleware is not None:
                 call_next = partial(component.middleware, call_next=call_next)
                 call_next.component_name = component.name
@@ -57,7 +71,9 @@ class Application:
             return
         self.__start = True
         _components_to_remove = []
-        for component in self._components:
+        # components forking processes start first: a lock held by a thread of another component
+        # (logger drain, watchdog) at fork time stays locked in the child
+        for component in sorted(self._resolve(), key=lambda component: not getattr(component, "_forks", False)):
             try:
                 await call_or_await(component._start, self)  # pylint: disable=protected-access
             except DisableComponentError:
@@ -73,10 +89,18 @@ class Application:
         for component in self._components:
             await call_or_await(component.stop, self)
 
-    def run(self, host="0.0.0.0", port=8000, ssl=None):
-        run_app(self, host, port=port, ssl=ssl)
+    def run(self, host="0.0.0.0", port=8000, ssl=None, **server_kwargs):
+        """
+        server_kwargs - options of Server, e.g. h2_settings={"initial_window_size": 1 << 20}, h2_auto_window=True
+        """
+        from .server import run_app  # pylint: disable=import-outside-toplevel
+
+        run_app(self, host, port=port, ssl=ssl, **server_kwargs)
 
     def configure(self, config: Dict):
+        if any(isinstance(component, str) for component in self._components):
+            self._config.append(config)  # applied (and checked) when components are imported
+            return
         for component_name, config_ in config.items():
             component = self.get_component(component_name)
             if not component:
@@ -84,17 +108,19 @@ class Application:
             component.configure(**config_)
 
     def get_component(self, component: str) -> Optional[Component]:
-        for _component in self._components:
+        for _component in self._resolve():
             if _component.name == component:
                 return _component
         return None
 
     @property
     def components(self):
-        return list(self._components)
+        return list(self._resolve())
 
     def __getattr__(self, item):
-        for component in self._components:
+        if item.startswith("_"):  # private attributes are not components, e.g. before __init__
+            raise AttributeError(item)
+        for component in self._resolve():
             if component.name == item:
                 return component
         raise AttributeError(f"App has no component {item}")
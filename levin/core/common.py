@@ -1,6 +1,7 @@
 from typing import Mapping, Tuple, Optional, Iterable
 
 EMPTY = object()
+_PLAIN_TYPES = (bytes, str, int, float, bool, type(None))
 
 
 class ParseError(Exception):
@@ -68,9 +69,6 @@ class Request:
         self._scope = {}
 
     def __getattr__(self, item):
-        if item in Request.__slots__:
-            # it's happened on unpickle request (multiprocessing)
-            return None
         attr = self.get(item, default=EMPTY)
         if attr is EMPTY:
             raise AttributeError(f"Request has no attr {item} in scope")
@@ -93,6 +91,48 @@ class Request:
                 value = _LazyAttr(value)
             self._scope[key] = value
 
+    def copy(self, body: Optional[bytes] = None) -> "Request":
+        request = Request.__new__(Request)
+        for attr in Request.__slots__:
+            setattr(request, attr, getattr(self, attr))
+        request._scope = dict(self._scope)  # pylint: disable=protected-access
+        if body is not None:
+            request.body = body
+        return request
+
+    def __reduce__(self):
+        # only plain values of scope go to other process: lazy attrs and callbacks are bound to this one
+        scope = {key: value for key, value in self._scope.items() if _is_plain(value)}
+        return _restore_request, (
+            self.raw_path,
+            self.method,
+            self.body,
+            tuple(self.headers.items()),
+            self.protocol,
+            self.stream,
+            self.scheme,
+            scope,
+        )
+
+
+def _is_plain(value) -> bool:
+    if isinstance(value, _PLAIN_TYPES):
+        return True
+    if isinstance(value, (tuple, list)):
+        return all(_is_plain(item) for item in value)
+    if isinstance(value, dict):
+        return all(_is_plain(key) and _is_plain(item) for key, item in value.items())
+    return False
+
+
+def _restore_request(path, method, body, headers, protocol, stream, scheme, scope) -> Request:
+    # pylint: disable=too-many-arguments
+    request = Request(
+        path=path, method=method, body=body, headers=headers, protocol=protocol, stream=stream, scheme=scheme
+    )
+    request._scope = scope  # pylint: disable=protected-access
+    return request
+
 
 class Push:
     __slots__ = ("path", "method")
@@ -102,6 +142,33 @@ class Push:
         self.method = method
 
 
+class MultiHeaders(dict):
+    """
+    Response headers with repeated fields (set-cookie): the first value is in the dict,
+    the rest are written as separate header lines
+    """
+
+    __slots__ = ("repeated",)
+
+    def __init__(self, headers: Iterable[Tuple[bytes, bytes]] = ()):
+        super().__init__()
+        self.repeated = []
+        for name, value in headers:
+            self.add(name, value)
+
+    def add(self, name: bytes, value: bytes):
+        if name in self:
+            self.repeated.append((name, value))
+        else:
+            self[name] = value
+
+    def items(self):
+        return [*super().items(), *self.repeated]
+
+    def __reduce__(self):
+        return MultiHeaders, (self.items(),)
+
+
 class Response:
     __slots__ = ("status", "body", "headers", "pushes", "push")
 
@@ -111,3 +178,6 @@ class Response:
         self.headers = headers or {}
         self.pushes = pushes or []
         self.push = push
+
+    def __reduce__(self):
+        return Response, (self.status, self.body, self.headers, self.pushes, self.push)
@@ -11,8 +11,33 @@ class CloseException(Exception):
     pass
 
 
+class WriteStats:
+    """
+    Writes of all connections: chunks are buffered and written to transport together once per loop iteration
+    """
+
+    __slots__ = ("chunks", "writes")
+
+    def __init__(self):
+        self.chunks = 0
+        self.writes = 0
+
+    @property
+    def saved(self) -> int:
+        return self.chunks - self.writes
+
+
+write_stats = WriteStats()  # pylint: disable=invalid-name
+
+
 class Connection:
-    __slots__ = ("_transport", "_parsers", "_parser", "_futures", "_loop", "_handler")
+    __slots__ = (
+        "_transport", "_parsers", "_parser", "_futures", "_loop", "_handler", "_flush_handle", "_paused", "_pushed",
+        "_draining", "_buffer", "_buffered", "_write_handle", "__weakref__",
+    )
+
+    flush_size = 64 * 1024  # bytes of scheduled (h2) responses written per loop iteration
+    cork_size = 64 * 1024  # buffered bytes are written right away from this size, not at the end of iteration
 
     def __init__(self, parsers, handler, loop=None):
         self._loop = loop
@@ -21,6 +46,13 @@ class Connection:
         self._handler = handler
         self._transport = None
         self._futures = []
+        self._flush_handle = None
+        self._paused = False
+        self._pushed = set()  # (method, path) already pushed to the client of the connection
+        self._draining = False
+        self._buffer = []
+        self._buffered = 0
+        self._write_handle = None
 
     @staticmethod
     def _get_future_exception(future):
@@ -52,6 +84,7 @@ class Connection:
                 self._write_500(request)
         finally:
             self._futures.remove(future)
+            self._close_if_idle()
 
     def _close_callback(self, future):
         self.close()
@@ -61,21 +94,70 @@ class Connection:
             self.write_response(response_500, request)
 
     def write(self, data):
+        write_stats.chunks += 1
+        if self._loop is None:  # no loop iteration to coalesce writes in
+            write_stats.writes += 1
+            self._transport.write(data)
+            return
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.cork_size:
+            self._write_out()
+        elif self._write_handle is None:
+            self._write_handle = self._loop.call_soon(self._write_out)
+
+    def _write_out(self):
+        if self._write_handle is not None:
+            self._write_handle.cancel()
+            self._write_handle = None
+        if not self._buffer:
+            return
+        data = self._buffer[0] if len(self._buffer) == 1 else b"".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        write_stats.writes += 1
         self._transport.write(data)
 
     def connection_made(self, transport: asyncio.Transport):
         self._transport = transport
+        protocol = self._get_alpn_protocol()
+        if protocol:
+            # protocol is negotiated: no need to detect it by the first data
+            parsers = [parser for parser in self._parsers if getattr(parser, "alpn", None) == protocol]
+            if parsers:
+                self._parsers = parsers
         for parser in self._parsers:
             parser.connect()
 
+    def _get_alpn_protocol(self):
+        ssl_object = self._transport.get_extra_info("ssl_object")
+        if ssl_object is None:
+            return None
+        return ssl_object.selected_alpn_protocol()
+
     def connection_lost(self, exc):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._write_handle:
+            self._write_handle.cancel()
+            self._write_handle = None
+        self._buffer = []
         for future in self._futures:
             future.cancel()
 
+    def pause_writing(self):
+        self._paused = True
+
+    def resume_writing(self):
+        self._paused = False
+        self._schedule_flush()
+
     def data_received(self, data: bytes):
         _data, requests, close = self._parse(data)
         if _data:
             self.write(_data)
+        self._schedule_flush()  # window updates could unblock queued data
         future = None
         if requests:
             for request in requests:
@@ -107,26 +189,85 @@ class Connection:
 
     async def handle_request(self, request: Request):
         request.set('get_transport_info', self._get_transport_info, lazy=True)
+        request.set('push_support', bool(getattr(self._parser, "push_support", False)))
         response: Response = await self._handler(request)
+        if response.pushes:
+            response.pushes = self._filter_pushes(response.pushes)
         self.write_response(response, request)
-        if response.pushes and self._parser and getattr(self._parser, "push_support", False):
+        if response.pushes:
             await asyncio.gather(*[self.handle_push(push, request) for push in response.pushes])
 
+    def _filter_pushes(self, pushes):
+        if not (self._parser and getattr(self._parser, "push_support", False)):
+            return []
+        _pushes = []
+        for push in pushes:
+            if (push.method, push.path) not in self._pushed:
+                self._pushed.add((push.method, push.path))  # before handling: other streams skip it right away
+                _pushes.append(push)
+        return _pushes
+
     async def handle_push(self, push: Push, request):
-        _request = Request(path=push.path, method=push.method, protocol=request.protocol, headers=request.headers.items(), stream=request.stream, scheme=self.scheme)
+        _request = Request(
+            path=push.path, method=push.method, protocol=request.protocol, stream=request.stream, scheme=self.scheme
+        )
+        _request.headers = request.headers  # read only: no need to build them again
         _request.set('get_transport_info', self._get_transport_info, lazy=True)
-        response: Response = await self._handler(_request)
+        _request.set('is_push', True)
+        try:
+            response: Response = await self._handler(_request)
+        except Exception:
+            self._parser.push_done(_request)
+            raise
         response.push = True
         self.write_response(response, _request)
 
     def write_response(self, response: Response, request: Request):
+        if self._draining and not hasattr(self._parser, "goaway"):
+            response.headers[b"connection"] = b"close"
         for data in self._parser.handle_response(response, request):
             self.write(data)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        # parser with write scheduler keeps bodies and sends them in portions, so responses interleave
+        if self._flush_handle is None and not self._paused and getattr(self._parser, "pending", False) is True:
+            self._flush_handle = self._loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        if self._transport.is_closing():
+            return
+        data = self._parser.flush(self.flush_size)
+        if data:
+            self.write(data)
+            self._schedule_flush()
+        self._close_if_idle()
 
     def eof_received(self):
         pass
 
+    @property
+    def closed(self) -> bool:
+        return self._transport is None or self._transport.is_closing()
+
+    def drain(self):
+        """
+        Stop taking requests: h2 client gets GOAWAY, idle connection is closed now, busy one - after its responses
+        """
+        self._draining = True
+        goaway = getattr(self._parser, "goaway", None)
+        if goaway is not None and not self.closed:
+            self.write(goaway())
+        self._close_if_idle()
+
+    def _close_if_idle(self):
+        if not self._draining or self._futures or self.closed or getattr(self._parser, "pending", False) is True:
+            return
+        self.close()
+
     def close(self):
+        self._write_out()
         self._transport.close()
-        for future in self._futures:
-            future.set_exception(CloseException())
+        for future in list(self._futures):  # done callbacks remove futures right away
+            future.cancel()  # cancels the handler task in the loop
@@ -9,6 +9,8 @@ _BLANK = b""
 
 
 class Parser:
+    alpn = "http/1.1"
+
     def connect(self):
         pass
 
@@ -47,11 +49,13 @@ class Parser:
     @staticmethod
     def handle_response(response: Response, request: Request):
         headers = response.headers
-        if response.body:
+        if response.status >= 200 and response.status not in (204, 304):
+            # always: keep-alive client reads the next response right after the body
             headers[b"Content-Length"] = str(len(response.body)).encode()
-        headers = b"\r\n".join([b": ".join([HTTP_HEADERS.get(k, k.capitalize()), v]) for k, v in headers.items()])
-        yield b"HTTP/1.1 " + str(response.status).encode() + b" " + HTTP_STATUSES.get(response.status) + b"\r\n"
-        yield headers
+        head = [b"HTTP/1.1 ", str(response.status).encode(), b" ", HTTP_STATUSES.get(response.status), b"\r\n"]
+        for name, value in headers.items():
+            head += (HTTP_HEADERS.get(name, name.capitalize()), b": ", value, b"\r\n")
+        head.append(b"\r\n")
+        yield b"".join(head)  # status line and headers with one chunk
         if response.body:
-            yield b"\r\n\r\n" + response.body
-        yield b"\r\n"
+            yield response.body
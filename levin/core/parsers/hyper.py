@@ -1,15 +1,95 @@
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import Dict, List, Optional, Tuple, Union
 
 from h2.config import H2Configuration
 from h2.connection import H2Connection
-from h2.events import ConnectionTerminated, DataReceived, RequestReceived, StreamEnded
+from h2.events import (
+    ConnectionTerminated,
+    DataReceived,
+    PingAckReceived,
+    PriorityUpdated,
+    RequestReceived,
+    StreamEnded,
+    StreamReset,
+)
 from h2.exceptions import ProtocolError, StreamClosedError
+from h2.settings import SettingCodes
+from hyperframe.frame import GoAwayFrame
 
 from ..common import ParseError, Request, Response
 from .http_simple import Parser as Http1Parser
 
 http1_parser = Http1Parser()
 
+DEFAULT_WEIGHT = 16
+DEFAULT_WINDOW = 65535
+BDP_PING = b"levinbdp"
+DEFAULT_URGENCY = 3  # rfc 9218
+
+
+def _get_urgency(request: Request) -> int:
+    value = request.headers.get(b"priority")
+    if value:
+        for param in value.split(b","):
+            param = param.strip()
+            if param.startswith(b"u=") and param[2:].isdigit():
+                return min(int(param[2:]), 7)
+    return DEFAULT_URGENCY
+
+
+def _get_settings(settings: Dict[Union[str, int], int]) -> Dict[int, int]:
+    return {SettingCodes[key.upper()] if isinstance(key, str) else key: value for key, value in settings.items()}
+
+
+class _BdpEstimator:
+    """
+    Estimate bandwidth-delay product with PING round trips: bytes received during rtt
+    """
+
+    __slots__ = ("window", "max_window", "_sample", "_ping_at")
+
+    def __init__(self, window: int, max_window: int):
+        self.window = window
+        self.max_window = max_window
+        self._sample = 0
+        self._ping_at: Optional[float] = None
+
+    def on_data(self, size: int) -> bool:
+        """
+        Count received bytes - return True if ping should be sent to start new sample
+        """
+        self._sample += size
+        if self._ping_at is not None or self.window >= self.max_window:
+            return False
+        self._ping_at = time.monotonic()
+        return True
+
+    def on_ping_ack(self) -> Optional[int]:
+        """
+        Finish sample - return new window size if the window limits throughput
+        """
+        sample, self._sample, self._ping_at = self._sample, 0, None
+        if sample * 3 < self.window * 2:  # sample is far from window
+            return None
+        self.window = min(sample * 2, self.max_window)
+        return self.window
+
+
+class _StreamOut:
+    """
+    Response body waiting to be sent
+    """
+
+    __slots__ = ("data", "end_stream", "urgency", "weight", "depends_on", "credit")
+
+    def __init__(self, data: bytes, end_stream: bool, urgency: int, weight: int, depends_on: int):
+        self.data = memoryview(data)
+        self.end_stream = end_stream
+        self.urgency = urgency
+        self.weight = weight
+        self.depends_on = depends_on
+        self.credit = 0
+
 
 def _get_request_from_event(event):
     headers = []
@@ -27,13 +107,40 @@ def _get_request_from_event(event):
 
 
 class Parser:
+    """
+    HTTP/2 parser with write scheduler: response bodies are queued and sent with flush
+    in quanta across streams by urgency (priority header), weight and dependency (PRIORITY frames)
+    """
+
+    alpn = "h2"
     config = H2Configuration(client_side=False, header_encoding="utf-8")
+    quantum = 16 * 1024  # bytes of stream with default weight per round
 
-    __slots__ = ("conn", "_streams")
+    __slots__ = ("conn", "_streams", "_out", "_priorities", "_settings", "_bdp", "_promises")
 
-    def __init__(self):
+    def __init__(
+        self,
+        settings: Optional[Dict[Union[str, int], int]] = None,
+        auto_window: bool = False,
+        max_window: int = 16 * 1024 * 1024,
+    ):
+        """
+        settings - local h2 settings by name or code, e.g. {"initial_window_size": 1 << 20, "header_table_size": 0}
+        auto_window - grow receive windows up to max_window by estimated bandwidth-delay product
+        """
         self.conn = H2Connection(config=self.config)
         self._streams: Dict[int, Request] = {}
+        self._out: Dict[int, _StreamOut] = {}
+        self._priorities: Dict[int, Tuple[int, int]] = {}
+        self._promises: Dict[int, int] = {}  # pushes to promise before stream end
+        self._settings = _get_settings(settings or {})
+        self._bdp: Optional[_BdpEstimator] = None
+        if auto_window:
+            self._bdp = _BdpEstimator(self._settings.get(SettingCodes.INITIAL_WINDOW_SIZE, DEFAULT_WINDOW), max_window)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._out)
 
     @property
     def push_support(self):
@@ -41,6 +148,29 @@ class Parser:
 
     def connect(self):
         self.conn.initiate_connection()
+        self._send_settings()
+
+    def goaway(self) -> bytes:
+        """
+        GOAWAY frame for graceful shutdown: h2 close_connection closes the state machine too,
+        but streams in flight still have to be answered
+        """
+        frame = GoAwayFrame(0)
+        frame.last_stream_id = self.conn.highest_inbound_stream_id
+        return self.conn.data_to_send() + frame.serialize()
+
+    def _send_settings(self):
+        if not self._settings:
+            return
+        self.conn.update_settings(self._settings)
+        window = self._settings.get(SettingCodes.INITIAL_WINDOW_SIZE, DEFAULT_WINDOW)
+        if window > DEFAULT_WINDOW:
+            # initial window size setting is only for streams: connection window grows with window update
+            self.conn.increment_flow_control_window(window - DEFAULT_WINDOW)
+
+    def _grow_window(self, increment: int):
+        self.conn.increment_flow_control_window(increment)
+        self.conn.update_settings({SettingCodes.INITIAL_WINDOW_SIZE: self._bdp.window})
 
     def handle_request(self, data: bytes) -> Tuple[Optional[bytes], Optional[List[Request]], bool]:
         to_send_data, requests, close = None, [], False
@@ -50,7 +180,6 @@ class Parser:
             # try parse http1.1 and send change connection
             to_send_data, requests = self._handle_http1(data)
             events = []
-        to_send_data = to_send_data if to_send_data is not None else self.conn.data_to_send()
 
         for event in events:
             result = self._parse_event(event)
@@ -58,14 +187,36 @@ class Parser:
                 close = True
             if result:
                 requests.append(result)
+        # after events: handling them can produce frames (window updates, pings)
+        to_send_data = to_send_data if to_send_data is not None else self.conn.data_to_send()
         return to_send_data, requests, close
 
     def _parse_event(self, event):
         if isinstance(event, RequestReceived):
             self._streams[event.stream_id] = _get_request_from_event(event)
+            if event.priority_updated:
+                self._parse_event(event.priority_updated)
+        elif isinstance(event, PriorityUpdated):
+            self._priorities[event.stream_id] = (event.weight, event.depends_on)
+            if event.stream_id in self._out:
+                self._out[event.stream_id].weight = event.weight
+                self._out[event.stream_id].depends_on = event.depends_on
+        elif isinstance(event, StreamReset):
+            self._streams.pop(event.stream_id, None)
+            self._out.pop(event.stream_id, None)
+            self._priorities.pop(event.stream_id, None)
         elif isinstance(event, DataReceived):
             if event.stream_id in self._streams:
                 self._streams[event.stream_id].body += event.data
+            # body is buffered: give the window back right away, h2 sends window update when it's worth it
+            self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            if self._bdp is not None and self._bdp.on_data(event.flow_controlled_length):
+                self.conn.ping(BDP_PING)
+        elif isinstance(event, PingAckReceived):
+            if self._bdp is not None and event.ping_data == BDP_PING:
+                window = self._bdp.window
+                if self._bdp.on_ping_ack():
+                    self._grow_window(self._bdp.window - window)
         elif isinstance(event, StreamEnded):
             return self._streams.pop(event.stream_id)
         elif isinstance(event, ConnectionTerminated):
@@ -80,7 +231,8 @@ class Parser:
             raise ParseError()
         self.conn.clear_outbound_data_buffer()  # clean init connection
         self.conn.initiate_upgrade_connection(settings_header=request.headers[b"http2-settings"])
-        to_send_data += b"\r\n" + self.conn.data_to_send()
+        self._send_settings()
+        to_send_data += self.conn.data_to_send()
         return to_send_data, [request, ]
 
     def handle_http1_to_http2(self, data: bytes) -> Tuple[Optional[Request], bytes]:
@@ -114,26 +266,111 @@ class Parser:
                     promised_stream_id=stream_id,
                     request_headers=request_headers,
                 )
-            except ProtocolError as exc:
+            except ProtocolError:
+                self.push_done(request)
+                yield self.conn.data_to_send()
                 return
-            self.conn.end_stream(request.stream)
+            self.push_done(request)
 
-        self.conn.send_headers(stream_id, response_headers)
-        data = response.body
-        while True:
-            if self.conn.local_flow_control_window(request.stream) < 1:
-                return
+        end_stream = not response.pushes
+        if response.pushes:
+            self._promises[stream_id] = len(response.pushes)
+        try:
+            self.conn.send_headers(stream_id, response_headers, end_stream=end_stream and not response.body)
+        except (StreamClosedError, ProtocolError):
+            self._priorities.pop(stream_id, None)
+            return
+        if response.body:
+            weight, depends_on = self._priorities.pop(stream_id, (DEFAULT_WEIGHT, 0))
+            self._out[stream_id] = _StreamOut(response.body, end_stream, _get_urgency(request), weight, depends_on)
+        else:
+            self._priorities.pop(stream_id, None)
+        yield self.conn.data_to_send()
+
+    def push_done(self, request: Request):
+        """
+        Push for stream is promised or dropped - end the stream after the last one
+        """
+        left = self._promises.get(request.stream, 0) - 1
+        if left > 0:
+            self._promises[request.stream] = left
+            return
+        self._promises.pop(request.stream, None)
+        self._end_stream(request.stream)
 
-            chunk_size = min(
-                self.conn.local_flow_control_window(request.stream), len(data), self.conn.max_outbound_frame_size
+    def _end_stream(self, stream_id: int):
+        if stream_id in self._out:
+            self._out[stream_id].end_stream = True  # after the queued body
+            return
+        try:
+            self.conn.end_stream(stream_id)
+        except (StreamClosedError, ProtocolError):
+            pass
+
+    def _waits_parent(self, stream_id: int, out: _StreamOut) -> bool:
+        """
+        Stream waits while an ancestor with queued body can send: ancestors blocked by flow control don't hold it
+        """
+        chain, parent = [stream_id], out.depends_on
+        while parent in self._out:
+            if parent in chain:
+                # PRIORITY frames made a cycle: the stream depends on the root (RFC 7540 5.3.3)
+                out.depends_on = 0
+                return False
+            chain.append(parent)
+            parent = self._out[parent].depends_on
+        return any(self.conn.local_flow_control_window(ancestor) > 0 for ancestor in chain[1:])
+
+    def _ready(self) -> List[Tuple[int, _StreamOut]]:
+        ready = [
+            (stream_id, out)
+            for stream_id, out in self._out.items()
+            if self.conn.local_flow_control_window(stream_id) > 0 and not self._waits_parent(stream_id, out)
+        ]
+        if not ready:
+            return ready
+        urgency = min(out.urgency for _, out in ready)
+        return [(stream_id, out) for stream_id, out in ready if out.urgency == urgency]
+
+    def _send(self, stream_id: int, out: _StreamOut) -> int:
+        """
+        Send frames of stream within its credit and flow control window - return sent size
+        """
+        sent = 0
+        while out.credit > 0 and out.data:
+            size = min(
+                self.conn.local_flow_control_window(stream_id),
+                self.conn.max_outbound_frame_size,
+                len(out.data),
+                out.credit,
             )
-            try:
-                self.conn.send_data(stream_id, data[:chunk_size], end_stream=not response.pushes and chunk_size >= len(data))
-            except (StreamClosedError, ProtocolError):
-                # The stream got closed and we didn't get told. We're done here.
-                break
+            if size < 1:
+                break  # wait for window update
+            end_stream = out.end_stream and size == len(out.data)
+            self.conn.send_data(stream_id, out.data[:size].tobytes(), end_stream=end_stream)
+            out.data = out.data[size:]
+            out.credit -= size
+            sent += size
+        return sent
 
-            yield self.conn.data_to_send()
-            data = data[chunk_size:]
-            if not data:
-                return
+    def flush(self, limit: int) -> bytes:
+        """
+        Send queued bodies up to limit bytes with weighted round robin among the most urgent ready streams
+        """
+        sent = 0
+        while sent < limit:
+            ready = self._ready()
+            if not ready:
+                break
+            for stream_id, out in ready:
+                out.credit += self.quantum * out.weight // DEFAULT_WEIGHT
+                try:
+                    sent += self._send(stream_id, out)
+                except (StreamClosedError, ProtocolError):
+                    # The stream got closed and we didn't get told. We're done here.
+                    del self._out[stream_id]
+                    continue
+                del self._out[stream_id]
+                if out.data:
+                    self._out[stream_id] = out  # to the end of round
+        return self.conn.data_to_send()
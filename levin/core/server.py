@@ -1,7 +1,16 @@
 import asyncio
+import logging
+import os
+import select
+import signal
+import socket
 import ssl as ssl_lib
+import subprocess
+import sys
+import weakref
+from functools import partial
 
-from typing import Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from levin.core.connection import Connection
 from levin.core.parsers.http_simple import Parser as Http1Parser
@@ -19,6 +28,41 @@ from levin.core.parsers.hyper import Parser as Http2Parser
 # https://www.protocols.ru/WP/rfc7540/
 # http://plantuml.com/timing-diagram
 
+TCP = "tcp"
+UNIX = "unix"
+FD = "fd"
+SYSTEMD = "systemd"
+SYSTEMD_FIRST_FD = 3
+ALPN_PROTOCOLS = ("h2", "http/1.1")  # connection takes parser with the same `alpn`
+INHERIT_FDS_ENV = "LEVIN_FDS"  # listening sockets of reloaded process: "3,4;5" - fds of servers in order of run
+READY_FD_ENV = "LEVIN_READY_FD"  # new process writes to it when it listens
+
+logger = logging.getLogger(__name__)
+
+
+def systemd_fds() -> List[int]:
+    """
+    Sockets passed by systemd socket activation (LISTEN_FDS): they start from fd 3
+    """
+    pid = os.environ.get("LISTEN_PID")
+    if pid and pid != str(os.getpid()):
+        return []
+    return list(range(SYSTEMD_FIRST_FD, SYSTEMD_FIRST_FD + int(os.environ.get("LISTEN_FDS", "0"))))
+
+
+def parse_bind(bind: str) -> List[Tuple[str, Union[str, int, Tuple[str, int]]]]:
+    """
+    Listener of "host:port", "[::1]:port", "unix:/path/to.sock", "fd://3" or "systemd" (all activated sockets)
+    """
+    if bind == SYSTEMD:
+        return [(FD, fd) for fd in systemd_fds()]
+    if bind.startswith("unix:"):
+        return [(UNIX, bind[len("unix:"):])]
+    if bind.startswith("fd://"):
+        return [(FD, int(bind[len("fd://"):]))]
+    host, _, port = bind.rpartition(":")
+    return [(TCP, (host.strip("[]") or "0.0.0.0", int(port)))]
+
 
 class Server:
     """
@@ -32,27 +76,68 @@ class Server:
         port: int = 8000,
         connection_class=Connection,
         parsers_class=(Http2Parser, Http1Parser, Http1ParserHttpTools),
-        ssl: Optional[Tuple[str, str]] = None,
+        ssl: Optional[Union[Tuple[str, str], ssl_lib.SSLContext]] = None,
         loop=None,
+        h2_settings: Optional[Dict[Union[str, int], int]] = None,
+        h2_auto_window: bool = False,
+        bind: Iterable[str] = (),
+        ssl_options: Optional[Dict] = None,
+        drain_timeout: float = 30.0,
     ):  # pylint: disable=too-many-arguments
+        """
+        ssl - (certfile, keyfile) or context to share: one context (created before fork) means the same
+            session ticket keys, so clients resume sessions at any server or worker with it
+        ssl_options - options of create_ssl_context: ciphers, ecdh_curve, num_tickets, alpn
+        drain_timeout - seconds for requests in flight to finish on stop
+        """
         self._connection_class = connection_class
+        if h2_settings or h2_auto_window:
+            parsers_class = tuple(
+                partial(parser, settings=h2_settings, auto_window=h2_auto_window) if parser is Http2Parser else parser
+                for parser in parsers_class
+            )
         self._parsers_class = parsers_class
         self._app = app
         self.host = host
         self.port = port
         self._loop = loop
         self.ssl_context = None
-        if ssl:
-            self.ssl_context = self.create_ssl_context(*ssl)
+        if isinstance(ssl, ssl_lib.SSLContext):
+            self.ssl_context = ssl
+        elif ssl:
+            self.ssl_context = self.create_ssl_context(*ssl, **(ssl_options or {}))
+        # several listeners share the application, host and port are used if there are no binds
+        self.listeners = [listener for bind_ in bind for listener in parse_bind(bind_)] or [(TCP, (host, port))]
+        self.drain_timeout = drain_timeout
+        self.handed_over = False  # listening sockets are taken by reloaded process
+        self._listeners: List[asyncio.AbstractServer] = []
+        self._connections = weakref.WeakSet()
 
     @staticmethod
-    def create_ssl_context(certfile, keyfile):
+    def create_ssl_context(
+        certfile: str,
+        keyfile: str,
+        ciphers: Optional[str] = None,
+        ecdh_curve: Optional[str] = None,
+        num_tickets: Optional[int] = None,
+        alpn: Iterable[str] = ALPN_PROTOCOLS,
+    ) -> ssl_lib.SSLContext:  # pylint: disable=too-many-arguments
+        """
+        Session resumption: TLS 1.3 tickets (num_tickets per handshake, 0 disables them) and TLS 1.2 tickets
+        are on by default. Ticket keys are generated by OpenSSL for the context - stdlib can't set them,
+        so workers share keys only if they share the context
+        """
         ssl_context = ssl_lib.create_default_context(ssl_lib.Purpose.CLIENT_AUTH)
-        ssl_context.options |= (
-                ssl_lib.OP_NO_TLSv1 | ssl_lib.OP_NO_TLSv1_1 | ssl_lib.OP_NO_COMPRESSION
-        )
+        ssl_context.minimum_version = ssl_lib.TLSVersion.TLSv1_2
+        ssl_context.options |= ssl_lib.OP_NO_COMPRESSION
         ssl_context.load_cert_chain(certfile=certfile, keyfile=keyfile)
-        ssl_context.set_alpn_protocols(["h2"])
+        if ciphers:
+            ssl_context.set_ciphers(ciphers)  # TLS 1.2 and below: TLS 1.3 suites are not configurable
+        if ecdh_curve:
+            ssl_context.set_ecdh_curve(ecdh_curve)
+        if num_tickets is not None:
+            ssl_context.num_tickets = num_tickets
+        ssl_context.set_alpn_protocols(list(alpn))
         return ssl_context
 
     @property
@@ -60,14 +145,72 @@ class Server:
         return self._loop or asyncio.get_running_loop()
 
     def handle_connection(self):
-        return self._connection_class(
+        connection = self._connection_class(
             [parser() for parser in self._parsers_class], loop=self.loop, handler=self._app.handler
         )
+        self._connections.add(connection)
+        return connection
+
+    async def _create_listener(self, loop, kind: str, address) -> asyncio.AbstractServer:
+        if kind == UNIX:
+            return await loop.create_unix_server(self.handle_connection, address, ssl=self.ssl_context)
+        if kind == FD:
+            sock = socket.socket(fileno=address)
+            sock.setblocking(False)
+            if sock.family == socket.AF_UNIX:
+                return await loop.create_unix_server(self.handle_connection, sock=sock, ssl=self.ssl_context)
+            return await loop.create_server(self.handle_connection, sock=sock, ssl=self.ssl_context)
+        host, port = address
+        return await loop.create_server(
+            self.handle_connection, host, port, reuse_address=True, reuse_port=False, ssl=self.ssl_context)
+
+    async def create_listeners(self, loop) -> List[asyncio.AbstractServer]:
+        listeners = []
+        try:
+            for kind, address in self.listeners:
+                listeners.append(await self._create_listener(loop, kind, address))
+        except Exception:
+            await self.close_listeners(listeners)
+            raise
+        self._listeners = listeners
+        return listeners
+
+    async def close_listeners(self, listeners: List[asyncio.AbstractServer]):
+        for listener in listeners:
+            listener.close()
+            await listener.wait_closed()
+        if self.handed_over:
+            return
+        for kind, address in self.listeners[: len(listeners)]:
+            if kind == UNIX and os.path.exists(address):  # inherited sockets belong to the parent
+                os.unlink(address)
+
+    def get_listening_fds(self) -> List[int]:
+        return [sock.fileno() for listener in self._listeners for sock in listener.sockets]
+
+    async def drain(self, timeout: Optional[float] = None):
+        """
+        Stop accepting connections, let requests in flight finish within timeout and close connections
+        """
+        timeout = self.drain_timeout if timeout is None else timeout
+        listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            listener.close()
+        connections = list(self._connections)
+        for connection in connections:
+            connection.drain()
+        deadline = self.loop.time() + timeout
+        while any(not connection.closed for connection in connections) and self.loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for connection in connections:
+            if not connection.closed:
+                connection.close()
+        # after connections: since python 3.12 wait_closed waits for them
+        await self.close_listeners(listeners)
 
     async def get_task(self, loop, stop_event):
         try:
-            return await loop.create_server(
-                self.handle_connection, self.host, self.port, reuse_address=True, reuse_port=False, ssl=self.ssl_context)
+            return await self.create_listeners(loop)
         except Exception:  # pylint: disable=broad-except
             stop_event.set()
 
@@ -78,28 +221,109 @@ class Server:
         await self._app.stop()
 
 
+def _inherit_listeners(servers):
+    # process started by reload takes listening sockets of the old one
+    value = os.environ.pop(INHERIT_FDS_ENV, "")
+    if not value:
+        return
+    for server, fds in zip(servers, value.split(";")):
+        server.listeners = [(FD, int(fd)) for fd in fds.split(",") if fd]
+
+
+def _notify_ready():
+    fd = os.environ.pop(READY_FD_ENV, "")
+    if fd:
+        os.write(int(fd), b"1")
+        os.close(int(fd))
+
+
+def _wait_ready(fd: int, timeout: float) -> bool:
+    try:
+        readable, _, _ = select.select([fd], [], [], timeout)
+        return bool(readable) and os.read(fd, 1) == b"1"  # empty read: the process has exited
+    finally:
+        os.close(fd)
+
+
+def _get_command() -> List[str]:
+    # command of this process: "python -m package" keeps its module form instead of the path of __main__
+    orig_argv = getattr(sys, "orig_argv", None)  # python 3.10+
+    if orig_argv:
+        return [sys.executable, *orig_argv[1:]]
+    spec = getattr(sys.modules["__main__"], "__spec__", None)
+    if spec is not None and spec.name:
+        module = spec.name[: -len(".__main__")] if spec.name.endswith(".__main__") else spec.name
+        return [sys.executable, "-m", module, *sys.argv[1:]]
+    return [sys.executable, *sys.argv]
+
+
+async def reload(
+    servers, stop_event: asyncio.Event, timeout: float = 30.0, command: Optional[List[str]] = None
+) -> bool:
+    """
+    Zero-downtime reload (SIGHUP): start the same command with listening sockets inherited,
+    stop (drain) this process once the new one listens. Old process keeps serving if the new one fails.
+    The new process gets sockets and readiness pipe by LEVIN_FDS and LEVIN_READY_FD environment variables
+    """
+    fds = [server.get_listening_fds() for server in servers]
+    read_fd, write_fd = os.pipe()
+    env = dict(os.environ)
+    env[INHERIT_FDS_ENV] = ";".join(",".join(str(fd) for fd in server_fds) for server_fds in fds)
+    env[READY_FD_ENV] = str(write_fd)
+    env.pop("LISTEN_FDS", None)
+    env.pop("LISTEN_PID", None)
+    try:
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            command or _get_command(), env=env, pass_fds=[fd for server_fds in fds for fd in server_fds] + [write_fd]
+        )
+    finally:
+        os.close(write_fd)
+    ready = await asyncio.get_running_loop().run_in_executor(None, _wait_ready, read_fd, timeout)
+    if not ready:
+        logger.error("Reload failed: new process %s is not ready (exit code %s)", process.pid, process.poll())
+        return False
+    logger.info("Reloaded: new process %s listens, draining this one", process.pid)
+    for server in servers:
+        server.handed_over = True
+    stop_event.set()
+    return True
+
+
+def _add_signal_handlers(loop, servers, stop_event: asyncio.Event):
+    try:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(reload(servers, stop_event)))
+    except (NotImplementedError, RuntimeError, ValueError):  # not main thread or not unix
+        pass
+
+
 async def _manage(servers_async, servers, stop_event: asyncio.Event):
     try:
+        # a server without listeners (no sockets of systemd) is not a failure
+        if all(listeners is not None for listeners in await asyncio.gather(*servers_async)):
+            _notify_ready()
         await stop_event.wait()
     except Exception:  # pylint: disable=broad-except
         pass
+    # in-flight requests are finished before application stops
+    await asyncio.gather(*(server.drain() for server in servers))
     for server in servers:
         await server.stop()
-    for server in servers_async:
-        server_result = server.result()
-        if isinstance(server_result, asyncio.AbstractServer):
-            server_result.close()
-            await server_result.wait_closed()
-        if not server.done():
-            server.cancel()
+    for task in servers_async:
+        if not task.done():
+            task.cancel()
 
 
 def run(*servers, loop=None, stop_event=None, wait=True):
     if loop is None:
         loop = asyncio.new_event_loop()
-    stop_event = stop_event or asyncio.Event(loop=loop)
+    stop_event = stop_event or asyncio.Event()
+    _inherit_listeners(servers)
     for server in servers:
         loop.run_until_complete(server.start())
+    if wait:
+        _add_signal_handlers(loop, servers, stop_event)
 
     manage_handler = loop.create_task
     if wait:
@@ -123,8 +347,8 @@ def _stop(stop_event, loop):
         loop.close()
 
 
-def run_app(app, host: str = "0.0.0.0", port: int = 8000, ssl=None):
-    return run(Server(app, host=host, port=port, ssl=ssl))
+def run_app(app, host: str = "0.0.0.0", port: int = 8000, ssl=None, **server_kwargs):
+    return run(Server(app, host=host, port=port, ssl=ssl, **server_kwargs))
 
 
 def run_apps(*args):
@@ -0,0 +1,279 @@
+"""
+Socket-free client: call application handler directly or through Connection with fake transport
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import DataReceived, ResponseReceived, StreamEnded, StreamReset, WindowUpdated
+
+from levin.bench import Stats
+from levin.core.common import Request, Response
+from levin.core.connection import Connection
+from levin.core.parsers.http_simple import Parser as Http1Parser
+from levin.core.parsers.hyper import Parser as Http2Parser
+
+DIRECT = "direct"
+HTTP1 = "http1"
+H2 = "h2"
+
+_Headers = Union[Dict[bytes, bytes], Tuple[Tuple[bytes, bytes], ...]]
+
+
+class FakeTransport(asyncio.Transport):
+    """
+    Transport of in-process connection: written data goes to callback
+    """
+
+    def __init__(self, on_write, peername=("127.0.0.1", 50000), sockname=("127.0.0.1", 8000)):
+        super().__init__()
+        self._on_write = on_write
+        self._closing = False
+        self._extra = {"peername": peername, "sockname": sockname, "sslcontext": None}
+
+    def write(self, data):
+        self._on_write(bytes(data))
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        self._closing = True
+
+    def get_extra_info(self, name, default=None):
+        return self._extra.get(name, default)
+
+
+def _to_bytes(value: Union[str, bytes]) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+class _Http1Connection:
+    """
+    HTTP/1.1 keep-alive connection: one request at a time like a client without pipelining
+    """
+
+    __slots__ = ("_connection", "_buffer", "_response", "_lock")
+
+    def __init__(self, handler):
+        self._connection = Connection([Http1Parser()], handler=handler, loop=asyncio.get_running_loop())
+        self._connection.connection_made(FakeTransport(self._feed))
+        self._buffer = b""
+        self._response: Optional[asyncio.Future] = None
+        self._lock = asyncio.Lock()
+
+    def _feed(self, data: bytes):
+        self._buffer += data
+        head, separator, rest = self._buffer.partition(b"\r\n\r\n")
+        if not separator or self._response is None:
+            return
+        lines = head.split(b"\r\n")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip()
+        size = int(headers.get(b"content-length", 0))
+        if len(rest) < size:
+            return
+        self._buffer = rest[size:]
+        self._response.set_result(Response(int(lines[0].split(b" ", 2)[1]), rest[:size], headers=headers))
+
+    async def request(self, method: bytes, path: bytes, body: bytes, headers) -> Response:
+        lines = [method + b" " + path + b" HTTP/1.1", b"host: testserver"]
+        lines.extend(name + b": " + value for name, value in headers)
+        if body:
+            lines.append(b"content-length: " + str(len(body)).encode())
+        async with self._lock:
+            self._response = asyncio.get_running_loop().create_future()
+            self._connection.data_received(b"\r\n".join(lines) + b"\r\n\r\n" + body)
+            try:
+                return await self._response
+            finally:
+                self._response = None
+
+    def close(self):
+        self._connection.connection_lost(None)
+
+
+class _H2Connection:
+    """
+    h2c (prior knowledge) connection: concurrent requests are multiplexed as streams
+    """
+
+    __slots__ = ("_connection", "_conn", "_responses", "_heads", "_bodies", "_window_updated")
+
+    def __init__(self, handler):
+        self._connection = Connection([Http2Parser()], handler=handler, loop=asyncio.get_running_loop())
+        self._connection.connection_made(FakeTransport(self._feed))
+        self._conn = H2Connection(H2Configuration(client_side=True, header_encoding="utf-8"))
+        self._responses: Dict[int, asyncio.Future] = {}
+        self._heads: Dict[int, Tuple[int, Dict[bytes, bytes]]] = {}
+        self._bodies: Dict[int, bytes] = {}
+        self._window_updated = asyncio.Event()
+        self._conn.initiate_connection()
+        self._send()
+
+    def _send(self):
+        data = self._conn.data_to_send()
+        if data:
+            self._connection.data_received(data)
+
+    def _feed(self, data: bytes):
+        for event in self._conn.receive_data(data):
+            if isinstance(event, ResponseReceived):
+                headers = {name.encode(): value.encode() for name, value in event.headers}
+                self._heads[event.stream_id] = (int(headers.pop(b":status")), headers)
+            elif isinstance(event, DataReceived):
+                self._bodies[event.stream_id] = self._bodies.get(event.stream_id, b"") + event.data
+                self._conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, (StreamEnded, StreamReset)):
+                self._finish(event.stream_id, isinstance(event, StreamReset))
+            elif isinstance(event, WindowUpdated):
+                self._window_updated.set()
+        # acknowledgements are sent on next loop iteration: server is in the middle of writing
+        asyncio.get_running_loop().call_soon(self._send)
+
+    def _finish(self, stream_id: int, reset: bool):
+        response = self._responses.pop(stream_id, None)
+        status, headers = self._heads.pop(stream_id, (0, {}))
+        body = self._bodies.pop(stream_id, b"")
+        if response is None or response.done():
+            return
+        if reset:
+            response.set_exception(ConnectionResetError(f"stream {stream_id} reset"))
+        else:
+            response.set_result(Response(status, body, headers=headers))
+
+    async def request(self, method: bytes, path: bytes, body: bytes, headers) -> Response:
+        stream_id = self._conn.get_next_available_stream_id()
+        request_headers = [(":method", method), (":path", path), (":scheme", "http"), (":authority", "testserver")]
+        request_headers.extend(headers)
+        self._conn.send_headers(stream_id, request_headers, end_stream=not body)
+        response = self._responses[stream_id] = asyncio.get_running_loop().create_future()
+        self._send()
+        if body:
+            await self._send_body(stream_id, memoryview(body))
+        return await response
+
+    async def _send_body(self, stream_id: int, body: memoryview):
+        while body:
+            size = min(self._conn.local_flow_control_window(stream_id), self._conn.max_outbound_frame_size, len(body))
+            if size <= 0:
+                self._window_updated.clear()
+                await self._window_updated.wait()
+                continue
+            self._conn.send_data(stream_id, body[:size].tobytes(), end_stream=size == len(body))
+            body = body[size:]
+            self._send()
+
+    def close(self):
+        self._connection.connection_lost(None)
+
+
+class _DirectConnection:
+    __slots__ = ("_handler",)
+
+    def __init__(self, handler):
+        self._handler = handler
+
+    async def request(self, method: bytes, path: bytes, body: bytes, headers) -> Response:
+        return await self._handler(Request(path=path, method=method, body=body, headers=headers))
+
+    def close(self):
+        pass
+
+
+_CONNECTIONS = {DIRECT: _DirectConnection, HTTP1: _Http1Connection, H2: _H2Connection}
+
+
+class Client:
+    """
+    Drive application without sockets:
+        direct - call app.handler with Request
+        http1, h2 - send bytes through Connection with fake transport: parsers and framing are included
+
+        async with Client(app, protocol="h2") as client:
+            response = await client.get("/path")
+    """
+
+    def __init__(self, app, protocol: str = DIRECT):
+        if protocol not in _CONNECTIONS:
+            raise ValueError(f"Unknown protocol {protocol}, expected one of {', '.join(_CONNECTIONS)}")
+        self.app = app
+        self.protocol = protocol
+        self._connections: List = []
+
+    async def __aenter__(self) -> "Client":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+    async def start(self):
+        await self.app.start()
+        self.connect()
+
+    async def stop(self):
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        await self.app.stop()
+
+    def connect(self):
+        """
+        Open one more connection (the first one is used by `request`)
+        """
+        connection = _CONNECTIONS[self.protocol](self.app.handler)
+        self._connections.append(connection)
+        return connection
+
+    async def request(
+        self,
+        method: Union[str, bytes],
+        path: Union[str, bytes],
+        body: bytes = b"",
+        headers: _Headers = (),
+        connection=None,
+    ) -> Response:  # pylint: disable=too-many-arguments
+        headers = tuple(headers.items()) if isinstance(headers, dict) else tuple(headers)
+        connection = connection or self._connections[0]
+        return await connection.request(_to_bytes(method), _to_bytes(path), body, headers)
+
+    async def get(self, path: Union[str, bytes], headers: _Headers = ()) -> Response:
+        return await self.request(b"GET", path, headers=headers)
+
+    async def post(self, path: Union[str, bytes], body: bytes = b"", headers: _Headers = ()) -> Response:
+        return await self.request(b"POST", path, body=body, headers=headers)
+
+
+async def bench(
+    client: Client,
+    path: Union[str, bytes],
+    method: Union[str, bytes] = b"GET",
+    requests: int = 10000,
+    concurrency: int = 1,
+) -> Dict:
+    """
+    Send `requests` requests with `concurrency` workers (own connection for each one) and return summary as levin.bench
+    """
+    stats = Stats()
+    left = requests
+
+    async def _worker(connection):
+        nonlocal left
+        while left > 0:
+            left -= 1
+            start = time.perf_counter()
+            response = await client.request(method, path, connection=connection)
+            if response.status >= 500:
+                stats.errors += 1
+            else:
+                stats.latencies.append(time.perf_counter() - start)
+
+    connections = [client.connect() for _ in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(_worker(connection) for connection in connections))
+    return stats.summary(_to_bytes(path).decode(), time.perf_counter() - start)
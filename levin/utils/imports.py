@@ -0,0 +1,12 @@
+from importlib import import_module
+
+
+def import_string(path: str):
+    """
+    Import object by "module:attr" (or "module.attr") path
+    """
+    if ":" in path:
+        module, attr = path.split(":", 1)
+    else:
+        module, _, attr = path.rpartition(".")
+    return getattr(import_module(module), attr)
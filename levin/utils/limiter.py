@@ -0,0 +1,65 @@
+import asyncio
+from collections import deque
+
+
+class Limiter:
+    """
+    Concurrency limit with bounded FIFO queue of waiters
+    """
+
+    __slots__ = ("limit", "max_queue", "active", "_waiters")
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # slot was handed to us right before the timeout
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # slot was handed to us right before cancellation
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                self._remove(waiter)
+        return True
+
+    def _remove(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        while self.active < self.limit and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def release(self):
+        while self.active <= self.limit and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # hand the slot over - active stays the same
+                return
+        self.active -= 1
@@ -0,0 +1,67 @@
+import asyncio
+from typing import Dict, Optional
+
+
+class LoopLag:
+    """
+    Measure event loop lag: how late a callback scheduled with call_later is executed
+    """
+
+    __slots__ = ("interval", "value", "_loop", "_handle", "_expected")
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.value = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._loop = loop or asyncio.get_running_loop()
+        self._schedule()
+
+    def stop(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def overdue(self) -> float:
+        """
+        How late is the next tick right now - safe to call from another thread
+        """
+        if self._handle is None:
+            return 0.0
+        return self._loop.time() - self._expected
+
+    def _schedule(self):
+        self._expected = self._loop.time() + self.interval
+        self._handle = self._loop.call_later(self.interval, self._tick)
+
+    def _tick(self):
+        self.value = max(self._loop.time() - self._expected, 0.0)
+        self._schedule()
+
+
+class TaskRoutes:
+    """
+    Map running tasks to served routes, so another thread can find out what the loop is busy with
+    """
+
+    __slots__ = ("_routes",)
+
+    def __init__(self):
+        self._routes: Dict[asyncio.Task, bytes] = {}
+
+    def add(self, route: bytes) -> asyncio.Task:
+        task = asyncio.current_task()
+        self._routes[task] = route
+        return task
+
+    def remove(self, task: asyncio.Task):
+        self._routes.pop(task, None)
+
+    def current(self, loop: asyncio.AbstractEventLoop) -> Optional[bytes]:
+        task = asyncio.current_task(loop)
+        if task is None:
+            return None
+        return self._routes.get(task)
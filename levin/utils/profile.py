@@ -1,11 +1,13 @@
 import asyncio
+import contextvars
 import inspect
 import linecache
 import sys
+import threading
 import time
-import tracemalloc
+from collections import deque
 from types import CodeType
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 
 # https://github.com/what-studio/profiling/blob/master/profiling/tracing/__init__.py
 # https://github.com/mgedmin/profilehooks/blob/master/profilehooks.py
@@ -16,6 +18,36 @@ from typing import List
 # http://www.dalkescientific.com/writings/diary/archive/2005/04/20/tracing_python_code.html
 
 
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("levin_profile", default=None)
+_thread_state = threading.local()
+# peak and snapshots of tracemalloc are process-wide: one profile traces memory at a time,
+# profiles overlapping with it run without memory (peak_memory is None)
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_owner = False  # tracemalloc was started by profile and should be stopped by it
+
+
+def _dispatch(frame, event: str, arg):
+    # one hook for the thread, the profile is chosen by context - so concurrent tasks are traced separately
+    profile = _current_profile.get()
+    if profile is not None:
+        profile._trace(frame, event, arg)  # pylint: disable=protected-access
+
+
+def _install_dispatch():
+    users = getattr(_thread_state, "users", 0)
+    if not users:
+        _thread_state.orig = sys.getprofile()
+        sys.setprofile(_dispatch)
+    _thread_state.users = users + 1
+
+
+def _uninstall_dispatch():
+    _thread_state.users -= 1
+    if not _thread_state.users:
+        sys.setprofile(_thread_state.orig)
+        _thread_state.orig = None
+
+
 class CallResult:
     # pylint: disable=too-many-instance-attributes
     __slots__ = ("lineno", "caller_lineno", "filename", "depth", "start", "end", "ncalls", "mem")
@@ -25,9 +57,9 @@ class CallResult:
         lineno: int,
         caller_lineno: int,
         filename: str,
-        start: float,
+        start: int,
         depth: int = 0,
-        end: float = 0.0,
+        end: int = 0,
         ncalls: int = 0,
         mem: int = 0,
     ):  # pylint: disable=too-many-arguments
@@ -41,8 +73,8 @@ class CallResult:
         self.mem = mem
 
     @property
-    def time(self):
-        return self.end - self.start
+    def time(self) -> float:
+        return (self.end - self.start) / 1e9
 
     @property
     def func_line(self):
@@ -69,27 +101,31 @@ class SimpleProfile:
     CALLS = (C_CALL, CALL)
 
     def __init__(self, depth: int = 1, memory: bool = False):
-        self._calls: List[CallResult] = []  # Storage for line call result
+        self._calls: Dict[Tuple[str, int, int], CallResult] = {}  # Storage for line call result
         self._depth = depth
         self._target_func = []
+        self._target_depths: Dict[Tuple[str, int, str], List[int]] = {}  # code alias -> depths of target
         self._functions_code = {}
         self._trace_mem = memory
-        self._orig_trace = None
-        self._trace_mem_snapshot = None
+        self._context_token = None
+        self._mem_baseline = None
+        self._mem_start = 0
+        self._peak_start = 0
+        self._memory: Dict[Tuple[str, int], int] = {}  # (filename, lineno) -> allocated size
+        self.peak_memory = 0
         self._stop = False
 
     @staticmethod
     def _get_code_alias(code):
         return code.co_filename, code.co_firstlineno, code.co_name
 
-    def _get_event_frame(self, event, frame):
-        if event in self.C_CALLS:
-            return frame
-        return frame.f_back
+    def _add_target_alias(self, alias):
+        self._target_func.append(alias)
+        self._target_depths.setdefault(alias, []).append(len(self._target_func))
 
     def _save_frame(self, frame):
-        if len(self._target_func) != self._depth and self._get_code_alias(frame.f_back.f_code) in self._target_func:
-            self._target_func.append(self._get_code_alias(frame.f_code))
+        if self._get_code_alias(frame.f_back.f_code) in self._target_depths:
+            self._add_target_alias(self._get_code_alias(frame.f_code))
             self._save_function(frame.f_code)
 
     def _get_depth_at_recursion(self, mother_frame, recursion_depth):
@@ -101,61 +137,42 @@ class SimpleProfile:
             return None
         return depth
 
-    def _get_current_depth(self, event, frame):
-        frame = self._get_event_frame(event, frame)
-        code_alias = self._get_code_alias(frame.f_code)
-        self._save_frame(frame)
-
-        if code_alias in self._target_func:
-            indexes = [index for index, func in enumerate(self._target_func) if func == code_alias]
-            if len(indexes) > 1:  # recursion
-                return self._get_depth_at_recursion(frame, len(indexes))
-            return indexes.pop() + 1
-        return None
-
-    def _get_the_same_call(self, frame, depth):
-        new_call = self._create_call_from(frame, depth)
-        for call in self._calls:
-            if self._is_the_same_call(new_call, call):
-                return call
-        return None
-
-    @staticmethod
-    def _is_the_same_call(call_1: CallResult, call_2: CallResult):
-        return call_1.depth == call_2.depth and call_1.filename == call_2.filename and call_1.lineno == call_2.lineno
+    def _trace(self, frame, event: str, arg):
+        # hot path: called on every call/return event while profile is active, so keep it flat
+        if frame is None:
+            return
+        if event not in self.C_CALLS:
+            frame = frame.f_back
+        if len(self._target_func) != self._depth:
+            self._save_frame(frame)
+        code = frame.f_code
+        depths = self._target_depths.get((code.co_filename, code.co_firstlineno, code.co_name))
+        if depths is None:
+            return
+        # SKIP DEPTH IF IT == 1
+        depth = depths[0] if len(depths) == 1 else self._get_depth_at_recursion(frame, len(depths))
+        if depth is None:
+            return
+        key = (code.co_filename, frame.f_lineno, depth)
+        call = self._calls.get(key)
+        if event in self.CALLS:
+            if call is None:
+                self._calls[key] = self._create_call_from(frame, depth)
+            else:
+                call.ncalls += 1
+        elif call is not None:
+            call.end = time.perf_counter_ns()
 
     @staticmethod
     def _create_call_from(frame, depth) -> CallResult:
         lineno = frame.f_lineno
         filename = frame.f_code.co_filename
         frame_line = frame.f_code.co_firstlineno
-        return CallResult(lineno=lineno, filename=filename, start=time.time(), depth=depth, caller_lineno=frame_line)
-
-    def _trace(self, frame, event: str, arg):
-        if frame is None:
-            return self.trace
-        # SKIP DEPTH IF IT == 1
-        depth = self._get_current_depth(event, frame)
-        if depth is None:
-            return self.trace
-        target_frame = self._get_event_frame(event, frame)
-
-        if event in self.CALLS:
-            self._trace_call(target_frame, depth)
-        else:
-            call = self._get_the_same_call(target_frame, depth)
-            call.end = time.time()
-        return self._trace
-
-    def _trace_call(self, target_frame, depth):
-        call = self._get_the_same_call(target_frame, depth)
-        if not call:
-            self._calls.append(self._create_call_from(target_frame, depth))
-        else:
-            call.ncalls += 1
+        return CallResult(
+            lineno=lineno, filename=filename, start=time.perf_counter_ns(), depth=depth, caller_lineno=frame_line
+        )
 
     def trace(self, func):
-        self._orig_trace = sys.getprofile()
         if asyncio.iscoroutinefunction(func):
 
             async def _wrap(*args, **kwargs):
@@ -173,8 +190,7 @@ class SimpleProfile:
         return self.trace(func)(*args, **kwargs)
 
     def add_target(self, func):
-        func_alias = self._get_code_alias(func.__code__)
-        self._target_func.append(func_alias)
+        self._add_target_alias(self._get_code_alias(func.__code__))
         self._save_function(func)
 
     def _run(self, func, *args, **kwargs):
@@ -192,20 +208,66 @@ class SimpleProfile:
             self.stop()
 
     def start_trace(self):
-        sys.setprofile(self._trace)
+        self._context_token = _current_profile.set(self)
+        _install_dispatch()
         if self._trace_mem:
-            tracemalloc.clear_traces()
-            tracemalloc.start()
+            self._start_trace_memory()
 
     def stop(self):
         if self._stop:
             return
-        sys.setprofile(self._orig_trace)
+        _uninstall_dispatch()
+        try:
+            _current_profile.reset(self._context_token)
+        except ValueError:  # stopped from other context
+            _current_profile.set(None)
         if self._trace_mem:
-            self._trace_mem_snapshot = tracemalloc.take_snapshot()
-            tracemalloc.stop()
+            self._stop_trace_memory()
         self._stop = True
 
+    def _start_trace_memory(self):
+        global _tracemalloc_owner  # pylint: disable=global-statement
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        if not _tracemalloc_lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            self._trace_mem = False
+            self.peak_memory = None
+            return
+        if tracemalloc.is_tracing():
+            # somebody else is tracing - allocations made before us are excluded by baseline diff
+            self._mem_baseline = tracemalloc.take_snapshot()
+        else:
+            tracemalloc.start()
+            _tracemalloc_owner = True
+        if hasattr(tracemalloc, "reset_peak"):  # python 3.9+
+            tracemalloc.reset_peak()
+        self._mem_start, self._peak_start = tracemalloc.get_traced_memory()
+
+    def _stop_trace_memory(self):
+        global _tracemalloc_owner  # pylint: disable=global-statement
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        current, peak = tracemalloc.get_traced_memory()
+        if peak == self._peak_start:  # not above peak at start: without reset_peak it may be older than profile
+            peak = current
+        self.peak_memory = max(peak - self._mem_start, 0)
+        filters = [tracemalloc.Filter(True, filename) for filename in {alias[0] for alias in self._target_func}]
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        if _tracemalloc_owner:
+            tracemalloc.stop()
+            _tracemalloc_owner = False
+        _tracemalloc_lock.release()
+        if self._mem_baseline is None:
+            statistics = snapshot.statistics("lineno")
+        else:
+            statistics = snapshot.compare_to(self._mem_baseline.filter_traces(filters), "lineno")
+        self._mem_baseline = None
+        for statistic in statistics:  # one pass: statistics are already grouped by line
+            frame = statistic.traceback[0]
+            size = getattr(statistic, "size_diff", statistic.size)
+            if size > 0:
+                self._memory[(frame.filename, frame.lineno)] = size
+
     def _save_function(self, code):
         if not isinstance(code, CodeType):
             code = code.__code__
@@ -215,20 +277,10 @@ class SimpleProfile:
         return self._functions_code.get((filename, lineno))
 
     def _get_memory_for_call(self, call: CallResult):
-        if not self._trace_mem:
-            return 0
-        snapshot = self._trace_mem_snapshot.filter_traces(
-            (tracemalloc.Filter(True, call.filename, lineno=call.lineno),)
-        )
-
-        for statistic in snapshot.statistics("lineno", False):
-            for frame in statistic.traceback:
-                if frame.filename == call.filename and frame.lineno == call.lineno:
-                    return statistic.size
-        return 0
+        return self._memory.get((call.filename, call.lineno), 0)
 
     def get_lines(self):
-        lines = {(call.lineno, call.filename, call.depth): call for call in self._calls}
+        lines = {(call.lineno, call.filename, call.depth): call for call in self._calls.values()}
         for depth, (func_filename, func_lineno, _) in enumerate(self._target_func, start=1):
             for lineno, text_line in enumerate(
                 self._get_function(func_filename, func_lineno).splitlines()[1:], start=1
@@ -250,6 +302,261 @@ class SimpleProfile:
         return line
 
 
+class SamplingProfile:
+    """Statistical profile: stacks of one thread are collected by timer and folded"""
+
+    def __init__(
+        self,
+        interval: float = 0.01,
+        thread_id: Optional[int] = None,
+        get_route: Callable[[], Optional[bytes]] = lambda: None,
+        max_stacks: int = 10_000,
+    ):
+        self.interval = interval
+        self._thread_id = thread_id or threading.get_ident()
+        self._get_route = get_route
+        self._max_stacks = max_stacks
+        self._stacks: Dict[Tuple[bytes, str], int] = {}
+        self._frames_names: Dict[Tuple[CodeType, int], str] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{__name__}.sampling", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        route = self._get_route()
+        if route is None:  # loop is idle or busy with not a request
+            return
+        frame = sys._current_frames().get(self._thread_id)  # pylint: disable=protected-access
+        if frame is None:
+            return
+        key = (route, self._fold(frame))
+        if key in self._stacks:
+            self._stacks[key] += 1
+        elif len(self._stacks) < self._max_stacks:
+            self._stacks[key] = 1
+        self.samples += 1
+
+    def _fold(self, frame) -> str:
+        names = []
+        while frame is not None:
+            key = (frame.f_code, frame.f_lineno)
+            name = self._frames_names.get(key)
+            if name is None:
+                name = self._frames_names[key] = f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})"
+            names.append(name)
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def folded(self, route: Optional[bytes] = None) -> List[str]:
+        """
+        Stacks in "folded" format (flamegraph.pl, speedscope): route;frame;frame count
+        """
+        return [
+            f"{route_.decode()};{stack} {count}"
+            for (route_, stack), count in sorted(self._stacks.items())
+            if route is None or route == route_
+        ]
+
+    def clear(self):
+        self._stacks = {}
+        self.samples = 0
+
+
+_RECORD_SIZE = 256  # approximate size of record and line in memory, bytes
+_LINE_SIZE = 192
+
+
+Line = Tuple[str, int, int, float, int, int]  # filename, lineno, depth, time, mem, ncalls
+
+
+class ProfileRecord:
+    __slots__ = ("id", "time", "route", "duration", "lines", "peak_memory")
+
+    def __init__(
+        self, id_: int, route: bytes, duration: float, lines: Tuple[Line, ...], peak_memory: Optional[int] = 0
+    ):
+        self.id = id_
+        self.time = time.time()
+        self.route = route
+        self.duration = duration
+        self.lines = lines
+        self.peak_memory = peak_memory
+
+    @property
+    def size(self) -> int:
+        return _RECORD_SIZE + _LINE_SIZE * len(self.lines)
+
+
+class LineStats:
+    __slots__ = ("filename", "lineno", "depth", "count", "time", "max_time", "mem_count", "mem", "max_mem")
+
+    def __init__(self, filename: str, lineno: int, depth: int):
+        self.filename = filename
+        self.lineno = lineno
+        self.depth = depth
+        self.count = 0
+        self.time = 0.0
+        self.max_time = 0.0
+        self.mem_count = 0
+        self.mem = 0
+        self.max_mem = 0
+
+    def add(self, time_: float, mem: Optional[int]):
+        self.count += 1
+        self.time += time_
+        self.max_time = max(self.max_time, time_)
+        if mem is not None:  # record with memory traced
+            self.mem_count += 1
+            self.mem += mem
+            self.max_mem = max(self.max_mem, mem)
+
+    @property
+    def mean_time(self) -> float:
+        return self.time / self.count if self.count else 0.0
+
+    @property
+    def mean_mem(self) -> float:
+        return self.mem / self.mem_count if self.mem_count else 0.0
+
+    @property
+    def code(self):
+        return linecache.getline(self.filename, self.lineno).rstrip("\n")
+
+
+class ProfileStore:
+    """Ring buffer of profile results limited by number of records and memory"""
+
+    def __init__(self, max_records: int = 100, max_bytes: int = 8 * 1024 * 1024):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self._records = deque()
+        self._size = 0
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, profile: SimpleProfile, route: bytes, duration: float) -> ProfileRecord:
+        lines = tuple(
+            (line.filename, line.lineno, line.depth, line.time, line.mem, line.ncalls) for line in profile.get_lines()
+        )
+        record = ProfileRecord(self._next_id, route, duration, lines, profile.peak_memory)
+        self._next_id += 1
+        self._records.append(record)
+        self._size += record.size
+        while len(self._records) > self.max_records or (self._size > self.max_bytes and len(self._records) > 1):
+            self._size -= self._records.popleft().size
+        return record
+
+    def records(self, route: Optional[bytes] = None) -> List[ProfileRecord]:
+        return [record for record in self._records if route is None or record.route == route]
+
+    def get(self, record_id: int) -> Optional[ProfileRecord]:
+        for record in self._records:
+            if record.id == record_id:
+                return record
+        return None
+
+    def aggregate(self, route: Optional[bytes] = None) -> List[LineStats]:
+        """
+        Per line mean and max time and memory across records of route
+        """
+        stats: Dict[Tuple[str, int, int], LineStats] = {}
+        for record in self.records(route):
+            for filename, lineno, depth, time_, mem, _ in record.lines:
+                key = (filename, lineno, depth)
+                if key not in stats:
+                    stats[key] = LineStats(filename, lineno, depth)
+                stats[key].add(time_, None if record.peak_memory is None else mem)
+        return sorted(stats.values(), key=lambda s: (s.filename, s.depth, s.lineno))
+
+    def routes(self) -> List[bytes]:
+        return sorted({record.route for record in self._records})
+
+
+def format_allocations(store: ProfileStore, route: Optional[bytes] = None, limit: int = 10) -> str:
+    """
+    Peak memory per route and lines allocating the most
+    """
+    lines = []
+    for route_ in [route] if route else store.routes():
+        records = store.records(route_)
+        if not records:
+            continue
+        peaks = [record.peak_memory for record in records if record.peak_memory is not None]
+        if not peaks:
+            continue
+        lines.append(
+            f"{route_.decode()}: n {len(peaks)}; peak mean {sum(peaks) / len(peaks):.0f}B max {max(peaks)}B"
+        )
+        top = sorted((line for line in store.aggregate(route_) if line.max_mem), key=lambda s: -s.mean_mem)[:limit]
+        for line in top:
+            lines.append(
+                f"\t{line.filename}:{line.lineno}: {line.code.strip()} "
+                f"\t <- mean {line.mean_mem:.0f}B max {line.max_mem}B"
+            )
+    return "\n".join(lines)
+
+
+def _format_peak(record: ProfileRecord) -> str:
+    return "-" if record.peak_memory is None else f"{record.peak_memory}B"
+
+
+def format_records(records: List[ProfileRecord]) -> str:
+    return "\n".join(
+        f"{record.id}\t{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.time))}\t"
+        f"{record.duration:.6f}s\t{_format_peak(record)}\t{record.route.decode()}"
+        for record in records
+    )
+
+
+def format_record(record: ProfileRecord) -> str:
+    lines = [f"{record.route.decode()} {record.duration:.6f}s peak memory {_format_peak(record)}"]
+    filename = None
+    for line_filename, lineno, _, time_, mem, ncalls in record.lines:
+        if filename != line_filename:
+            filename = line_filename
+            lines.append(f"--> {filename}")
+        code = linecache.getline(line_filename, lineno).rstrip("\n")
+        if mem or time_:
+            lines.append(f"{lineno}: {code} \t <- {time_:.6f}s; {mem}B nc {ncalls}")
+        else:
+            lines.append(f"{lineno}: {code}")
+    return "\n".join(lines)
+
+
+def format_aggregate(stats: List[LineStats]) -> str:
+    lines = []
+    filename = None
+    for line in stats:
+        if filename != line.filename:
+            filename = line.filename
+            lines.append(f"--> {filename}")
+        if line.max_time or line.max_mem:
+            lines.append(
+                f"{line.lineno}: {line.code} \t <- mean {line.mean_time:.6f}s max {line.max_time:.6f}s; "
+                f"mean {line.mean_mem:.0f}B max {line.max_mem}B; n {line.count}"
+            )
+        else:
+            lines.append(f"{line.lineno}: {line.code}")
+    return "\n".join(lines)
+
+
 def print_result(profile: SimpleProfile):
     filename = None
     for line in profile.get_lines():
@@ -2,6 +2,7 @@
 import time
 import asyncio
 from levin import app
+from levin.asgi import ASGIAdapter
 import ujson
 import faulthandler
 # import uvloop
@@ -90,6 +91,9 @@ def del_root(request):
     return {"status": "20"}
 
 
+asgi_app = ASGIAdapter(app)  # uvicorn run:asgi_app
+
+
 if __name__ == '__main__':
     faulthandler.enable()
     app.cli()
@@ -52,3 +52,9 @@ async def amemory_simple():
     await asyncio.sleep(0.0001)
     a = list(range(1000))
     return a
+
+
+def busy(seconds=0.1):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
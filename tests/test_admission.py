@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from levin.components import Admission, HttpRouter
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+async def _create_app(**config):
+    app = Application(components=[Admission(**config), HttpRouter()])
+    event = asyncio.Event()
+
+    @app.route.get("/slow")
+    async def slow():
+        await event.wait()
+        return Response(200, b"slow")
+
+    @app.route.get("/limited", max_concurrency=1, max_queue=0)
+    async def limited():
+        await event.wait()
+        return Response(200, b"limited")
+
+    await app.start()
+    return app, event
+
+
+@pytest.mark.asyncio
+async def test_admission_shed_global():
+    app, event = await _create_app(max_concurrency=1, max_queue=0, max_lag=0)
+    first = asyncio.create_task(app.handler(Request(b"/slow")))
+    await asyncio.sleep(0)
+
+    response = await app.handler(Request(b"/slow"))
+    assert response.status == 503
+    assert response.headers[b"retry-after"] == b"1"
+
+    event.set()
+    assert (await first).status == 200
+    assert app.admission.rejected == 1
+    await app.stop()
+
+
+@pytest.mark.asyncio
+async def test_admission_queue():
+    app, event = await _create_app(max_concurrency=1, max_queue=1, max_lag=0)
+    first = asyncio.create_task(app.handler(Request(b"/slow")))
+    second = asyncio.create_task(app.handler(Request(b"/slow")))
+    await asyncio.sleep(0)
+
+    event.set()
+    assert (await first).status == 200
+    assert (await second).status == 200
+    assert app.admission.rejected == 0
+    await app.stop()
+
+
+@pytest.mark.asyncio
+async def test_admission_queue_timeout():
+    app, event = await _create_app(max_concurrency=1, max_queue=1, max_lag=0, queue_timeout=0.01)
+    first = asyncio.create_task(app.handler(Request(b"/slow")))
+    await asyncio.sleep(0)
+
+    assert (await app.handler(Request(b"/slow"))).status == 503
+    event.set()
+    await first
+    await app.stop()
+
+
+@pytest.mark.asyncio
+async def test_admission_per_route():
+    app, event = await _create_app(max_lag=0)
+    first = asyncio.create_task(app.handler(Request(b"/limited")))
+    await asyncio.sleep(0)
+
+    assert (await app.handler(Request(b"/limited"))).status == 503
+    slow = asyncio.create_task(app.handler(Request(b"/slow")))
+    await asyncio.sleep(0)
+    assert not slow.done()
+
+    event.set()
+    assert (await first).status == 200
+    assert (await slow).status == 200
+    await app.stop()
+
+
+@pytest.mark.asyncio
+async def test_admission_lag():
+    app, event = await _create_app(max_lag=0.01, lag_interval=0.01)
+    app.admission._lag.value = 1
+    assert (await app.handler(Request(b"/slow"))).status == 503
+    await app.stop()
+
+
+@pytest.mark.asyncio
+async def test_limiter_slot_handed_over_at_timeout(monkeypatch):
+    from levin.utils.limiter import Limiter
+
+    limiter = Limiter(1, 1)
+    assert await limiter.acquire(1)
+
+    async def _wait_for(future, timeout):
+        limiter.release()  # holder hands the slot over just before the timeout fires
+        assert future.done()
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(asyncio, "wait_for", _wait_for)
+    assert not await limiter.acquire(1)
+    assert limiter.active == 0  # the slot is not lost
+    assert not limiter.queued
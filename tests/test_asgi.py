@@ -0,0 +1,172 @@
+import pytest
+
+from levin.asgi import ASGIAdapter, ASGIHost
+from levin.components import AddRequest, HttpRouter, JsonFormat, PatchRequest
+from levin.core.app import Application
+from levin.testing import DIRECT, H2, HTTP1, Client
+
+
+async def _asgi3(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            scope["state"]["events"] = scope["state"].get("events", 0) + 1
+            await send({"type": message["type"] + ".complete"})
+            if message["type"] == "lifespan.shutdown":
+                return
+    message = await receive()
+    body = f"{scope['method']} {scope['path']} {scope['query_string'].decode()} {len(message['body'])}".encode()
+    headers = [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode()), (b"x-a", b"1")]
+    await send({"type": "http.response.start", "status": 201, "headers": headers + [(b"x-a", b"2")]})
+    await send({"type": "http.response.body", "body": body[:3], "more_body": True})
+    await send({"type": "http.response.body", "body": body[3:]})
+
+
+class _Asgi2:
+    def __init__(self, scope):
+        self.scope = scope
+
+    async def __call__(self, receive, send):
+        if self.scope["type"] != "http":
+            raise ValueError("no lifespan")
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"asgi2"})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("protocol", [DIRECT, HTTP1, H2])
+async def test_host_asgi3(protocol):
+    async with Client(ASGIHost(_asgi3), protocol) as client:
+        response = await client.post("/a%20b?x=1", b"x" * 10)
+
+    assert (response.status, response.body) == (201, b"POST /a b x=1 10")
+    assert response.headers[b"x-a"] == b"1, 2"
+    assert response.headers.get(b"content-length", b"16") == b"16"  # set once by parser
+
+
+@pytest.mark.asyncio
+async def test_host_asgi2_without_lifespan():
+    async with Client(ASGIHost(_Asgi2), HTTP1) as client:
+        response = await client.get("/")
+
+    assert (response.status, response.body) == (200, b"asgi2")
+
+
+class _Asgi3Class:
+    def __init__(self, scope, receive, send):
+        self.send = send
+
+    def __await__(self):
+        return self._respond().__await__()
+
+    async def _respond(self):
+        cookies = [(b"set-cookie", b"a=1; Path=/"), (b"Set-Cookie", b"b=2, expires")]
+        await self.send({"type": "http.response.start", "status": 200, "headers": cookies})
+        await self.send({"type": "http.response.body", "body": b"cookies"})
+
+
+@pytest.mark.asyncio
+async def test_host_asgi3_class_and_cookies():
+    from levin.core.common import Request
+    from levin.core.parsers.http_simple import Parser
+
+    async with Client(ASGIHost(_Asgi3Class, lifespan=False), DIRECT) as client:
+        response = await client.get("/")
+
+    assert response.body == b"cookies"
+    head = b"".join(Parser.handle_response(response, Request(b"/"))).split(b"\r\n")
+    assert b"Set-cookie: a=1; Path=/" in head
+    assert b"Set-cookie: b=2, expires" in head  # each cookie with its own line
+
+
+@pytest.mark.asyncio
+async def test_host_disconnect():
+    import asyncio
+
+    from levin.core.common import Request
+
+    messages = []
+
+    async def app(scope, receive, send):
+        messages.append(await receive())
+        messages.append(await receive())  # streaming application waits for disconnect
+
+    host = ASGIHost(app, lifespan=False)
+    handler = asyncio.ensure_future(host.handler(Request(b"/")))
+    await asyncio.sleep(0.01)
+    handler.cancel()  # connection is lost
+    await asyncio.sleep(0.01)
+
+    assert [message["type"] for message in messages] == ["http.request", "http.disconnect"]
+
+
+def _create_app():
+    app = Application(components=[PatchRequest(), HttpRouter(), JsonFormat(), AddRequest()])
+
+    @app.route.get("/users/{user}")
+    async def user(request):
+        return {"user": request.user, "page": request.query_params[b"page"][0].decode()}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_adapter():
+    adapter = ASGIAdapter(_create_app())
+    lifespan = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive_lifespan():
+        return lifespan.pop(0)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/users/1",
+        "raw_path": b"/users/1",
+        "query_string": b"page=2",
+        "headers": [(b"host", b"test")],
+    }
+    await adapter({"type": "lifespan"}, receive_lifespan, send)
+    await adapter(scope, receive, send)
+
+    assert [message["type"] for message in sent] == [
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+        "http.response.start",
+        "http.response.body",
+    ]
+    assert sent[2]["status"] == 200
+    assert (b"content-length", b"26") in sent[2]["headers"]
+    assert sent[3]["body"] == b'{"user": "1", "page": "2"}'
+
+
+@pytest.mark.asyncio
+async def test_adapter_hosted():
+    async with Client(ASGIHost(ASGIAdapter(_create_app())), H2) as client:
+        response = await client.get("/users/2?page=3")
+
+    assert (response.status, response.body) == (200, b'{"user": "2", "page": "3"}')
+
+
+@pytest.mark.parametrize(
+    "info, expected",
+    [
+        ((("127.0.0.1", 5000), ("127.0.0.1", 8000)), (("127.0.0.1", 5000), ("127.0.0.1", 8000))),
+        ((("::1", 5000, 0, 0), ("::1", 8000, 0, 0)), (("::1", 5000), ("::1", 8000))),
+        (("", "/run/levin.sock"), (None, ("/run/levin.sock", None))),  # unix socket
+    ],
+)
+def test_host_transport_info(info, expected):
+    from levin.asgi import _get_transport_info
+    from levin.core.common import Request
+
+    request = Request(b"/")
+    request.set("get_transport_info", lambda _: lambda: info, lazy=True)
+    assert _get_transport_info(request) == expected
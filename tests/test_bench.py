@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from levin.bench import H2, HTTP1, Scenario, run_scenario
+from levin.bench.micro import CALIBRATION, compare, get_best, get_spread, run
+from levin.components import AddRequest, HttpRouter
+from levin.core.app import Application
+from levin.core.common import Response
+from levin.core.server import Server
+
+
+def test_scenario_from_dict():
+    scenario = Scenario.from_dict({"name": "post", "path": "/p", "method": "POST", "headers": {"x-test": "1"}})
+    assert (scenario.path, scenario.method, scenario.headers) == (b"/p", b"POST", ((b"x-test", b"1"),))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("protocol, depth", [(HTTP1, 1), (H2, 4)])
+async def test_run_scenario(protocol, depth):
+    app = Application(components=[HttpRouter(), AddRequest()])
+
+    @app.route.get("/")
+    async def index(request):
+        return Response(200, b"ok")
+
+    await app.start()
+    server = await asyncio.get_running_loop().create_server(Server(app).handle_connection, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        scenario = Scenario("test", protocol=protocol, connections=2, depth=depth, duration=0.2)
+        result = await run_scenario(scenario, port=port)
+    finally:
+        server.close()
+        await app.stop()
+
+    assert result["scenario"] == "test"
+    assert result["requests"] > 0
+    assert result["errors"] == 0
+    assert 0 < result["latency"]["p50"] <= result["latency"]["p99"] <= result["latency"]["max"]
+
+
+def test_micro_compare_scaled_by_calibration():
+    baseline = {CALIBRATION: 1.0, "router": 1.0, "parser": 1.0}
+
+    assert compare({CALIBRATION: 2.0, "router": 2.2, "parser": 2.6, "new": 1.0}, baseline, tolerance=0.2) == [
+        ("parser", 1.3, 1.2)
+    ]
+
+
+def test_micro_run():
+    results = run(["router_500_first", "pipeline_json"], min_time=0.01)
+    assert list(results) == [CALIBRATION, "router_500_first", "pipeline_json"]
+    assert all(result > 0 for result in results.values())
+
+
+def test_micro_compare_within_spread():
+    baseline = {CALIBRATION: 1.0, "router": 1.0, "parser": 1.0}
+    spread = get_spread({CALIBRATION: [1.0, 2.0, 1.0], "router": [1.0, 2.0, 1.5], "parser": [1.0, 2.0, 1.0]})
+
+    assert spread == {"router": 0.5, "parser": 0.0}
+    assert compare({CALIBRATION: 1.0, "router": 1.24, "parser": 1.24}, baseline, 0.2, spread) == [
+        ("parser", 1.24, 1.2)
+    ]
+    # large spread of noisy machine widens tolerance by max_spread at most
+    assert compare({CALIBRATION: 1.0, "router": 1.3}, baseline, 0.2, spread, max_spread=0.05) == [
+        ("router", 1.3, 1.25)
+    ]
+
+
+
+def test_micro_best_of_rounds():
+    rounds = {CALIBRATION: [1.0, 2.0, 1.5], "router": [1.5, 3.0, 1.2]}
+    assert get_best(rounds) == {CALIBRATION: 1.0, "router": 1.2}
@@ -0,0 +1,276 @@
+import asyncio
+import os
+import pickle
+import threading
+import time
+
+import pytest
+
+from levin.components import (
+    AdaptiveExecutor,
+    AddRequest,
+    HttpRouter,
+    LoggerComponent,
+    PatchRequest,
+    RunProcess,
+    SyncToAsync,
+)
+from levin.components.concurrent import SharedBytes, _Pool, _RouteCost
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+def test_request_pickle_keeps_plain_scope():
+    request = Request(b"/test?q=1", method=b"POST", body=b"body", headers=((b"X-Test", b"1"),), stream=3)
+    request.set("pattern", b"/test")
+    request.set("json", lambda r: {}, lazy=True)
+
+    restored = pickle.loads(pickle.dumps(request))
+
+    assert (restored.raw_path, restored.method, restored.body, restored.stream) == (b"/test?q=1", b"POST", b"body", 3)
+    assert restored.headers[b"x-test"] == b"1"
+    assert restored.pattern == b"/test"
+    assert restored.get("json") is None
+
+
+def test_shared_bytes():
+    shared = SharedBytes.create(b"x" * 100)
+    shared = pickle.loads(pickle.dumps(shared))
+    assert shared.read(unlink=True) == b"x" * 100
+    shared.unlink()  # already removed
+
+
+@pytest.mark.asyncio
+async def test_run_process_resolve_handler_by_route():
+    app = Application(
+        components=[PatchRequest(), HttpRouter(), RunProcess(max_workers=1, shm_threshold=1024), AddRequest()]
+    )
+
+    @app.route.post("/echo/{id}", process=True)
+    def echo(request):
+        return Response(200, request.body + request.query_params[b"q"][0], headers={b"pid": os.getpid()})
+
+    await app.start()
+    try:
+        response = await app.handler(Request(b"/echo/1?q=end", method=b"POST", body=b"x" * 4096))
+    finally:
+        await app.stop()
+
+    assert response.body == b"x" * 4096 + b"end"
+    assert response.headers[b"pid"] != os.getpid()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="shared memory is listed in /dev/shm")
+async def test_run_process_cancelled_request_unlinks_shared_memory():
+    app = Application(components=[HttpRouter(), RunProcess(max_workers=1, shm_threshold=1024), AddRequest()])
+
+    @app.route.post("/slow", process=True)
+    def slow(request):
+        time.sleep(0.2)
+        return Response(200, request.body)
+
+    await app.start()
+    try:
+        segments = set(os.listdir("/dev/shm"))
+        request = asyncio.ensure_future(app.handler(Request(b"/slow", method=b"POST", body=b"x" * 4096)))
+        await asyncio.sleep(0.1)
+        request.cancel()  # client is gone while worker runs
+        await asyncio.sleep(0.3)
+    finally:
+        await app.stop()
+
+    assert set(os.listdir("/dev/shm")) == segments
+
+
+@pytest.mark.asyncio
+async def test_run_process_forks_before_threads_start():
+    threads_at_fork = []
+
+    class _RunProcess(RunProcess):
+        async def start(self, app):
+            threads_at_fork.append(threading.active_count())
+            await super().start(app)
+
+    app = Application(
+        components=[LoggerComponent(background=True), HttpRouter(), _RunProcess(max_workers=1), AddRequest()]
+    )
+
+    @app.route.get("/pid", process=True)
+    def pid(request):
+        return Response(200, str(os.getpid()).encode())
+
+    threads = threading.active_count()
+    await app.start()
+    try:
+        assert (await app.handler(Request(b"/pid"))).body != str(os.getpid()).encode()
+    finally:
+        await app.stop()
+
+    assert threads_at_fork == [threads]  # logger drain thread is started after workers
+
+
+def test_run_in_worker_unknown_route():
+    from levin.components import concurrent
+
+    app = Application(components=[HttpRouter(), AddRequest()])
+    concurrent._init_worker(app)  # pylint: disable=protected-access
+    try:
+        response = concurrent._run_in_worker((b"GET", b"/missing"), None, Request(b"/missing"), 1024)
+    finally:
+        concurrent._init_worker(None)  # pylint: disable=protected-access
+    assert response.status == 500
+
+
+@pytest.mark.asyncio
+async def test_sync_to_async_pool_bulkhead():
+    app = Application(
+        components=[
+            HttpRouter(),
+            SyncToAsync(pools={"slow": {"min_workers": 1, "max_workers": 1, "max_queue": 1}}),
+            AddRequest(),
+        ]
+    )
+
+    @app.route.get("/slow", pool="slow")
+    def slow(request):
+        time.sleep(0.1)
+        return Response(200, b"slow")
+
+    @app.route.get("/fast")
+    def fast(request):
+        return Response(200, b"fast")
+
+    await app.start()
+    try:
+        slow_requests = [asyncio.ensure_future(app.handler(Request(b"/slow"))) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        assert (await app.handler(Request(b"/fast"))).body == b"fast"
+        assert time.perf_counter() - start < 0.05
+        statuses = sorted(response.status for response in await asyncio.gather(*slow_requests))
+        metrics = {name: list(samples) for name, _, _, samples in app.sync_to_async.collect_metrics()}
+    finally:
+        await app.stop()
+
+    assert statuses == [200, 200, 503]
+    assert metrics["pool_rejected_total"] == [({"pool": "slow"}, 1)]
+
+
+@pytest.mark.asyncio
+async def test_pool_grows_on_queue_wait():
+    pool = _Pool("test", min_workers=1, max_workers=4)
+    await pool.limiter.acquire(0)
+    waiter = asyncio.ensure_future(pool.limiter.acquire(1))
+    await asyncio.sleep(0)
+    for _ in range(_Pool.ADJUST_EVERY):
+        pool.observe(wait=0.1, service=0.01)
+
+    assert pool.limiter.limit == 2
+    assert await waiter
+    assert pool.limiter.active == 2
+    pool.executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_adaptive_executor_offload_cpu_bound_route():
+    decisions = []
+    app = Application(
+        components=[
+            HttpRouter(),
+            AdaptiveExecutor(min_samples=3, min_cost=0.001, on_decision=decisions.append),
+            RunProcess(max_workers=1),
+            SyncToAsync(),
+            AddRequest(),
+        ]
+    )
+
+    @app.route.get("/cpu")
+    def cpu(request):
+        return Response(200, b"", headers={b"pid": os.getpid()})
+
+    executor = app.adaptive_executor
+    await app.start()
+    try:
+        assert (await app.handler(Request(b"/cpu"))).headers[b"pid"] == os.getpid()
+        await asyncio.sleep(0)  # measurement of worker thread is recorded in the loop
+        assert executor._routes[b"GET /cpu"].samples == 1  # pylint: disable=protected-access
+
+        # fixed samples instead of real cpu time
+        cost = executor._routes[b"GET /cpu"] = _RouteCost()  # pylint: disable=protected-access
+        for _ in range(2):
+            executor._observe_sync(b"GET /cpu", cost, 0.01, 0.01)  # pylint: disable=protected-access
+        assert not cost.offloaded and not decisions
+        executor._observe_sync(b"GET /cpu", cost, 0.01, 0.01)  # pylint: disable=protected-access
+        assert cost.offloaded
+        response = await app.handler(Request(b"/cpu"))
+    finally:
+        await app.stop()
+
+    assert response.headers[b"pid"] != os.getpid()
+    assert [decision.action for decision in decisions] == ["move to process pool"]
+    assert decisions[0].route == b"GET /cpu"
+    assert app.adaptive_executor.decisions == decisions
+
+
+@pytest.mark.asyncio
+async def test_adaptive_executor_detect_blocking_async_route():
+    decisions = []
+    app = Application(components=[HttpRouter(), AdaptiveExecutor(on_decision=decisions.append), AddRequest()])
+
+    @app.route.get("/block")
+    async def block(request):
+        await asyncio.sleep(0)
+        time.sleep(0.03)
+        return Response(200, b"")
+
+    await app.start()
+    await app.handler(Request(b"/block"))
+    await app.stop()
+
+    assert [decision.action for decision in decisions] == ["blocks the loop"]
+    assert decisions[0].cost >= 0.03
+
+
+@pytest.mark.asyncio
+async def test_steps_forward_errors_and_cancel():
+    from levin.components.concurrent import _Steps
+
+    cleaned = []
+
+    async def handler():
+        future = asyncio.get_running_loop().create_future()
+        future.get_loop().call_soon(future.set_exception, ValueError())
+        try:
+            await future
+        except ValueError:
+            pass  # error of awaited future is thrown into coroutine
+        try:
+            await asyncio.sleep(1)
+        finally:
+            await asyncio.sleep(0)  # await in cleanup, like `async with`
+            cleaned.append(True)
+
+    task = asyncio.ensure_future(_Steps(handler()))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert cleaned == [True]
+
+
+@pytest.mark.asyncio
+async def test_steps_handler_sees_cancel():
+    from levin.components.concurrent import _Steps
+
+    async def handler():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            return "cancelled"
+        return "done"
+
+    task = asyncio.ensure_future(_Steps(handler()))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    assert await task == "cancelled"
@@ -0,0 +1,38 @@
+import pytest
+
+from levin.components import AddRequest, HttpRouter, TemplateFormat
+from levin.core.app import Application
+from levin.core.common import Request
+
+
+@pytest.mark.asyncio
+async def test_templates_are_read_on_demand(tmp_path):
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "pages" / "index.html").write_text("Hello $name")
+    templates = TemplateFormat(templates_dirs=(str(tmp_path),))
+    app = Application(components=[HttpRouter(), templates, AddRequest()])
+
+    @app.route.get("/", template="index.html")
+    async def index(request):
+        return {"name": "levin"}
+
+    await app.start()
+    assert templates._templates == {}  # pylint: disable=protected-access
+
+    response = await app.handler(Request(b"/"))
+    assert response.body == b"Hello levin"
+    assert templates.list() == str(tmp_path / "pages" / "index.html")
+
+
+def test_templates_directories_walked_once(tmp_path, monkeypatch):
+    (tmp_path / "index.html").write_text("index")
+    templates = TemplateFormat(templates_dirs=(str(tmp_path),))
+    walks = []
+    walk = templates._walk  # pylint: disable=protected-access
+    monkeypatch.setattr(templates, "_walk", lambda: walks.append(1) or walk())
+
+    for _ in range(3):
+        with pytest.raises(Exception, match="Wrong template name"):
+            templates.render("missing.html", {})
+    assert templates.render("index.html", {}) == b"index"
+    assert len(walks) == 1
@@ -0,0 +1,94 @@
+import pytest
+
+from levin.components import HttpRouter, RateLimit
+from levin.components.limit import _Buckets
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+def test_buckets_take():
+    buckets = _Buckets(8)
+    assert buckets.take(1, 0.0, rate=1, burst=2) == 0
+    assert buckets.take(1, 0.0, rate=1, burst=2) == 0
+    assert buckets.take(1, 0.0, rate=1, burst=2) == 1
+    assert buckets.take(1, 0.5, rate=1, burst=2) == pytest.approx(0.5)
+    assert buckets.take(1, 1.0, rate=1, burst=2) == 0
+    assert buckets.take(2, 1.0, rate=1, burst=2) == 0  # other key
+
+
+def test_buckets_collision_keeps_tokens():
+    buckets = _Buckets(1)
+    assert buckets.take(1, 0.0, rate=1, burst=1) == 0
+    assert buckets.take(2, 0.0, rate=1, burst=1) == 0  # own bucket: evicts key 1
+    assert buckets.take(2, 0.0, rate=1, burst=1) == 1
+    assert buckets.take(1, 0.0, rate=1, burst=1) == 0  # evicted key starts again, is not locked out
+
+
+def test_buckets_rotating_keys_dont_lock_out():
+    buckets = _Buckets(8, ways=4)
+    assert buckets.take(0, 0.0, rate=1, burst=2) == 0
+    for key in range(2, 1000, 2):  # attacker keys of the same set
+        buckets.take(key, 0.0, rate=1, burst=2)
+        buckets.take(key, 0.0, rate=1, burst=2)
+    assert buckets.take(0, 0.0, rate=1, burst=2) == 0
+    assert buckets.take(1, 0.0, rate=1, burst=2) == 0  # other set is untouched
+
+
+class _Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _create_app(**config):
+    clock = _Clock()
+    app = Application(components=[HttpRouter(), RateLimit(get_time=clock, key_header=b"x-client", **config)])
+
+    @app.route.get("/")
+    async def root():
+        return Response(200, b"root")
+
+    @app.route.get("/limited", rate_limit=(1, 1))
+    async def limited():
+        return Response(200, b"limited")
+
+    await app.start()
+    return app, clock
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_route_meta():
+    app, clock = await _create_app()
+    client_a = ((b"x-client", b"a"),)
+    client_b = ((b"x-client", b"a, b"),)  # client sent "a", proxy appended "b"
+
+    assert (await app.handler(Request(b"/limited", headers=client_a))).status == 200
+    response = await app.handler(Request(b"/limited", headers=client_a))
+    assert response.status == 429
+    assert response.headers[b"retry-after"] == b"1"
+    assert (await app.handler(Request(b"/limited", headers=client_b))).status == 200
+    assert (await app.handler(Request(b"/", headers=client_a))).status == 200
+
+    clock.now = 1.0
+    assert (await app.handler(Request(b"/limited", headers=client_a))).status == 200
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_global():
+    app, _ = await _create_app(rate=1, burst=2)
+    assert (await app.handler(Request(b"/"))).status == 200
+    assert (await app.handler(Request(b"/"))).status == 200
+    assert (await app.handler(Request(b"/"))).status == 429
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_fractional_rate():
+    app, clock = await _create_app(rate=0.5)
+    assert (await app.handler(Request(b"/"))).status == 200
+    response = await app.handler(Request(b"/"))
+    assert response.status == 429
+    assert response.headers[b"retry-after"] == b"2"
+
+    clock.now = 2.0
+    assert (await app.handler(Request(b"/"))).status == 200
@@ -0,0 +1,73 @@
+import logging
+
+import pytest
+
+from levin.components import HttpRouter, LoggerComponent
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+async def _create_app(**config):
+    app = Application(components=[LoggerComponent(logger_name="test_logger", logger_config={}, **config), HttpRouter()])
+
+    @app.route.get("/")
+    async def root():
+        return Response(200, b"root")
+
+    @app.route.get("/error")
+    async def error():
+        return Response(500, b"error")
+
+    await app.start()
+    return app
+
+
+def _messages(caplog):
+    return [record.getMessage() for record in caplog.records if record.name == "test_logger"]
+
+
+@pytest.mark.asyncio
+async def test_logger_sample_rates(caplog):
+    caplog.set_level(logging.INFO, logger="test_logger")
+    app = await _create_app(background=False, sample_rates={2: 0.0})
+    await app.handler(Request(b"/"))
+    await app.handler(Request(b"/error"))
+    await app.stop()
+
+    requests = [message for message in _messages(caplog) if message.startswith('"GET')]
+    assert len(requests) == 1
+    assert requests[0].startswith('"GET /error " 500')
+
+
+@pytest.mark.asyncio
+async def test_logger_background_overflow_and_flush_on_stop(caplog):
+    caplog.set_level(logging.INFO, logger="test_logger")
+    app = await _create_app(queue_size=2, batch_size=100, flush_interval=60)
+    request = Request(b"/")
+    request.set("get_transport_info", lambda _: lambda: (("1.2.3.4", 1), None), lazy=True)
+    await app.handler(request)
+    for _ in range(4):
+        await app.handler(Request(b"/"))
+    assert not [message for message in _messages(caplog) if message.startswith('"GET')]  # waits in queue
+
+    await app.stop()
+
+    messages = _messages(caplog)
+    requests = [message for message in messages if message.startswith('"GET')]
+    assert len(requests) == 2
+    assert "Log queue overflow: 3 records dropped" in messages
+    assert messages[-1] == "Server stop"
+
+
+@pytest.mark.asyncio
+async def test_logger_record_keeps_peer_address(caplog):
+    caplog.set_level(logging.INFO, logger="test_logger")
+    app = await _create_app()
+    request = Request(b"/")
+    request.set("get_transport_info", lambda _: lambda: (("1.2.3.4", 1), None), lazy=True)
+    await app.handler(request)
+    await app.stop()
+
+    assert [message for message in _messages(caplog) if message.startswith('"GET')][0].endswith(
+        "(('1.2.3.4', 1), None)"
+    )
@@ -0,0 +1,83 @@
+import pytest
+
+from levin.components import Admission, HttpRouter, Metrics
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+class _Clock:
+    now = 0.0
+
+    def __call__(self):
+        self.now += 0.02
+        return self.now
+
+
+async def _not_found():
+    return Response(404, b"")
+
+
+@pytest.mark.asyncio
+async def test_metrics_export():
+    app = Application(
+        components=[
+            Metrics(get_time=_Clock(), buckets=(0.01, 0.1), http_token="secret"),
+            Admission(max_lag=0),
+            HttpRouter(not_found_handler=_not_found),
+        ]
+    )
+
+    @app.route.get("/user/{name}")
+    async def user():
+        return Response(200, b"user")
+
+    await app.start()
+    await app.handler(Request(b"/user/a", body=b"12"))
+    await app.handler(Request(b"/user/b"))
+    await app.handler(Request(b"/missing"))
+
+    assert (await app.handler(Request(b"/metrics"))).status == 403
+    response = await app.handler(Request(b"/metrics", headers=((b"authorization", b"Bearer secret"),)))
+    assert response.status == 200
+    lines = response.body.decode().splitlines()
+
+    assert 'levin_request_duration_seconds_bucket{method="GET",route="/user/{name}",le="0.01"} 0' in lines
+    assert 'levin_request_duration_seconds_bucket{method="GET",route="/user/{name}",le="0.1"} 2' in lines
+    assert 'levin_request_duration_seconds_bucket{method="GET",route="/user/{name}",le="+Inf"} 2' in lines
+    assert 'levin_request_duration_seconds_count{method="GET",route="/user/{name}"} 2' in lines
+    assert 'levin_requests_total{method="GET",route="/user/{name}",status="2xx"} 2' in lines
+    assert 'levin_requests_total{method="GET",route="-",status="4xx"} 1' in lines
+    assert 'levin_requests_in_flight{method="GET",route="/user/{name}"} 0' in lines
+    assert 'levin_request_bytes_total{method="GET",route="/user/{name}"} 2' in lines
+    assert 'levin_response_bytes_total{method="GET",route="/user/{name}"} 8' in lines
+    assert "levin_admission_rejected_total 0" in lines
+    assert any(line.startswith("levin_connection_writes_saved_total ") for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_metrics_escape_label_values():
+    import re
+
+    app = Application(components=[Metrics(), HttpRouter(not_found_handler=_not_found)])
+
+    @app.route.get(re.compile(rb'/files/\w+\.txt|/"quoted"'))
+    async def files():
+        return Response(200, b"file")
+
+    await app.start()
+    await app.handler(Request(b"/files/a.txt"))
+
+    lines = app.metrics.export().splitlines()
+    assert 'levin_requests_total{method="GET",route="/files/\\\\w+\\\\.txt|/\\"quoted\\"",status="2xx"} 1' in lines
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_disabled_without_token():
+    app = Application(components=[Metrics(), HttpRouter(not_found_handler=_not_found)])
+
+    @app.route.get("/metrics")
+    async def own():
+        return Response(200, b"own")
+
+    await app.start()
+    assert (await app.handler(Request(b"/metrics"))).body == b"own"
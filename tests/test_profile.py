@@ -1,9 +1,15 @@
+import asyncio
+import sys
 import time
+import tracemalloc
 
 import pytest
 
 from . import samples
-from levin.utils.profile import SimpleProfile
+from levin.components import HttpRouter, LoggerComponent, PatchRequest, ProfileHandler
+from levin.core.app import Application
+from levin.core.common import Request, Response
+from levin.utils.profile import ProfileStore, SamplingProfile, SimpleProfile, format_allocations
 
 
 def test_simple_profile_simple():
@@ -282,3 +288,191 @@ async def test_amemory_simple():
 
     assert len(result) == 3, result
     assert result[1].mem > 0, result
+
+
+def test_sampling_profile():
+    route = None
+    profile_result = SamplingProfile(interval=0.001, get_route=lambda: route)
+    profile_result.start()
+    samples.busy(0.05)
+    route = b"/busy"
+    samples.busy(0.1)
+    profile_result.stop()
+
+    folded = profile_result.folded()
+    assert folded
+    assert all(line.startswith("/busy;") for line in folded)
+    assert any(";busy (" in line for line in folded)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in folded) == profile_result.samples
+    assert profile_result.folded(b"/other") == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_profiles_aio():
+    profile_deep, profile_simple = SimpleProfile(), SimpleProfile()
+    await asyncio.gather(profile_deep.run(samples.adeep), profile_simple.run(samples.simple_aio))
+
+    result = profile_deep.get_lines()
+    assert len(result) == 3, result
+    assert 0.1 < result[0].time < 0.2
+    assert 0.1 < result[2].time < 0.2
+
+    result = profile_simple.get_lines()
+    assert len(result) == 1, result
+    assert 0.1 < result[0].time < 0.2
+    assert sys.getprofile() is None
+
+
+@pytest.mark.asyncio
+async def test_profile_handler_concurrent_requests():
+    profiles = []
+    app = Application(
+        components=[LoggerComponent(background=False), HttpRouter(), ProfileHandler(callback=profiles.append)]
+    )
+
+    @app.route.get("/sleep/{id}")
+    async def sleep():
+        await samples.simple_aio()
+        return Response(200, b"")
+
+    await app.start()
+    await app.handler(Request(b"/sleep/1"))
+    assert not profiles
+
+    await asyncio.gather(app.handler(Request(b"/sleep/2")), app.handler(Request(b"/sleep/3")))
+    assert len(profiles) == 2
+    for profile in profiles:
+        result = [line for line in profile.get_lines() if "simple_aio" in line.code]
+        assert len(result) == 1, result
+        assert 0.1 < result[0].time < 0.2
+
+    await app.handler(Request(b"/sleep/4"))
+    assert len(profiles) == 2
+    await app.stop()
+
+
+def test_profile_store():
+    store = ProfileStore(max_records=2)
+    for _ in range(2):
+        profile_result = SimpleProfile()
+        profile_result.run(samples.simple)
+        store.add(profile_result, b"GET /simple", 0.1)
+    store.add(SimpleProfile(), b"GET /other", 0.2)
+
+    assert len(store) == 2
+    assert [record.id for record in store.records()] == [2, 3]
+    assert store.get(1) is None
+    assert store.get(2).route == b"GET /simple"
+
+    stats = store.aggregate(b"GET /simple")
+    assert len(stats) == 4
+    assert stats[0].code.strip() == "time.sleep(0.1)"
+    assert stats[0].count == 1
+    assert 0.1 < stats[0].mean_time <= stats[0].max_time < 0.2
+
+
+def test_profile_store_memory_limit():
+    store = ProfileStore(max_bytes=1)
+    profile_result = SimpleProfile()
+    profile_result.run(samples.memory_simple)
+    store.add(profile_result, b"GET /memory", 0.1)
+    store.add(profile_result, b"GET /memory", 0.1)
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_profile_handler_http_view():
+    app = Application(
+        components=[
+            PatchRequest(),
+            LoggerComponent(background=False),
+            HttpRouter(),
+            ProfileHandler(threshold=0, http_token="secret"),
+        ]
+    )
+
+    @app.route.get("/sleep/{id}")
+    async def sleep():
+        await samples.simple_aio()
+        return Response(200, b"")
+
+    await app.start()
+    await app.handler(Request(b"/sleep/1"))
+    await app.handler(Request(b"/sleep/2"))
+
+    assert (await app.handler(Request(b"/-/profile"))).status == 403
+    auth = ((b"authorization", b"Bearer secret"),)
+    response = await app.handler(Request(b"/-/profile?view=records", headers=auth))
+    assert response.status == 200
+    assert response.body.decode().startswith("1\t")
+    assert "GET /sleep/{id}" in response.body.decode()
+
+    response = await app.handler(Request(b"/-/profile?view=record&id=1", headers=auth))
+    assert "await samples.simple_aio()" in response.body.decode()
+
+    response = await app.handler(Request(b"/-/profile?view=aggregate&route=GET+/sleep/{id}", headers=auth))
+    assert "mean" in response.body.decode()
+
+    assert (await app.handler(Request(b"/-/profile?view=record&id=10", headers=auth))).status == 404
+    assert (await app.handler(Request(b"/-/profile?view=record", headers=auth))).status == 400
+    assert (await app.handler(Request(b"/-/profile?view=record&id=x", headers=auth))).status == 400
+    await app.stop()
+
+
+def test_memory_peak_and_baseline():
+    tracemalloc.start()
+    try:
+        garbage = list(range(10000))  # allocated before profile - not in result
+        profile_result = SimpleProfile(memory=True)
+        profile_result.run(samples.memory_simple)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    result = profile_result.get_lines()
+
+    assert result[0].mem > 0, result
+    assert profile_result.peak_memory >= result[0].mem
+    assert all(line.filename == samples.__file__ for line in result)
+    del garbage
+
+
+def test_memory_peak_without_reset_peak(monkeypatch):
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)  # python < 3.9
+    tracemalloc.start()
+    try:
+        garbage = [list(range(100000))]  # peak before profile
+        garbage.clear()
+        profile_result = SimpleProfile(memory=True)
+        profile_result.run(samples.memory_simple)
+    finally:
+        tracemalloc.stop()
+
+    assert 0 <= profile_result.peak_memory < 1000000  # not the peak made before profile
+
+
+@pytest.mark.asyncio
+async def test_memory_overlapping_profiles():
+    first, second = SimpleProfile(memory=True), SimpleProfile(memory=True)
+    await asyncio.gather(first.run(samples.amemory_simple), second.run(samples.amemory_simple))
+
+    assert first.peak_memory > 0
+    assert second.peak_memory is None  # tracing is process-wide: no mixed allocations and peak
+    assert all(line.mem == 0 for line in second.get_lines())
+    assert not tracemalloc.is_tracing()
+
+    store = ProfileStore()
+    store.add(first, b"GET /memory", 0.1)
+    store.add(second, b"GET /memory", 0.1)
+    assert "n 1;" in format_allocations(store)
+    assert max(line.mean_mem for line in store.aggregate()) == max(line.mem for line in first.get_lines())
+
+
+def test_profile_store_allocations():
+    store = ProfileStore()
+    profile_result = SimpleProfile(memory=True)
+    profile_result.run(samples.memory_simple)
+    store.add(profile_result, b"GET /memory", 0.1)
+
+    report = format_allocations(store).splitlines()
+    assert report[0].startswith("GET /memory: n 1; peak mean")
+    assert "a = list(range(1000))" in report[1]
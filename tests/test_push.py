@@ -0,0 +1,88 @@
+import pytest
+
+from levin.components import AddRequest, HttpRouter, Push
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+def _push_request(path: bytes, cookie: bytes = b"") -> Request:
+    request = Request(path, headers=((b"cookie", cookie),) if cookie else ())
+    request.set("push_support", True)
+    return request
+
+
+def _get_cookie(response: Response, name: bytes) -> bytes:
+    for header, value in response.headers.items():
+        if header == b"set-cookie" and value.startswith(name + b"="):
+            return value.split(b";")[0]
+    return b""
+
+
+async def _create_app():
+    app = Application(components=[Push(), HttpRouter(), AddRequest()])
+    calls = []
+
+    @app.route.get("/", push="/style.css")
+    async def index(request):
+        request.add_push("/script.js")
+        return Response(200, b"index", headers={b"set-cookie": b"session=abc"})
+
+    @app.route.get("/style.css")
+    async def style(request):
+        calls.append(request)
+        return Response(200, b"style", headers={b"cache-control": b"max-age=60, public"})
+
+    @app.route.get("/private.css")
+    async def private(request):
+        calls.append(request)
+        return Response(200, b"private")
+
+    app.calls = calls
+    await app.start()
+    return app
+
+
+@pytest.mark.asyncio
+async def test_push_cache_digest():
+    app = await _create_app()
+    response = await app.handler(_push_request(b"/"))
+    assert [push.path for push in response.pushes] == [b"/script.js", b"/style.css"]
+    assert _get_cookie(response, b"session") == b"session=abc"  # cookie of handler is kept
+    cookie = _get_cookie(response, b"levin-push")
+
+    response = await app.handler(_push_request(b"/", cookie=b"a=b; " + cookie))
+    assert response.pushes == []
+    assert not _get_cookie(response, b"levin-push")
+
+
+@pytest.mark.asyncio
+async def test_push_digest_without_push_support():
+    app = await _create_app()
+    response = await app.handler(Request(b"/"))  # HTTP/1.1 or client disabled push
+
+    assert not _get_cookie(response, b"levin-push")
+    assert response.headers[b"set-cookie"] == b"session=abc"
+
+
+@pytest.mark.asyncio
+async def test_push_digest_version():
+    app = await _create_app()
+    cookie = _get_cookie(await app.handler(_push_request(b"/")), b"levin-push")
+    app.push.version = "2"
+
+    response = await app.handler(_push_request(b"/", cookie=cookie))
+    assert len(response.pushes) == 2
+
+
+@pytest.mark.asyncio
+async def test_push_response_cache():
+    app = await _create_app()
+    for path in (b"/style.css", b"/style.css", b"/private.css", b"/private.css"):
+        request = Request(path, headers=((b"cookie", b"session=abc"),))
+        request.set("is_push", True)
+        response = await app.handler(request)
+        assert response.body == path[1:].split(b".")[0]
+
+    assert len(app.calls) == 3  # only public response is cached
+    assert (await app.handler(Request(b"/style.css"))).body == b"style"
+    assert len(app.calls) == 4  # not push request
@@ -0,0 +1,59 @@
+import pytest
+
+from levin.components import AddRequest, Cli, HttpRouter, JsonFormat, PatchRequest
+from levin.core.app import Application
+from levin.testing import DIRECT, H2, HTTP1, Client, bench
+
+
+def _create_app():
+    app = Application(components=[PatchRequest(), HttpRouter(), JsonFormat(), AddRequest(), Cli()])
+
+    @app.route.get("/users/{user}")
+    async def user(request):
+        return {"user": request.user}
+
+    @app.route.post("/echo")
+    async def echo(request):
+        return {"size": len(request.body), "test": request.headers.get(b"x-test").decode()}
+
+    @app.route.get("/")
+    async def index(request):
+        return {"status": "ok"}
+
+    return app
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("protocol", [DIRECT, HTTP1, H2])
+async def test_client(protocol):
+    async with Client(_create_app(), protocol) as client:
+        response = await client.get("/users/42")
+        assert (response.status, response.body) == (200, b'{"user": "42"}')
+
+        # larger than default h2 window
+        response = await client.post("/echo", b"x" * 100000, headers={b"x-test": b"1"})
+        assert (response.status, response.body) == (200, b'{"size": 100000, "test": "1"}')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("protocol", [DIRECT, HTTP1, H2])
+async def test_bench(protocol):
+    async with Client(_create_app(), protocol) as client:
+        result = await bench(client, "/users/1", requests=50, concurrency=3)
+
+    assert (result["scenario"], result["requests"], result["errors"]) == ("/users/1", 50, 0)
+    assert result["rps"] > 0
+
+
+def test_client_unknown_protocol():
+    with pytest.raises(ValueError):
+        Client(_create_app(), "spdy")
+
+
+def test_cli_bench():
+    app = _create_app()
+    # routes with arguments need explicit path
+    lines = app.cli.bench(requests=10, protocol=HTTP1).split("\n")
+    assert len(lines) == 1
+    assert lines[0].startswith("GET /: ")
+    assert lines[0].endswith("errors 0")
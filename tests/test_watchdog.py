@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+import pytest
+
+from levin.components import HttpRouter, Watchdog
+from levin.core.app import Application
+from levin.core.common import Request, Response
+
+
+@pytest.mark.asyncio
+async def test_watchdog_capture_blocking_handler():
+    stalls = []
+    app = Application(components=[HttpRouter(), Watchdog(threshold=0.05, interval=0.01, on_stall=stalls.append)])
+
+    @app.route.get("/block/{id}")
+    async def block():
+        time.sleep(0.2)
+        return Response(200, b"")
+
+    await app.start()
+    await asyncio.sleep(0.02)
+    await app.handler(Request(b"/block/1"))
+    await asyncio.sleep(0.02)
+    await app.stop()
+
+    assert len(stalls) == 1
+    assert stalls[0].route == b"/block/{id}"
+    assert stalls[0].lag >= 0.05
+    assert "time.sleep(0.2)" in stalls[0].stack[-1]
+    assert app.watchdog.stalls == stalls
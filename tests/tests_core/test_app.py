@@ -0,0 +1,25 @@
+import pytest
+
+from levin.components import HttpRouter
+from levin.core.app import Application
+
+
+def test_add_component_by_path():
+    app = Application(components=["levin.components.router:HttpRouter", "levin.components.inject.AddRequest"])
+
+    assert isinstance(app.route, HttpRouter)
+    assert [component.name for component in app.components] == ["route", "add_request"]
+
+
+def test_add_component_wrong_path():
+    app = Application(components=["levin.components.unknown:Component"])  # imported on first use
+    with pytest.raises(ImportError):
+        app.get_component("route")
+
+
+def test_configure_component_by_path():
+    app = Application(components=["levin.components.router:HttpRouter"])
+    app.configure({"route": {"enable": False}})
+    assert all(isinstance(component, str) for component in app._components)  # pylint: disable=protected-access
+
+    assert app.route.enable is False
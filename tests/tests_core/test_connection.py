@@ -1,7 +1,7 @@
 import asyncio
 import pytest
 from levin.core.connection import Connection
-from levin.core.common import Request
+from levin.core.common import Push, Request, Response
 from unittest.mock import Mock
 
 
@@ -51,3 +51,146 @@ async def test_full_connection_lifecycle_with_resp(event_loop):
 
 
 
+
+
+@pytest.mark.asyncio
+async def test_connection_push_once():
+    parser = Mock()
+    parser.push_support = True
+    parser.handle_request = Mock(return_value=(b"", [], False))
+    parser.handle_response = Mock(return_value=[b"resp"])
+    handled = []
+
+    async def handler(request):
+        handled.append(request.raw_path)
+        if request.get("is_push"):
+            return Response(200, b"push")
+        return Response(200, b"index", pushes=[Push(b"/style.css"), Push(b"/style.css")])
+
+    connection = Connection(parsers=[parser], handler=handler, loop=asyncio.get_running_loop())
+    connection.connection_made(Mock())
+    connection.data_received(b"-")  # choose parser
+
+    await connection.handle_request(Request(b"/"))
+    await connection.handle_request(Request(b"/", stream=3))
+
+    assert handled == [b"/", b"/style.css", b"/"]
+    assert parser.handle_response.call_args[0][0].pushes == []
+
+
+async def _slow_connection(parser):
+    from levin.testing import FakeTransport
+
+    release = asyncio.Event()
+
+    async def handler(request):
+        await release.wait()
+        return Response(200, b"done")
+
+    written = []
+    connection = Connection(parsers=[parser], handler=handler, loop=asyncio.get_running_loop())
+    transport = FakeTransport(written.append)
+    connection.connection_made(transport)
+    return connection, release, written
+
+
+@pytest.mark.asyncio
+async def test_connection_drain_http1():
+    from levin.core.parsers.http_simple import Parser
+
+    connection, release, written = await _slow_connection(Parser())
+    connection.drain()
+    assert connection.closed  # idle
+
+    connection, release, written = await _slow_connection(Parser())
+    connection.data_received(b"GET / HTTP/1.1\r\nhost: test\r\n\r\n")
+    await asyncio.sleep(0.01)
+    connection.drain()
+    assert not connection.closed  # request in flight
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert connection.closed
+    assert b"Connection: close\r\n" in written[-1]  # response is written at once
+    assert written[-1].endswith(b"done")
+
+
+@pytest.mark.asyncio
+async def test_connection_drain_h2_goaway():
+    from h2.config import H2Configuration
+    from h2.connection import H2Connection
+    from h2.events import ConnectionTerminated, DataReceived
+
+    from levin.core.parsers.hyper import Parser
+
+    connection, release, written = await _slow_connection(Parser())
+    client = H2Connection(H2Configuration(client_side=True))
+    client.initiate_connection()
+    client.send_headers(1, [(":method", "GET"), (":path", "/"), (":scheme", "http"), (":authority", "test")], True)
+    connection.data_received(client.data_to_send())
+    await asyncio.sleep(0.01)
+    connection.drain()
+    await asyncio.sleep(0)  # goaway is written at the end of loop iteration
+
+    events = client.receive_data(b"".join(written))
+    assert [event.last_stream_id for event in events if isinstance(event, ConnectionTerminated)] == [1]
+    assert not connection.closed
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert connection.closed
+
+
+@pytest.mark.asyncio
+async def test_connection_coalesce_writes():
+    from levin.core.connection import write_stats
+    from levin.core.parsers.http_simple import Parser
+    from levin.testing import FakeTransport
+
+    async def handler(request):
+        return Response(200, request.raw_path)
+
+    written = []
+    connection = Connection(parsers=[Parser()], handler=handler, loop=asyncio.get_running_loop())
+    connection.connection_made(FakeTransport(written.append))
+    saved = write_stats.saved
+
+    connection.data_received(b"GET /a HTTP/1.1\r\nhost: test\r\n\r\n")
+    connection.data_received(b"GET /b HTTP/1.1\r\nhost: test\r\n\r\n")
+    await asyncio.sleep(0.01)
+
+    assert len(written) == 1  # responses ready in the same loop iteration with one write
+    assert written[0].endswith(b"/b") and b"\r\n\r\n/a" in written[0]
+    assert write_stats.saved > saved
+
+    connection.write(b"x" * Connection.cork_size)  # large buffer is written right away
+    assert len(written) == 2
+
+
+@pytest.mark.asyncio
+async def test_connection_close_cancels_handlers():
+    from levin.core.parsers.http_simple import Parser
+
+    connection, _, written = await _slow_connection(Parser())
+    connection.data_received(b"GET /a HTTP/1.1\r\nhost: test\r\n\r\n")
+    connection.data_received(b"GET /b HTTP/1.1\r\nhost: test\r\n\r\n")
+    await asyncio.sleep(0.01)
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    assert len(tasks) == 2
+
+    connection.close()
+    await asyncio.sleep(0.01)
+    assert all(task.cancelled() for task in tasks)
+    assert not connection._futures  # pylint: disable=protected-access
+    assert written == []
+
+
+def test_connection_close_done_futures():
+    future = asyncio.Future(loop=asyncio.new_event_loop())
+    future.set_result(None)
+    connection = Connection(parsers=[], handler=None)
+    connection.connection_made(Mock())
+    connection._futures.append(future)  # pylint: disable=protected-access
+
+    connection.close()
+    assert future.result() is None
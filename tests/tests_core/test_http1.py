@@ -0,0 +1,18 @@
+import pytest
+
+from levin.core.common import Request, Response
+from levin.core.parsers.http_simple import Parser
+
+
+def test_http1_response_head_in_one_chunk():
+    chunks = list(Parser.handle_response(Response(200, b"body", headers={b"x-test": b"1"}), Request(b"/")))
+    assert chunks == [b"HTTP/1.1 200 OK\r\nX-test: 1\r\nContent-length: 4\r\n\r\n", b"body"]
+
+
+@pytest.mark.parametrize("status, length", [(200, b"0"), (404, b"0"), (204, None), (304, None), (101, None)])
+def test_http1_response_framing(status, length):
+    response = b"".join(Parser.handle_response(Response(status, b""), Request(b"/")))
+    head, _, body = response.partition(b"\r\n\r\n")
+    headers = dict(line.split(b": ", 1) for line in head.split(b"\r\n")[1:])
+    assert headers.get(b"Content-length") == length  # keep-alive client knows where the next response starts
+    assert body == b""
@@ -0,0 +1,150 @@
+from h2.config import H2Configuration
+from h2.connection import H2Connection
+from h2.events import DataReceived, StreamEnded
+
+from levin.core.common import Response
+from levin.core.parsers.hyper import Parser
+
+
+def _connect(server=None):
+    server = server or Parser()
+    server.connect()
+    client = H2Connection(H2Configuration(client_side=True))
+    client.initiate_connection()
+    to_send, _, _ = server.handle_request(client.data_to_send())
+    client.receive_data(to_send)
+    server.handle_request(client.data_to_send())  # settings ack
+    return server, client
+
+
+def _request(server, client, stream_id, headers=()):
+    client.send_headers(
+        stream_id, [(":method", "GET"), (":path", "/"), (":scheme", "http"), (":authority", "test"), *headers], end_stream=True
+    )
+    _, requests, _ = server.handle_request(client.data_to_send())
+    return requests[0]
+
+
+def _receive(client, data):
+    received, ended = {}, []
+    for event in client.receive_data(data):
+        if isinstance(event, DataReceived):
+            received[event.stream_id] = received.get(event.stream_id, 0) + len(event.data)
+            client.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+        elif isinstance(event, StreamEnded):
+            ended.append(event.stream_id)
+    return received, ended
+
+
+def test_h2_scheduler_interleave_streams():
+    server, client = _connect()
+    big, small = _request(server, client, 1), _request(server, client, 3)
+
+    headers = b"".join(server.handle_response(Response(200, b"x" * 60000), big))
+    headers += b"".join(server.handle_response(Response(200, b"y" * 1000), small))
+    received, ended = _receive(client, headers + server.flush(32 * 1024))
+
+    assert ended == [3]  # small response is not waiting for the big one
+    assert received[1] < 60000
+    assert server.pending
+
+
+def test_h2_scheduler_urgency():
+    server, client = _connect()
+    background = _request(server, client, 1, [("priority", "u=5")])
+    urgent = _request(server, client, 3, [("priority", "u=0")])
+
+    headers = b"".join(server.handle_response(Response(200, b"x" * 20000), background))
+    headers += b"".join(server.handle_response(Response(200, b"y" * 20000), urgent))
+    received, ended = _receive(client, headers + server.flush(16 * 1024))
+
+    assert received == {3: 16 * 1024}
+    assert ended == []
+
+
+def test_h2_scheduler_wait_flow_control_window():
+    server, client = _connect()
+    request = _request(server, client, 1)
+
+    headers = b"".join(server.handle_response(Response(200, b"x" * 100000), request))
+    received, ended = _receive(client, headers + server.flush(1024 * 1024))
+    assert received == {1: 65535}  # default initial window
+    assert server.pending
+
+    server.handle_request(client.data_to_send())  # window update
+    received, ended = _receive(client, server.flush(1024 * 1024))
+    assert received == {1: 100000 - 65535}
+    assert ended == [1]
+    assert not server.pending
+
+
+def test_h2_settings():
+    server, client = _connect(Parser(settings={"max_concurrent_streams": 10, "initial_window_size": 1 << 20}))
+
+    assert client.remote_settings.max_concurrent_streams == 10
+    assert client.remote_settings.initial_window_size == 1 << 20
+    assert client.outbound_flow_control_window == 1 << 20
+
+
+def _upload(server, client, size):
+    client.send_headers(1, [(":method", "POST"), (":path", "/"), (":scheme", "http"), (":authority", "test")])
+    body = b"x" * size
+    while body:
+        chunk = min(client.local_flow_control_window(1), client.max_outbound_frame_size, len(body))
+        assert chunk, "upload is stuck on flow control"
+        client.send_data(1, body[:chunk], end_stream=chunk == len(body))
+        body = body[chunk:]
+        to_send, requests, _ = server.handle_request(client.data_to_send())
+        client.receive_data(to_send)
+        if requests:
+            return requests[0]
+    return None
+
+
+def test_h2_acknowledge_received_data():
+    server, client = _connect()
+    assert len(_upload(server, client, 200000).body) == 200000
+
+
+def test_h2_auto_window():
+    server, client = _connect(Parser(auto_window=True, max_window=1 << 20))
+    client.send_headers(1, [(":method", "POST"), (":path", "/"), (":scheme", "http"), (":authority", "test")])
+    for _ in range(4):
+        client.send_data(1, b"x" * 15000)
+    to_send, _, _ = server.handle_request(client.data_to_send())
+    client.receive_data(to_send)  # ping
+    to_send, _, _ = server.handle_request(client.data_to_send())  # ping ack: 60000 bytes in rtt
+    client.receive_data(to_send)
+
+    assert server._bdp.window == 120000
+    assert client.remote_settings.initial_window_size == 120000
+
+
+def test_h2_scheduler_dependency_cycle():
+    server, client = _connect()
+    first, second = _request(server, client, 1), _request(server, client, 3)
+    client.prioritize(1, depends_on=3)
+    client.prioritize(3, depends_on=1)
+    server.handle_request(client.data_to_send())
+
+    headers = b"".join(server.handle_response(Response(200, b"x" * 1000), first))
+    headers += b"".join(server.handle_response(Response(200, b"y" * 1000), second))
+    received, ended = _receive(client, headers + server.flush(1024 * 1024))
+
+    assert received == {1: 1000, 3: 1000}
+    assert sorted(ended) == [1, 3]
+
+
+def test_h2_scheduler_dependent_of_blocked_parent():
+    server, client = _connect()
+    client.increment_flow_control_window(1 << 20)  # only stream window of parent limits it
+    parent, child = _request(server, client, 1), _request(server, client, 3)
+    client.prioritize(3, depends_on=1)
+    server.handle_request(client.data_to_send())
+
+    headers = b"".join(server.handle_response(Response(200, b"x" * 100000), parent))
+    headers += b"".join(server.handle_response(Response(200, b"y" * 1000), child))
+    received, ended = _receive(client, headers + server.flush(1024 * 1024))
+
+    assert received == {1: 65535, 3: 1000}
+    assert ended == [3]
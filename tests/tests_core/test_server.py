@@ -31,3 +31,241 @@ async def cli(server):
 @pytest.mark.asyncio
 async def test_server_run(cli):
     resp = await cli.get("/")
+
+
+def test_parse_bind(monkeypatch):
+    from levin.core.server import FD, TCP, UNIX, parse_bind
+
+    monkeypatch.setenv("LISTEN_FDS", "2")
+    monkeypatch.delenv("LISTEN_PID", raising=False)
+    assert parse_bind("127.0.0.1:8001") == [(TCP, ("127.0.0.1", 8001))]
+    assert parse_bind("[::1]:8001") == [(TCP, ("::1", 8001))]
+    assert parse_bind(":8001") == [(TCP, ("0.0.0.0", 8001))]
+    assert parse_bind("unix:/tmp/levin.sock") == [(UNIX, "/tmp/levin.sock")]
+    assert parse_bind("fd://5") == [(FD, 5)]
+    assert parse_bind("systemd") == [(FD, 3), (FD, 4)]
+
+
+async def _get(open_connection):
+    reader, writer = await open_connection
+    writer.write(b"GET / HTTP/1.1\r\nhost: test\r\n\r\n")
+    response = await reader.readuntil(b"\r\n\r\n")
+    writer.close()
+    return response
+
+
+@pytest.mark.asyncio
+async def test_server_listeners(tmp_path):
+    import socket
+
+    from levin.components import AddRequest
+    from levin.core.app import Application
+    from levin.core.server import Server
+
+    path = str(tmp_path / "levin.sock")
+    inherited = socket.socket()
+    inherited.bind(("127.0.0.1", 0))
+    inherited.listen()
+    inherited_port = inherited.getsockname()[1]
+
+    app = Application(components=[AddRequest()])
+    await app.start()
+    server = Server(app, bind=[f"unix:{path}", f"fd://{inherited.detach()}", "127.0.0.1:0"])
+    listeners = await server.create_listeners(asyncio.get_running_loop())
+    tcp_port = listeners[2].sockets[0].getsockname()[1]
+    try:
+        assert (await _get(asyncio.open_unix_connection(path))).startswith(b"HTTP/1.1 200 OK")
+        assert (await _get(asyncio.open_connection("127.0.0.1", inherited_port))).startswith(b"HTTP/1.1 200 OK")
+        assert (await _get(asyncio.open_connection("127.0.0.1", tcp_port))).startswith(b"HTTP/1.1 200 OK")
+    finally:
+        await server.close_listeners(listeners)
+    assert not (tmp_path / "levin.sock").exists()
+
+
+@pytest.fixture()
+def certificate(tmp_path):
+    import shutil
+    import subprocess
+
+    if not shutil.which("openssl"):
+        pytest.skip("openssl is required to create certificate")
+    cert, key = str(tmp_path / "cert.pem"), str(tmp_path / "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-keyout", key, "-out", cert, "-days", "1", "-nodes",
+         "-subj", "/CN=localhost"],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+@pytest.mark.asyncio
+async def test_server_tls_alpn_and_resumption(certificate):
+    import ssl
+
+    from h2.config import H2Configuration
+    from h2.connection import H2Connection
+    from h2.events import ResponseReceived
+
+    from levin.components import AddRequest
+    from levin.core.app import Application
+    from levin.core.server import Server
+
+    app = Application(components=[AddRequest()])
+    await app.start()
+    server = Server(app, bind=["127.0.0.1:0"], ssl=certificate, ssl_options={"ecdh_curve": "prime256v1"})
+    listeners = await server.create_listeners(asyncio.get_running_loop())
+    port = listeners[0].sockets[0].getsockname()[1]
+    client_context = ssl.create_default_context()
+    client_context.check_hostname = False
+    client_context.verify_mode = ssl.CERT_NONE
+
+    async def _connect(alpn):
+        client_context.set_alpn_protocols(alpn)
+        reader, writer = await asyncio.open_connection(
+            "127.0.0.1", port, ssl=client_context, server_hostname="localhost", ssl_handshake_timeout=5
+        )
+        return reader, writer, writer.get_extra_info("ssl_object")
+
+    try:
+        # http/1.1 only client gets http1 parser
+        reader, writer, ssl_object = await _connect(["http/1.1"])
+        assert ssl_object.selected_alpn_protocol() == "http/1.1"
+        writer.write(b"GET / HTTP/1.1\r\nhost: test\r\n\r\n")
+        assert (await reader.readuntil(b"\r\n\r\n")).startswith(b"HTTP/1.1 200 OK")
+        await reader.readuntil(b"</html>")  # tls 1.3 session ticket is received with data
+        session = ssl_object.session
+        writer.close()
+
+        reader, writer, ssl_object = await _connect(["h2", "http/1.1"])
+        assert ssl_object.selected_alpn_protocol() == "h2"
+        client = H2Connection(H2Configuration(client_side=True))
+        client.initiate_connection()
+        client.send_headers(1, [(":method", "GET"), (":path", "/"), (":scheme", "https"), (":authority", "test")], True)
+        writer.write(client.data_to_send())
+        events = []
+        while not any(isinstance(event, ResponseReceived) for event in events):
+            events.extend(client.receive_data(await asyncio.wait_for(reader.read(65536), 5)))
+            writer.write(client.data_to_send())
+        writer.close()
+
+        def _resume():
+            import socket
+
+            with socket.create_connection(("127.0.0.1", port)) as sock:
+                with client_context.wrap_socket(sock, server_hostname="localhost", session=session) as tls:
+                    return tls.session_reused
+
+        assert await asyncio.get_running_loop().run_in_executor(None, _resume)
+    finally:
+        await server.close_listeners(listeners)
+
+
+@pytest.mark.asyncio
+async def test_server_drain():
+    from levin.components import AddRequest, HttpRouter
+    from levin.core.app import Application
+    from levin.core.common import Response
+    from levin.core.server import Server
+
+    app = Application(components=[HttpRouter(), AddRequest()])
+
+    @app.route.get("/slow")
+    async def slow(request):
+        await asyncio.sleep(0.2)
+        return Response(200, b"done")
+
+    await app.start()
+    server = Server(app, bind=["127.0.0.1:0"])
+    listeners = await server.create_listeners(asyncio.get_running_loop())
+    port = listeners[0].sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /slow HTTP/1.1\r\nhost: test\r\n\r\n")
+    await asyncio.sleep(0.05)
+
+    drain = asyncio.ensure_future(server.drain(timeout=5))
+    await asyncio.sleep(0.05)
+    with pytest.raises(OSError):
+        await asyncio.open_connection("127.0.0.1", port)  # not accepting
+
+    response = await reader.read()  # response and close
+    await drain
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert response.endswith(b"done")
+
+
+_RELOADED_CHILD = """
+import socket, sys
+from levin.core.server import _inherit_listeners, _notify_ready
+
+class _Server:
+    listeners = None
+
+server = _Server()
+_inherit_listeners([server])
+(kind, fd), = server.listeners
+with open(sys.argv[1], "w") as file_:
+    file_.write(str(socket.socket(fileno=fd).getsockname()[1]))
+_notify_ready()
+"""
+
+
+@pytest.mark.asyncio
+async def test_server_reload(tmp_path, monkeypatch):
+    import os
+    import sys
+
+    import levin
+    from levin.components import AddRequest
+    from levin.core.app import Application
+    from levin.core.server import Server, reload
+
+    monkeypatch.setenv("PYTHONPATH", os.path.dirname(os.path.dirname(levin.__file__)))
+    app = Application(components=[AddRequest()])
+    server = Server(app, bind=["127.0.0.1:0"])
+    listeners = await server.create_listeners(asyncio.get_running_loop())
+    port = listeners[0].sockets[0].getsockname()[1]
+    stop_event = asyncio.Event()
+    try:
+        failed = await reload([server], stop_event, timeout=10, command=[sys.executable, "-c", "exit(1)"])
+        assert not failed and not stop_event.is_set() and not server.handed_over  # old process keeps serving
+
+        child = [sys.executable, "-c", _RELOADED_CHILD, str(tmp_path / "port")]
+        assert await reload([server], stop_event, timeout=10, command=child)
+    finally:
+        await server.close_listeners(listeners)
+    assert stop_event.is_set() and server.handed_over
+    assert (tmp_path / "port").read_text() == str(port)  # child listens on the same socket
+
+
+def test_reload_command(monkeypatch):
+    import sys
+
+    from levin.core.server import _get_command
+
+    monkeypatch.setattr(sys, "orig_argv", ["python3", "-X", "dev", "-m", "service", "cli", "run"], raising=False)
+    assert _get_command() == [sys.executable, "-X", "dev", "-m", "service", "cli", "run"]
+
+
+@pytest.mark.asyncio
+async def test_manage_ready_without_listeners(monkeypatch):
+    import os
+
+    from levin.core.server import READY_FD_ENV, _manage
+
+    class _Server:
+        async def drain(self):
+            pass
+
+        async def stop(self):
+            pass
+
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setenv(READY_FD_ENV, str(write_fd))
+    stop_event = asyncio.Event()
+    stop_event.set()
+    listeners = asyncio.ensure_future(asyncio.sleep(0, result=[]))  # e.g. systemd without sockets
+    await _manage([listeners], [_Server()], stop_event)
+
+    assert os.read(read_fd, 1) == b"1"
+    os.close(read_fd)